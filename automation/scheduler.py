@@ -9,6 +9,7 @@ For Linux/Mac: Use cron
 
 import schedule
 import time
+import json
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -19,7 +20,8 @@ import os
 sys.path.append(str(Path(__file__).parent.parent / 'python'))
 
 from main import main as run_pipeline
-from config import LOG_FILE
+from db_utils import get_sales_watermark
+from config import LOG_FILE, TRIGGER_CONFIG, TRIGGER_STATE_FILE, TRIGGER_LATENCY_FILE
 
 # Set up logging
 logging.basicConfig(
@@ -36,6 +38,9 @@ logger = logging.getLogger(__name__)
 def scheduled_job():
     """
     Run the Consumer360 pipeline as a scheduled job
+    
+    Returns:
+        bool: True if the pipeline completed successfully
     """
     logger.info("="*80)
     logger.info(f"SCHEDULED PIPELINE STARTED: {datetime.now()}")
@@ -48,9 +53,12 @@ def scheduled_job():
             logger.info("✓ Scheduled pipeline completed successfully")
         else:
             logger.error("✗ Scheduled pipeline failed")
+        
+        return success
     
     except Exception as e:
         logger.error(f"✗ Scheduled pipeline error: {e}", exc_info=True)
+        return False
 
 
 def run_scheduler_continuous():
@@ -73,6 +81,233 @@ def run_scheduler_continuous():
         time.sleep(60)  # Check every minute
 
 
+def load_trigger_state():
+    """
+    Load the trigger state: the watermark of the last successful triggered
+    run, and the retry state of failed runs since then
+    
+    Returns:
+        dict: State ('max_sales_key', 'total_rows' and 'completed_at' once a
+              run has succeeded; 'failure' after a failed run), empty if none
+    """
+    if not TRIGGER_STATE_FILE.exists():
+        return {}
+    
+    with open(TRIGGER_STATE_FILE) as f:
+        return json.load(f)
+
+
+def _write_trigger_state(state):
+    """Write the trigger state atomically"""
+    tmp_path = TRIGGER_STATE_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, TRIGGER_STATE_FILE)
+
+
+def save_trigger_state(max_sales_key, total_rows, completed_at):
+    """
+    Persist the watermark a successful run was triggered at (clears failures)
+    
+    Args:
+        max_sales_key (int): MAX(SalesKey) at trigger time
+        total_rows (int): Fact_Sales row count at trigger time
+        completed_at (float): Completion time (epoch seconds)
+    """
+    _write_trigger_state({
+        'max_sales_key': max_sales_key,
+        'total_rows': total_rows,
+        'completed_at': completed_at,
+    })
+
+
+def record_trigger_failure(state, max_sales_key, total_rows, failed_at):
+    """
+    Persist a failed run and schedule its retry with exponential backoff
+    
+    Args:
+        state (dict): Current trigger state
+        max_sales_key (int): MAX(SalesKey) the run was triggered at
+        total_rows (int): Fact_Sales row count the run was triggered at
+        failed_at (float): Failure time (epoch seconds)
+    
+    Returns:
+        dict: Updated trigger state
+    """
+    previous = state.get('failure') or {}
+    same_watermark = [previous.get('max_sales_key'), previous.get('total_rows')] == [max_sales_key, total_rows]
+    consecutive = previous.get('consecutive', 0) + 1
+    backoff = min(
+        TRIGGER_CONFIG['retry_backoff_seconds'] * 2 ** (consecutive - 1),
+        TRIGGER_CONFIG['max_retry_backoff_seconds']
+    )
+    
+    state = dict(state, failure={
+        'max_sales_key': max_sales_key,
+        'total_rows': total_rows,
+        'consecutive': consecutive,
+        'watermark_attempts': previous.get('watermark_attempts', 0) + 1 if same_watermark else 1,
+        'retry_at': failed_at + backoff,
+    })
+    _write_trigger_state(state)
+    
+    logger.warning(
+        f"Triggered run failed ({consecutive} in a row, "
+        f"{state['failure']['watermark_attempts']} at this watermark); next attempt in {backoff:.0f}s at the earliest"
+    )
+    if state['failure']['watermark_attempts'] >= TRIGGER_CONFIG['max_retries_per_watermark']:
+        logger.warning("Retry limit reached at this watermark; waiting for Fact_Sales to change")
+    return state
+
+
+def retry_blocked(state, max_sales_key, total_rows, now):
+    """
+    Whether a failed run's backoff or retry cap holds back the next run
+    
+    Args:
+        state (dict): Current trigger state
+        max_sales_key (int): Current MAX(SalesKey)
+        total_rows (int): Current Fact_Sales row count
+        now (float): Current time (epoch seconds)
+    
+    Returns:
+        bool: True if no run should start now
+    """
+    failure = state.get('failure')
+    if not failure:
+        return False
+    
+    if now < failure['retry_at']:
+        return True
+    
+    same_watermark = [failure['max_sales_key'], failure['total_rows']] == [max_sales_key, total_rows]
+    return same_watermark and failure['watermark_attempts'] >= TRIGGER_CONFIG['max_retries_per_watermark']
+
+
+def record_trigger_latency(first_change_at, triggered_at, completed_at, changed_rows, success):
+    """
+    Append the latency of one triggered run to the latency log
+    
+    Args:
+        first_change_at (float): When the change was first seen (epoch seconds)
+        triggered_at (float): When the run was started
+        completed_at (float): When the run finished
+        changed_rows (int): Fact rows changed since the previous run
+        success (bool): Whether the run succeeded
+    """
+    trigger_to_completion = completed_at - triggered_at
+    change_to_completion = completed_at - first_change_at
+    
+    write_header = not TRIGGER_LATENCY_FILE.exists()
+    with open(TRIGGER_LATENCY_FILE, 'a') as f:
+        if write_header:
+            f.write("triggered_at,changed_rows,success,change_to_trigger_s,trigger_to_completion_s,change_to_completion_s\n")
+        f.write(
+            f"{datetime.fromtimestamp(triggered_at).isoformat()},{changed_rows},{success},"
+            f"{triggered_at - first_change_at:.1f},{trigger_to_completion:.1f},{change_to_completion:.1f}\n"
+        )
+    
+    logger.info(
+        f"Trigger-to-completion latency: {trigger_to_completion:.1f}s "
+        f"(first change seen {change_to_completion:.1f}s before completion)"
+    )
+
+
+def run_scheduler_triggered():
+    """
+    Run the pipeline when enough new sales have landed (change-driven mode)
+    
+    Every poll reads MAX(SalesKey) and the row count of Fact_Sales. Once they
+    differ from the watermark of the last successful run, the run is due when
+    at least min_new_rows changed or the last run is older than
+    max_staleness_hours. A due run waits until the watermark has been quiet
+    for debounce_seconds (capped at max_debounce_seconds) so bursts of loads
+    trigger a single run.
+    
+    Extract checkpoint keys include the Fact_Sales and dimension watermarks,
+    so a triggered run reads the data that triggered it, while a retry at an
+    unchanged watermark resumes from the steps that already completed.
+    
+    A failed run is retried after retry_backoff_seconds, doubling with every
+    consecutive failure up to max_retry_backoff_seconds. After
+    max_retries_per_watermark failures at one watermark, the next attempt
+    waits for the watermark to move. The retry state is kept in the trigger
+    state file, so it survives restarts.
+    """
+    poll_interval = TRIGGER_CONFIG['poll_interval_seconds']
+    
+    logger.info("Triggered scheduler started. Polling Fact_Sales watermark...")
+    logger.info(
+        f"Trigger on {TRIGGER_CONFIG['min_new_rows']} changed rows or any change after "
+        f"{TRIGGER_CONFIG['max_staleness_hours']}h (debounce {TRIGGER_CONFIG['debounce_seconds']}s, "
+        f"poll every {poll_interval}s)"
+    )
+    
+    state = load_trigger_state()
+    first_change_at = None
+    last_change_at = None
+    last_seen = None
+    
+    while True:
+        try:
+            max_sales_key, total_rows = get_sales_watermark()
+        except Exception as e:
+            logger.error(f"Could not read Fact_Sales watermark: {e}")
+            time.sleep(poll_interval)
+            continue
+        
+        now = time.time()
+        
+        if 'max_sales_key' not in state:
+            # No recorded run yet: refresh immediately
+            changed_rows = total_rows
+            first_change_at = first_change_at or now
+            ready = True
+        
+        else:
+            changed_rows = max(
+                max_sales_key - state['max_sales_key'],
+                abs(total_rows - state['total_rows'])
+            )
+            due = changed_rows > 0 and (
+                changed_rows >= TRIGGER_CONFIG['min_new_rows']
+                or now - state['completed_at'] >= TRIGGER_CONFIG['max_staleness_hours'] * 3600
+            )
+            
+            if changed_rows > 0:
+                if first_change_at is None:
+                    first_change_at = now
+                    logger.info(f"Fact_Sales changed: {changed_rows} rows since last run")
+                if (max_sales_key, total_rows) != last_seen:
+                    last_change_at = now
+            
+            quiet = due and now - last_change_at >= TRIGGER_CONFIG['debounce_seconds']
+            overdue = due and now - first_change_at >= TRIGGER_CONFIG['max_debounce_seconds']
+            ready = quiet or overdue
+        
+        last_seen = (max_sales_key, total_rows)
+        
+        if ready and retry_blocked(state, max_sales_key, total_rows, now):
+            ready = False
+        
+        if ready:
+            logger.info(f"Triggering pipeline run ({changed_rows} changed rows)")
+            triggered_at = time.time()
+            success = scheduled_job()
+            completed_at = time.time()
+            
+            record_trigger_latency(first_change_at, triggered_at, completed_at, changed_rows, success)
+            
+            if success:
+                save_trigger_state(max_sales_key, total_rows, completed_at)
+                state = load_trigger_state()
+                first_change_at = last_change_at = None
+            else:
+                state = record_trigger_failure(state, max_sales_key, total_rows, completed_at)
+        
+        time.sleep(poll_interval)
+
+
 def run_once_now():
     """
     Run the pipeline immediately (for manual/test execution)
@@ -87,9 +322,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Consumer360 Pipeline Scheduler')
     parser.add_argument(
         '--mode',
-        choices=['continuous', 'once'],
+        choices=['continuous', 'triggered', 'once'],
         default='once',
-        help='Run mode: continuous (scheduled) or once (immediate)'
+        help='Run mode: continuous (scheduled), triggered (on new sales) or once (immediate)'
     )
     
     args = parser.parse_args()
@@ -101,5 +336,12 @@ if __name__ == "__main__":
             run_scheduler_continuous()
         except KeyboardInterrupt:
             print("\nScheduler stopped by user")
+    elif args.mode == 'triggered':
+        print("Starting scheduler in triggered mode...")
+        print("Press Ctrl+C to stop")
+        try:
+            run_scheduler_triggered()
+        except KeyboardInterrupt:
+            print("\nScheduler stopped by user")
     else:
         run_once_now()
@@ -0,0 +1,98 @@
+"""
+Consumer360: Arrow Fetch Benchmark
+
+Compares the row-based DB-API fetch path of db_utils.execute_query with the
+Arrow-native fetch path on a synthetic SQLite Fact_Sales table.
+
+Usage:
+    python benchmarks/bench_arrow_fetch.py --rows 1000000
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import pipeline modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import db_utils
+
+FACT_QUERY = """
+SELECT SalesKey, TransactionID, CustomerKey, ProductKey, OrderDate,
+       Quantity, UnitPrice, TotalAmount, OrderStatus
+FROM Fact_Sales
+"""
+
+
+def build_fact_table(db_path, rows, seed=42):
+    """Create a synthetic Fact_Sales table in a SQLite database"""
+    rng = np.random.default_rng(seed)
+    order_dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 730, rows), unit='D')
+    
+    df = pd.DataFrame({
+        'SalesKey': np.arange(1, rows + 1),
+        'TransactionID': [f"TXN{i:09d}" for i in rng.integers(0, rows // 3 + 1, rows)],
+        'CustomerKey': rng.integers(1, rows // 10 + 2, rows),
+        'ProductKey': rng.integers(1, 500, rows),
+        'OrderDate': order_dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'Quantity': rng.integers(1, 5, rows),
+        'UnitPrice': np.round(rng.gamma(2, 40, rows), 2),
+        'OrderStatus': rng.choice(['Completed', 'Cancelled', 'Returned'], rows, p=[0.9, 0.05, 0.05]),
+    })
+    df['TotalAmount'] = np.round(df['Quantity'] * df['UnitPrice'], 2)
+    
+    conn = sqlite3.connect(db_path)
+    df.to_sql('Fact_Sales', conn, if_exists='replace', index=False)
+    conn.close()
+
+
+def time_backend(backend, repeats):
+    """Best-of-N wall time for one fetch backend"""
+    best = float('inf')
+    df = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = db_utils.execute_query(FACT_QUERY, query_name=f'bench_{backend}', fetch_backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return best, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arrow vs row-based fetch benchmark (SQLite)')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Fact rows to generate')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per backend (best time reported)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'bench.db')
+        print(f"Building synthetic Fact_Sales with {args.rows:,} rows...")
+        build_fact_table(db_path, args.rows)
+        
+        db_utils.DB_BACKEND = 'sqlite'
+        db_utils.SQLITE_DB_PATH = db_path
+        
+        python_s, python_df = time_backend('python', args.repeats)
+        arrow_s, arrow_df = time_backend('arrow', args.repeats)
+    
+    telemetry = db_utils.get_query_telemetry()
+    if not (telemetry['backend'] == 'arrow').any():
+        print("Arrow driver not available - install adbc-driver-sqlite and pyarrow")
+        return
+    
+    pd.testing.assert_frame_equal(python_df, arrow_df, check_dtype=False)
+    
+    print(f"\n{'Backend':<10}{'Best (s)':>12}{'Rows/sec':>16}")
+    print(f"{'python':<10}{python_s:>12.3f}{args.rows / python_s:>16,.0f}")
+    print(f"{'arrow':<10}{arrow_s:>12.3f}{args.rows / arrow_s:>16,.0f}")
+    print(f"\nSpeed-up: {python_s / arrow_s:.1f}x")
+    print("\nBreakdown (mean seconds per call):")
+    print(telemetry.groupby('backend')[['execute_s', 'first_row_s', 'fetch_s', 'build_s', 'total_s']].mean().round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Consumer360: DuckDB Backend Benchmark
+
+Runs the RFM, market basket, product co-occurrence and cohort extraction
+queries of db_utils against the same synthetic star schema stored in SQLite
+and in Parquet files attached to DuckDB, checks that both backends return the
+same results, and compares wall times.
+
+Usage:
+    python benchmarks/bench_duckdb_backend.py --rows 1000000
+"""
+
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import pipeline modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import db_utils
+
+EXTRACTIONS = {
+    'rfm': (db_utils.get_rfm_data, ['CustomerKey']),
+    'market_basket': (db_utils.get_market_basket_data, ['TransactionID', 'ProductName']),
+    'product_cooccurrence': (db_utils.get_product_cooccurrence, ['Product1', 'Product2']),
+    'cohort': (db_utils.get_cohort_data, ['CohortMonth']),
+}
+
+
+def build_star_schema(rows, seed=42):
+    """Generate Dim_Customer, Dim_Product and Fact_Sales with multi-line transactions"""
+    rng = np.random.default_rng(seed)
+    customers = max(rows // 20, 1)
+    products = 500
+    
+    dim_customer = pd.DataFrame({
+        'CustomerKey': np.arange(1, customers + 1),
+        'CustomerID': [f"CUST{i:08d}" for i in range(1, customers + 1)],
+        'CustomerName': [f"Customer {i}" for i in range(1, customers + 1)],
+        'Email': [f"customer{i}@example.com" for i in range(1, customers + 1)],
+        'SignUpDate': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, customers), unit='D'),
+        'FirstPurchaseDate': pd.NaT,
+    })
+    dim_product = pd.DataFrame({
+        'ProductKey': np.arange(1, products + 1),
+        'ProductName': [f"Product {i}" for i in range(1, products + 1)],
+        'Category': [f"Category {i % 12}" for i in range(1, products + 1)],
+        'SubCategory': [f"SubCategory {i % 40}" for i in range(1, products + 1)],
+    })
+    
+    # Transactions of 1-5 lines with distinct products, one customer and date each
+    lines = rng.integers(1, 6, rows // 2 + 1)
+    lines = lines[:np.searchsorted(np.cumsum(lines), rows) + 1]
+    transaction = np.repeat(np.arange(len(lines)), lines)[:rows]
+    n_transactions = transaction[-1] + 1
+    
+    offsets = np.arange(len(transaction)) - np.repeat(np.cumsum(lines) - lines, lines)[:rows]
+    first_product = rng.integers(1, products + 1, n_transactions)
+    product = (first_product[transaction] + offsets * rng.integers(1, 7)) % products + 1
+    
+    order_dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 730 * 24, n_transactions), unit='h')
+    quantity = rng.integers(1, 5, rows)
+    unit_price = np.round(rng.gamma(2, 40, rows), 2)
+    
+    fact_sales = pd.DataFrame({
+        'SalesKey': np.arange(1, rows + 1),
+        'TransactionID': np.char.add('TXN', np.char.zfill(transaction.astype(str), 9)),
+        'CustomerKey': rng.integers(1, customers + 1, n_transactions)[transaction],
+        'ProductKey': product,
+        'OrderDate': order_dates[transaction],
+        'Quantity': quantity,
+        'UnitPrice': unit_price,
+        'TotalAmount': np.round(quantity * unit_price, 2),
+        'OrderStatus': rng.choice(['Completed', 'Cancelled', 'Returned'], n_transactions, p=[0.9, 0.05, 0.05])[transaction],
+    })
+    
+    return {'Dim_Customer': dim_customer, 'Dim_Product': dim_product, 'Fact_Sales': fact_sales}
+
+
+def write_sqlite(tables, db_path):
+    """Load the tables into SQLite (dates as text) with the join/grouping indexes"""
+    conn = sqlite3.connect(db_path)
+    for name, df in tables.items():
+        df = df.copy()
+        for column in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+        df.to_sql(name, conn, if_exists='replace', index=False)
+    
+    conn.execute("CREATE INDEX IX_Fact_Customer ON Fact_Sales (CustomerKey)")
+    conn.execute("CREATE INDEX IX_Fact_Transaction ON Fact_Sales (TransactionID, ProductKey)")
+    conn.execute("CREATE UNIQUE INDEX IX_Customer ON Dim_Customer (CustomerKey)")
+    conn.execute("CREATE UNIQUE INDEX IX_Product ON Dim_Product (ProductKey)")
+    conn.commit()
+    conn.close()
+
+
+def write_parquet(tables, directory):
+    """Write one Parquet file per table, as a nightly export would"""
+    paths = {}
+    for name, df in tables.items():
+        paths[name] = str(Path(directory) / f"{name.lower()}.parquet")
+        df.to_parquet(paths[name], index=False)
+    return paths
+
+
+def time_extraction(function, repeats):
+    """Best-of-N wall time for one extraction"""
+    best = float('inf')
+    df = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = function()
+        best = min(best, time.perf_counter() - start)
+    return best, df
+
+
+def assert_same_result(left, right, keys):
+    """
+    Compare two backends' results on their numeric columns
+    
+    SQLite keeps CAST(... AS DECIMAL(p,2)) values unrounded, so amounts may differ by up to a cent.
+    """
+    left = left.sort_values(keys).reset_index(drop=True)
+    right = right.sort_values(keys).reset_index(drop=True)
+    numeric = [c for c in left.columns if pd.api.types.is_numeric_dtype(left[c]) and c in right.columns]
+    
+    pd.testing.assert_frame_equal(
+        left[keys + numeric],
+        right[keys + numeric],
+        check_dtype=False,
+        atol=0.01
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DuckDB vs SQLite extraction benchmark')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Fact rows to generate')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per extraction (best time reported)')
+    args = parser.parse_args()
+    
+    print(f"Building synthetic star schema with {args.rows:,} fact rows...")
+    tables = build_star_schema(args.rows)
+    
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sqlite(tables, str(Path(tmp) / 'bench.db'))
+        parquet_tables = write_parquet(tables, tmp)
+        
+        db_utils.SQLITE_DB_PATH = str(Path(tmp) / 'bench.db')
+        db_utils.DUCKDB_CONFIG = {
+            'database': str(Path(tmp) / 'bench.duckdb'),
+            'parquet_tables': parquet_tables,
+            'threads': None,
+        }
+        
+        for name, (function, keys) in EXTRACTIONS.items():
+            results = {}
+            for backend in ('sqlite', 'duckdb'):
+                db_utils.DB_BACKEND = backend
+                timings[(name, backend)], results[backend] = time_extraction(function, args.repeats)
+            
+            assert_same_result(results['sqlite'], results['duckdb'], keys)
+            timings[(name, 'rows')] = len(results['duckdb'])
+    
+    print("\n" + "="*70)
+    print("DUCKDB VS SQLITE EXTRACTION BENCHMARK")
+    print("="*70)
+    print(f"Fact rows: {args.rows:,}  (best of {args.repeats}, results match)")
+    print(f"\n{'Extraction':<22}{'Rows':>10}{'SQLite (s)':>13}{'DuckDB (s)':>13}{'Speed-up':>11}")
+    for name in EXTRACTIONS:
+        sqlite_s, duckdb_s = timings[(name, 'sqlite')], timings[(name, 'duckdb')]
+        print(f"{name:<22}{timings[(name, 'rows')]:>10,}{sqlite_s:>13.3f}{duckdb_s:>13.3f}{sqlite_s / duckdb_s:>10.1f}x")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Consumer360: Lookalike Search Benchmark
+
+Measures index build time, batched k-nearest-neighbour query throughput and
+seed-set lookalike latency of lookalike.py on synthetic RFM metrics, and checks
+a sample of the results against a brute-force float64 search.
+
+Usage:
+    python benchmarks/bench_lookalike.py --customers 1000000 --queries 10000
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import pipeline modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import lookalike
+
+
+def build_customers(customers, seed=42):
+    """Generate RFM metrics with realistic skew"""
+    rng = np.random.default_rng(seed)
+    orders = rng.geometric(0.25, customers)
+    avg_order = np.round(rng.lognormal(4, 0.8, customers), 2)
+    
+    return pd.DataFrame({
+        'CustomerKey': np.arange(1, customers + 1),
+        'DaysSinceLastPurchase': rng.integers(0, 730, customers),
+        'TotalOrders': orders,
+        'TotalRevenue': np.round(orders * avg_order * rng.uniform(1, 3, customers), 2),
+        'AvgOrderValue': avg_order,
+    })
+
+
+def brute_force_distances(index, rows, k):
+    """Exact float64 k-NN distances for a few query rows (excluding themselves)"""
+    matrix = index['matrix'].astype(np.float64)
+    distances = np.sqrt(((matrix[rows][:, None, :] - matrix[None, :, :]) ** 2).sum(axis=2))
+    distances[np.arange(len(rows)), rows] = np.inf
+    return np.sort(distances, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lookalike search benchmark')
+    parser.add_argument('--customers', type=int, default=1_000_000, help='Customers to index')
+    parser.add_argument('--queries', type=int, default=10_000, help='Customers per batched k-NN query')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--seeds', type=int, default=20_000, help='Seed set size for lookalike search')
+    parser.add_argument('--count', type=int, default=10_000, help='Lookalikes to return')
+    parser.add_argument('--search', choices=['auto', 'kdtree', 'blocked'], default=None,
+                        help='Search method (defaults to LOOKALIKE_CONFIG)')
+    args = parser.parse_args()
+    
+    print(f"Generating RFM metrics for {args.customers:,} customers...")
+    df = build_customers(args.customers)
+    rng = np.random.default_rng(7)
+    
+    start = time.perf_counter()
+    index = lookalike.build_index(df, search=args.search)
+    build_s = time.perf_counter() - start
+    
+    query_keys = rng.choice(df['CustomerKey'].to_numpy(), args.queries, replace=False)
+    start = time.perf_counter()
+    neighbours = lookalike.knn(index, query_keys, args.k)
+    knn_s = time.perf_counter() - start
+    
+    # Seeds: the top customers by revenue, like a Champions segment
+    seed_keys = df.nlargest(args.seeds, 'TotalRevenue')['CustomerKey'].to_numpy()
+    start = time.perf_counter()
+    lookalikes = lookalike.find_lookalikes(index, seed_keys, args.count)
+    lookalike_s = time.perf_counter() - start
+    
+    # Accuracy check on a sample of queries
+    sample = query_keys[:20]
+    expected = brute_force_distances(index, lookalike._rows_for_keys(index, sample), args.k)
+    got = neighbours.set_index(['QueryKey', 'Rank'])['Distance'].unstack().loc[sample].to_numpy()
+    max_error = np.abs(got - expected).max()
+    
+    print("\n" + "="*60)
+    print("LOOKALIKE SEARCH BENCHMARK")
+    print("="*60)
+    print(f"Customers indexed:      {args.customers:,}")
+    print(f"Search:                 {'KD-tree' if index['tree'] is not None else 'blocked'}")
+    print(f"Index build:            {build_s:.2f}s")
+    print(f"k-NN ({args.queries:,} x k={args.k}):  {knn_s:.2f}s ({args.queries / knn_s:,.0f} queries/sec)")
+    print(f"Lookalikes ({args.seeds:,} seeds -> {len(lookalikes):,}): {lookalike_s:.2f}s")
+    print(f"Max distance error vs float64 brute force: {max_error:.2e}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Consumer360: RFM Backfill Benchmark
+
+Runs a full weekly point-in-time backfill of rfm_backfill.py (metrics,
+scoring and segmentation of every snapshot) on synthetic sales that start
+shortly before the first as-of date, so the early snapshots hold few
+customers with few distinct order counts. A sample of snapshots is checked
+against a direct pandas aggregation of the facts up to each date.
+
+Usage:
+    python benchmarks/bench_rfm_backfill.py --rows 500000 --weeks 52
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import pipeline modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import rfm_backfill
+
+
+def build_fact_rows(rows, start, end, customers, seed=42):
+    """Generate fact rows like get_rfm_fact_rows, with sales ramping up over time"""
+    rng = np.random.default_rng(seed)
+    span_hours = int((end - start) / pd.Timedelta(hours=1))
+    
+    # Square-root spacing puts few sales in the first weeks
+    offsets = np.sort((rng.random(rows) ** 0.5 * span_hours).astype(np.int64))
+    transactions = rows // 2
+    transaction = np.sort(rng.integers(0, transactions, rows))
+    
+    return pd.DataFrame({
+        'CustomerKey': rng.integers(1, customers + 1, transactions)[transaction],
+        'TransactionID': np.char.add('TXN', transaction.astype(str)),
+        'OrderDate': start + pd.to_timedelta(offsets, unit='h'),
+        'OrderStatus': rng.choice(['Completed', 'Cancelled', 'Returned'], rows, p=[0.9, 0.05, 0.05]),
+        'TotalAmount': np.round(rng.gamma(2, 40, rows), 2),
+    }).sort_values('OrderDate', kind='mergesort').reset_index(drop=True)
+
+
+def direct_metrics(facts, as_of):
+    """RFM metrics of one as-of date straight from the facts"""
+    cutoff = pd.Timestamp(as_of).normalize() + pd.Timedelta(days=1)
+    rows = facts[facts['OrderDate'] < cutoff]
+    completed = rows[rows['OrderStatus'] == 'Completed']
+    
+    metrics = pd.DataFrame({
+        'TotalOrders': completed.groupby('CustomerKey')['TransactionID'].nunique(),
+        'TotalRevenue': completed.groupby('CustomerKey')['TotalAmount'].sum().round(2),
+    })
+    return metrics[metrics['TotalOrders'] > 0].sort_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Point-in-time RFM backfill benchmark')
+    parser.add_argument('--rows', type=int, default=500_000, help='Fact rows to generate')
+    parser.add_argument('--customers', type=int, default=20_000, help='Distinct customers')
+    parser.add_argument('--weeks', type=int, default=52, help='Weekly snapshots')
+    parser.add_argument('--checks', type=int, default=4, help='Snapshots checked against a direct aggregation')
+    args = parser.parse_args()
+    
+    as_of_dates = rfm_backfill.weekly_as_of_dates(args.weeks, end=pd.Timestamp('2025-12-31'))
+    facts = build_fact_rows(args.rows, as_of_dates[0] - pd.Timedelta(days=3), as_of_dates[-1], args.customers)
+    print(f"Generated {len(facts):,} fact rows for {args.weeks} weekly snapshots...")
+    
+    start = time.perf_counter()
+    snapshots = rfm_backfill.compute_rfm_backfill(facts, as_of_dates)
+    metrics_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    scored = rfm_backfill.score_snapshots(snapshots)
+    scoring_s = time.perf_counter() - start
+    
+    # Every non-empty snapshot must be scored, including the sparse early ones
+    scored_dates = scored['AsOfDate'].nunique()
+    expected_dates = sum(not snapshot.empty for snapshot in snapshots)
+    assert scored_dates == expected_dates, f"{scored_dates} of {expected_dates} snapshots scored"
+    assert scored[['R_Score', 'F_Score', 'M_Score']].isin(range(1, 6)).all().all()
+    
+    for position in np.linspace(0, len(as_of_dates) - 1, args.checks).astype(int):
+        as_of = as_of_dates[position]
+        expected = direct_metrics(facts, as_of)
+        got = scored[scored['AsOfDate'] == as_of].set_index('CustomerKey').sort_index()
+        pd.testing.assert_frame_equal(
+            got[['TotalOrders', 'TotalRevenue']], expected,
+            check_dtype=False, check_names=False, atol=0.005
+        )
+    
+    early = snapshots[0]
+    print("\n" + "="*60)
+    print("RFM BACKFILL BENCHMARK")
+    print("="*60)
+    print(f"Snapshots scored:       {scored_dates} of {args.weeks} ({len(scored):,} rows)")
+    print(f"First snapshot:         {len(early):,} customers, {early['TotalOrders'].nunique()} distinct order counts")
+    print(f"Metrics:                {metrics_s:.2f}s")
+    print(f"Scoring + segments:     {scoring_s:.2f}s")
+    print(f"Checked {args.checks} snapshots against a direct aggregation: OK")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
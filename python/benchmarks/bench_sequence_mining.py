@@ -0,0 +1,107 @@
+"""
+Consumer360: Sequential Pattern Mining Benchmark
+
+Times sequence_mining on synthetic integer-encoded purchase histories with
+millions of customers, mining in one process and in a worker pool.
+
+Usage:
+    python benchmarks/bench_sequence_mining.py --customers 1000000 --workers 8
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+# Add parent directory to path to import pipeline modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import sequence_mining
+
+
+def build_histories(customers, products, seed=42):
+    """
+    Generate purchase rows: a few orders per customer, Zipf-like product
+    popularity, and a planted "product 0 then product 1 within 20 days" habit
+    """
+    rng = np.random.default_rng(seed)
+    
+    orders_per_customer = rng.geometric(0.35, customers)
+    order_customer = np.repeat(np.arange(customers), orders_per_customer)
+    n_orders = len(order_customer)
+    
+    # Order days: customer start day plus cumulative gaps between orders
+    first = np.r_[True, order_customer[1:] != order_customer[:-1]]
+    gaps = np.where(first, 0, rng.integers(0, 45, n_orders))
+    elapsed = np.cumsum(gaps)
+    elapsed -= np.repeat(elapsed[first], orders_per_customer)
+    order_day = rng.integers(0, 365, customers)[order_customer] + elapsed
+    
+    items_per_order = rng.integers(1, 4, n_orders)
+    row_order = np.repeat(np.arange(n_orders), items_per_order)
+    popularity = 1 / np.arange(1, products + 1) ** 1.1
+    row_item = rng.choice(products, len(row_order), p=popularity / popularity.sum())
+    
+    # Planted sequence: 5% of customers buy product 1 some days after product 0
+    planted = rng.choice(customers, customers // 20, replace=False)
+    first_row = np.r_[True, row_order[1:] != row_order[:-1]]
+    planted_rows = np.flatnonzero(np.isin(order_customer[row_order], planted) & first[row_order] & first_row)
+    follow_orders = n_orders + np.arange(len(planted_rows))
+    
+    customers_col = np.r_[order_customer[row_order], order_customer[row_order[planted_rows]]]
+    orders_col = np.r_[row_order, follow_orders]
+    days_col = np.r_[order_day[row_order], order_day[row_order[planted_rows]] + rng.integers(1, 21, len(planted_rows))]
+    items_col = np.r_[row_item, np.ones(len(planted_rows), dtype=np.int64)]
+    items_col[planted_rows] = 0
+    
+    return customers_col, orders_col, days_col, items_col
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential pattern mining benchmark')
+    parser.add_argument('--customers', type=int, default=1_000_000, help='Customers to generate')
+    parser.add_argument('--products', type=int, default=500, help='Distinct products')
+    parser.add_argument('--min-support', type=float, default=0.005, help='Minimum share of customers')
+    parser.add_argument('--max-gap-days', type=int, default=30, help='Maximum days between pattern items')
+    parser.add_argument('--max-length', type=int, default=3, help='Maximum items in a pattern')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes for the parallel run')
+    args = parser.parse_args()
+    
+    print(f"Generating purchase histories for {args.customers:,} customers...")
+    customers, orders, days, items = build_histories(args.customers, args.products)
+    print(f"  {len(items):,} purchase rows, {len(np.unique(orders)):,} orders")
+    
+    start = time.perf_counter()
+    index = sequence_mining.build_sequence_index(customers, orders, days, items, args.max_gap_days)
+    index_s = time.perf_counter() - start
+    
+    timings = {}
+    results = None
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        results = sequence_mining.mine_sequential_patterns(
+            index, args.min_support, args.max_length, max_workers=workers
+        )
+        timings[workers] = time.perf_counter() - start
+    
+    planted = [count for pattern, count, _ in results if pattern == (0, 1)]
+    
+    print("\n" + "="*60)
+    print("SEQUENTIAL PATTERN MINING BENCHMARK")
+    print("="*60)
+    print(f"Customers:           {index['customer_count']:,}")
+    print(f"Orders (events):     {index['n_events']:,}")
+    print(f"Index build:         {index_s:.2f}s")
+    for workers, seconds in timings.items():
+        print(f"Mining, {workers:>2} worker(s): {seconds:.2f}s ({index['customer_count'] / seconds:,.0f} customers/sec)")
+    if len(timings) > 1:
+        print(f"Parallel speedup:    {timings[1] / timings[args.workers]:.1f}x")
+    print(f"Patterns found:      {len(results):,}")
+    print(f"Planted 0 -> 1:      {planted[0] if planted else 0:,} customers")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
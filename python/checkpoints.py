@@ -0,0 +1,299 @@
+"""
+Consumer360: Step Checkpoint Store
+Week 4: Automation & Handoff
+
+This script stores intermediate pipeline artifacts (extracted frames, encoded
+matrices, frequent itemsets, scored customers) so a failed run can resume from
+the last completed step, and unchanged steps are skipped on the next run.
+
+Artifacts are content-addressed: each one is saved under a hash of the step
+name, its inputs and the config it depends on. Extracted frames depend on the
+database state: their keys include the Fact_Sales and dimension watermarks
+(or the export files' sizes and modification times), so new sales and
+dimension edits invalidate them, and they are only reused within
+CHECKPOINT_CONFIG['extraction_ttl_hours']. Their keys also carry the
+extraction's db_utils.EXTRACT_VERSIONS entry, and frames with recency
+measures (DaysSinceLastPurchase) the run date; see extract_key. Downstream
+steps are keyed by a fingerprint of the extracted data itself.
+"""
+
+import os
+import glob
+import json
+import time
+import pickle
+import hashlib
+import logging
+from pathlib import Path
+import pandas as pd
+from datetime import date
+from db_utils import get_sales_watermark, get_dimension_watermark, EXTRACT_VERSIONS
+from config import (
+    CHECKPOINT_CONFIG, CHECKPOINT_DIR,
+    DB_CONFIG, DB_BACKEND, SQLITE_DB_PATH, DUCKDB_CONFIG,
+    DATA_SOURCE, LOCAL_EXPORT_CONFIG
+)
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Steps whose artifacts are extracted from the source (see source_identity)
+EXTRACT_STEPS = ('rfm_extract', 'rfm_sharded', 'rfm_region_extract', 'mb_extract', 'seq_extract')
+
+
+def checkpoint_key(step, *inputs):
+    """
+    Hash a step name with its inputs and config
+    
+    Args:
+        step (str): Step name
+        *inputs: JSON-serialisable inputs (config dicts, upstream keys, fingerprints)
+    
+    Returns:
+        str: Hex digest identifying the artifact
+    """
+    payload = json.dumps([step, *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def extract_key(step, extraction, *inputs, by_run_date=False):
+    """
+    Key of a step that extracts from the source
+    
+    Args:
+        step (str): Step name
+        extraction (str): Extraction the step runs (a key of db_utils.EXTRACT_VERSIONS)
+        *inputs: Further JSON-serialisable inputs
+        by_run_date (bool): Include today's date, for frames with recency measures
+    
+    Returns:
+        str: Hex digest identifying the artifact
+    """
+    identity = [source_identity(), extraction, EXTRACT_VERSIONS[extraction]]
+    if by_run_date:
+        identity.append(date.today().isoformat())
+    return checkpoint_key(step, *identity, *inputs)
+
+
+def frame_fingerprint(df):
+    """
+    Content hash of a DataFrame (values, index, column names and dtypes)
+    
+    Args:
+        df (pd.DataFrame): Frame to fingerprint
+    
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _file_stats(files):
+    """Size and modification time of each existing file, keyed by path"""
+    stats = {}
+    for file in files:
+        if file.exists():
+            stat = file.stat()
+            stats[str(file)] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def source_identity():
+    """
+    Identify the database (or export files) an extraction reads from, and its state
+    
+    Database sources include the Fact_Sales watermark (max SalesKey and row
+    count) and the dimension watermark (see db_utils.get_dimension_watermark),
+    so extract checkpoints are not reused once sales arrive or dimensions change.
+    
+    Returns:
+        dict: Backend, data location and change watermark
+    """
+    if DATA_SOURCE == 'files':
+        # Exports are replaced nightly: include each file's size and modification time
+        files = {}
+        for table in ('fact_sales', 'dim_customer', 'dim_product', 'dim_region'):
+            path = Path(LOCAL_EXPORT_CONFIG[table])
+            files.update(_file_stats(sorted(path.glob('*')) if path.is_dir() else [path]))
+        return {'backend': 'files', 'files': files}
+    
+    if DB_BACKEND == 'duckdb':
+        # Parquet-backed tables change when their files are replaced
+        files = {}
+        for pattern in DUCKDB_CONFIG['parquet_tables'].values():
+            files.update(_file_stats(Path(file) for file in sorted(glob.glob(str(pattern)))))
+        return {
+            'backend': 'duckdb', 'path': str(DUCKDB_CONFIG['database']), 'files': files,
+            'sales_watermark': get_sales_watermark(), 'dimension_watermark': get_dimension_watermark()
+        }
+    
+    if DB_BACKEND == 'sqlite':
+        return {
+            'backend': 'sqlite', 'path': str(SQLITE_DB_PATH),
+            'sales_watermark': get_sales_watermark(), 'dimension_watermark': get_dimension_watermark()
+        }
+    
+    return {
+        'backend': 'sqlserver', 'server': DB_CONFIG['server'], 'database': DB_CONFIG['database'],
+        'sales_watermark': get_sales_watermark(), 'dimension_watermark': get_dimension_watermark()
+    }
+
+
+def _checkpoint_path(step, key):
+    """Path of a checkpoint file"""
+    return CHECKPOINT_DIR / step / f"{key}.pkl"
+
+
+def load_checkpoint(step, key, max_age_hours=None):
+    """
+    Load a checkpointed artifact
+    
+    Args:
+        step (str): Step name
+        key (str): Artifact key from checkpoint_key
+        max_age_hours (float, optional): Ignore checkpoints written longer ago than this
+    
+    Returns:
+        object: The artifact, or None if missing, expired or unreadable
+    """
+    path = _checkpoint_path(step, key)
+    if not path.exists():
+        return None
+    
+    try:
+        with open(path, 'rb') as file:
+            entry = pickle.load(file)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    
+    if max_age_hours is not None and time.time() - entry['created'] > max_age_hours * 3600:
+        logger.info(f"Checkpoint for '{step}' expired; recomputing")
+        return None
+    
+    # Touch so eviction treats it as recently used
+    os.utime(path)
+    return entry['artifact']
+
+
+def save_checkpoint(step, key, artifact):
+    """
+    Save an artifact atomically (readers never see a half-written file)
+    
+    Args:
+        step (str): Step name
+        key (str): Artifact key from checkpoint_key
+        artifact (object): Picklable artifact
+    
+    Returns:
+        Path: Checkpoint file written
+    """
+    path = _checkpoint_path(step, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as file:
+        pickle.dump({'created': time.time(), 'artifact': artifact}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    
+    return path
+
+
+def run_step(step, key, func, *args, max_age_hours=None, **kwargs):
+    """
+    Return the checkpointed result of a step, computing and saving it if needed
+    
+    Args:
+        step (str): Step name
+        key (str): Artifact key from checkpoint_key
+        func (callable): Computes the artifact from *args / **kwargs
+        max_age_hours (float, optional): Maximum age of a reusable checkpoint
+    
+    Returns:
+        object: The step result
+    """
+    if not CHECKPOINT_CONFIG['enabled']:
+        return func(*args, **kwargs)
+    
+    artifact = load_checkpoint(step, key, max_age_hours)
+    if artifact is not None:
+        logger.info(f"Reusing checkpoint for '{step}' ({key[:12]})")
+        return artifact
+    
+    artifact = func(*args, **kwargs)
+    save_checkpoint(step, key, artifact)
+    logger.info(f"Checkpoint saved for '{step}' ({key[:12]})")
+    return artifact
+
+
+def evict_checkpoints():
+    """
+    Apply the retention policy in CHECKPOINT_CONFIG
+    
+    Removes checkpoints unused for max_age_days, keeps the max_entries_per_step
+    most recently used per step, then evicts least recently used files until
+    the store is under max_total_mb.
+    
+    Returns:
+        int: Number of checkpoints removed
+    """
+    files = [(path, path.stat()) for path in CHECKPOINT_DIR.glob('*/*.pkl')]
+    files.sort(key=lambda item: item[1].st_mtime, reverse=True)
+    
+    now = time.time()
+    max_age = CHECKPOINT_CONFIG['max_age_days'] * 86400
+    max_bytes = CHECKPOINT_CONFIG['max_total_mb'] * 1024 * 1024
+    
+    keep, evict = [], []
+    per_step = {}
+    for path, stat in files:
+        step = path.parent.name
+        per_step[step] = per_step.get(step, 0) + 1
+        
+        if now - stat.st_mtime > max_age or per_step[step] > CHECKPOINT_CONFIG['max_entries_per_step']:
+            evict.append(path)
+        else:
+            keep.append((path, stat.st_size))
+    
+    total = sum(size for _, size in keep)
+    while keep and total > max_bytes:
+        path, size = keep.pop()
+        evict.append(path)
+        total -= size
+    
+    for path in evict:
+        path.unlink(missing_ok=True)
+    
+    if evict:
+        logger.info(f"Evicted {len(evict)} checkpoints ({total / 1024 / 1024:.1f} MB retained)")
+    
+    return len(evict)
+
+
+def invalidate_checkpoints(steps=EXTRACT_STEPS):
+    """
+    Remove every checkpoint of the given steps
+    
+    Args:
+        steps (tuple): Step names (defaults to the extraction steps)
+    
+    Returns:
+        int: Number of checkpoints removed
+    """
+    removed = 0
+    for step in steps:
+        for path in (CHECKPOINT_DIR / step).glob('*.pkl'):
+            path.unlink(missing_ok=True)
+            removed += 1
+    
+    if removed:
+        logger.info(f"Invalidated {removed} checkpoints of {', '.join(steps)}")
+    
+    return removed
@@ -0,0 +1,476 @@
+"""
+Consumer360: Incremental Cohort Store
+Week 2: Python Logic Core
+
+This script maintains the cohort retention matrix of
+05_cohort_analysis_extraction.sql without recomputing COUNT(DISTINCT ...)
+over the full fact history on every run.
+
+Every (cohort month, months since first purchase) cell keeps a mergeable
+distinct-customer sketch:
+    - exact:  the sorted CustomerKeys, while the cell holds up to exact_threshold customers
+    - hll:    HyperLogLog registers (splitmix64 hash), once the cell grows past that
+
+Only completed sales with a SalesKey above the stored watermark are read on a
+refresh, and only the cells they touch are updated. Month_7_Plus merges the
+sketches of all offsets >= 7, so it counts each customer once.
+
+Like 05_cohort_analysis_extraction.sql, only customers in Dim_Customer are
+counted. Incremental refreshes cannot see some changes, so the store drifts
+from the SQL matrix until the next full rebuild:
+    - a sale whose OrderStatus later changes to or from 'Completed'
+    - rows committed late with a SalesKey below the watermark
+    - sales of customers added to Dim_Customer after the sales were read, or
+      of customers since deleted from it
+    - a late-arriving sale dated before a customer's known first purchase,
+      which would move the customer to an earlier cohort (these are logged)
+The store is therefore rebuilt from the full history once it is older than
+COHORT_STORE_CONFIG['full_rebuild_days'], which bounds the drift; --rebuild
+forces one.
+"""
+
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from config import COHORT_STORE_CONFIG, COHORT_STORE_FILE, COHORT_OUTPUT_FILE
+from db_utils import get_cohort_fact_rows, get_sales_watermark
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _splitmix64(keys):
+    """64-bit splitmix hash of integer keys (vectorized, wrapping arithmetic)"""
+    with np.errstate(over='ignore'):
+        z = np.asarray(keys).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(values):
+    """Number of significant bits of each uint64 value"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = (values >> np.uint64(shift)) > 0
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def _hll_update(registers, keys, precision):
+    """Add CustomerKeys to HyperLogLog registers in place"""
+    hashes = _splitmix64(keys)
+    remaining_bits = 64 - precision
+    
+    index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+    # Position of the leftmost 1-bit in the remaining bits (remaining_bits + 1 if none)
+    rank = (remaining_bits - _bit_length(remainder).astype(np.int64) + 1).astype(np.uint8)
+    
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def _hll_estimate(registers):
+    """Cardinality estimate of HyperLogLog registers"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        estimate = m * np.log(m / zeros)
+    
+    return estimate
+
+
+def _new_registers(precision):
+    """Empty HyperLogLog registers"""
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+
+def _add_to_cell(cell, keys, precision, exact_threshold):
+    """
+    Add customers to a cell sketch
+    
+    Args:
+        cell (tuple): ('exact', sorted keys) or ('hll', registers), or None for a new cell
+        keys (np.ndarray): CustomerKeys to add
+        precision (int): HyperLogLog precision
+        exact_threshold (int): Largest exact cell
+    
+    Returns:
+        tuple: Updated cell
+    """
+    if cell is None:
+        cell = ('exact', np.zeros(0, dtype=np.int64))
+    
+    kind, data = cell
+    if kind == 'exact':
+        merged = np.union1d(data, keys)
+        if len(merged) <= exact_threshold:
+            return ('exact', merged)
+        return ('hll', _hll_update(_new_registers(precision), merged, precision))
+    
+    return ('hll', _hll_update(data, keys, precision))
+
+
+def _merge_cells(cells, precision):
+    """Union of several cell sketches"""
+    exact = [data for kind, data in cells if kind == 'exact']
+    registers = [data for kind, data in cells if kind == 'hll']
+    
+    keys = np.unique(np.concatenate(exact)) if exact else np.zeros(0, dtype=np.int64)
+    if not registers:
+        return ('exact', keys)
+    
+    merged = np.maximum.reduce(registers)
+    return ('hll', _hll_update(merged, keys, precision))
+
+
+def cell_cardinality(cell):
+    """
+    Distinct customers in a cell (exact, or estimated from HyperLogLog registers)
+    
+    Args:
+        cell (tuple): Cell sketch, or None for an empty cell
+    
+    Returns:
+        int: Distinct customer count
+    """
+    if cell is None:
+        return 0
+    
+    kind, data = cell
+    if kind == 'exact':
+        return len(data)
+    
+    return int(round(_hll_estimate(data)))
+
+
+def new_cohort_store(precision=None):
+    """
+    Create an empty cohort store
+    
+    Args:
+        precision (int, optional): HyperLogLog precision (defaults to COHORT_STORE_CONFIG)
+    
+    Returns:
+        dict: Empty store
+    """
+    return {
+        'precision': precision or COHORT_STORE_CONFIG['hll_precision'],
+        'watermark': 0,
+        'built_at': time.time(),  # Start of the last full build (epoch seconds)
+        # Sorted CustomerKeys and their first completed purchase month (year * 12 + month - 1)
+        'customer_keys': np.zeros(0, dtype=np.int64),
+        'first_month': np.zeros(0, dtype=np.int64),
+        'cells': {},
+    }
+
+
+def save_cohort_store(store, path=None):
+    """
+    Save a cohort store atomically as one compressed .npz file
+    
+    Args:
+        store (dict): Cohort store
+        path (Path, optional): Target file (defaults to COHORT_STORE_FILE)
+    
+    Returns:
+        Path: File written
+    """
+    path = path or COHORT_STORE_FILE
+    
+    exact = sorted(cell for cell, (kind, _) in store['cells'].items() if kind == 'exact')
+    sketched = sorted(cell for cell, (kind, _) in store['cells'].items() if kind == 'hll')
+    exact_keys = [store['cells'][cell][1] for cell in exact]
+    
+    tmp_path = path.with_name(path.stem + '.tmp.npz')
+    np.savez_compressed(
+        tmp_path,
+        precision=store['precision'],
+        watermark=store['watermark'],
+        built_at=store['built_at'],
+        customer_keys=store['customer_keys'],
+        first_month=store['first_month'],
+        exact_cells=np.array(exact, dtype=np.int64).reshape(-1, 2),
+        exact_offsets=np.concatenate([[0], np.cumsum([len(keys) for keys in exact_keys], dtype=np.int64)]),
+        exact_keys=np.concatenate(exact_keys) if exact_keys else np.zeros(0, dtype=np.int64),
+        hll_cells=np.array(sketched, dtype=np.int64).reshape(-1, 2),
+        hll_registers=(
+            np.stack([store['cells'][cell][1] for cell in sketched]) if sketched
+            else np.zeros((0, 1 << store['precision']), dtype=np.uint8)
+        ),
+    )
+    os.replace(tmp_path, path)
+    
+    logger.info(f"Cohort store saved to: {path} ({path.stat().st_size:,} bytes)")
+    return path
+
+
+def load_cohort_store(path=None):
+    """
+    Load the cohort store, or create an empty one if none has been saved
+    
+    Args:
+        path (Path, optional): Store file (defaults to COHORT_STORE_FILE)
+    
+    Returns:
+        dict: Cohort store
+    """
+    path = path or COHORT_STORE_FILE
+    if not path.exists():
+        return new_cohort_store()
+    
+    with np.load(path) as data:
+        store = new_cohort_store(int(data['precision']))
+        if store['precision'] != COHORT_STORE_CONFIG['hll_precision']:
+            raise ValueError(
+                f"Cohort store uses precision {store['precision']}, config has "
+                f"{COHORT_STORE_CONFIG['hll_precision']}; run with --rebuild"
+            )
+        
+        store['watermark'] = int(data['watermark'])
+        # Stores saved before built_at was recorded are due for a rebuild
+        store['built_at'] = float(data['built_at']) if 'built_at' in data.files else 0.0
+        store['customer_keys'] = data['customer_keys']
+        store['first_month'] = data['first_month']
+        
+        offsets = data['exact_offsets']
+        exact_keys = data['exact_keys']
+        for i, (cohort, offset) in enumerate(data['exact_cells']):
+            store['cells'][(int(cohort), int(offset))] = ('exact', exact_keys[offsets[i]:offsets[i + 1]])
+        for (cohort, offset), registers in zip(data['hll_cells'], data['hll_registers']):
+            store['cells'][(int(cohort), int(offset))] = ('hll', registers.copy())
+    
+    return store
+
+
+def _month_index(order_dates):
+    """Calendar month number (year * 12 + month - 1), so DATEDIFF(MONTH) is a subtraction"""
+    dates = pd.DatetimeIndex(pd.to_datetime(order_dates))
+    return (dates.year.to_numpy(dtype=np.int64) * 12 + dates.month.to_numpy(dtype=np.int64) - 1)
+
+
+def update_cohort_store(store, rows, exact_threshold=None):
+    """
+    Apply new completed sales to the store, touching only the affected cells
+    
+    Args:
+        store (dict): Cohort store (updated in place)
+        rows (pd.DataFrame): SalesKey, CustomerKey, OrderDate of new completed sales
+        exact_threshold (int, optional): Largest exact cell (defaults to COHORT_STORE_CONFIG)
+    
+    Returns:
+        dict: Update statistics (rows, new customers, cells touched, late rows)
+    """
+    exact_threshold = exact_threshold or COHORT_STORE_CONFIG['exact_threshold']
+    stats = {'rows': len(rows), 'new_customers': 0, 'cells_touched': 0, 'late_rows': 0}
+    if rows.empty:
+        return stats
+    
+    customers = rows['CustomerKey'].to_numpy(dtype=np.int64)
+    months = _month_index(rows['OrderDate'])
+    
+    # 1. First purchase month per customer: merge the batch minimum into the stored one
+    order = np.lexsort((months, customers))
+    sorted_customers = customers[order]
+    starts = np.flatnonzero(np.r_[True, sorted_customers[1:] != sorted_customers[:-1]])
+    batch_customers = sorted_customers[starts]
+    batch_first = months[order][starts]
+    
+    known_keys, known_first = store['customer_keys'], store['first_month']
+    known = np.zeros(len(batch_customers), dtype=bool)
+    late = np.zeros(len(batch_customers), dtype=bool)
+    if len(known_keys):
+        pos = np.minimum(np.searchsorted(known_keys, batch_customers), len(known_keys) - 1)
+        known = known_keys[pos] == batch_customers
+        late = known & (batch_first < known_first[pos])
+    
+    if late.any():
+        stats['late_rows'] = int(np.isin(customers, batch_customers[late]).sum())
+        logger.warning(
+            f"{late.sum()} customers have sales dated before their recorded first purchase; "
+            f"their cohort cells are stale until the store is rebuilt (--rebuild)"
+        )
+    
+    new_keys = batch_customers[~known]
+    stats['new_customers'] = len(new_keys)
+    merged_keys = np.concatenate([known_keys, new_keys])
+    merged_first = np.concatenate([known_first, batch_first[~known]])
+    key_order = np.argsort(merged_keys, kind='stable')
+    store['customer_keys'] = merged_keys[key_order]
+    store['first_month'] = merged_first[key_order]
+    
+    # 2. (cohort, offset, customer) triples of the new rows
+    cohorts = store['first_month'][np.searchsorted(store['customer_keys'], customers)]
+    triples = pd.DataFrame({
+        'Cohort': cohorts,
+        'Offset': months - cohorts,
+        'CustomerKey': customers,
+    }).drop_duplicates()
+    triples = triples[triples['Offset'] >= 0]
+    
+    # 3. Update only the cells the new rows fall into
+    precision = store['precision']
+    for (cohort, offset), group in triples.groupby(['Cohort', 'Offset'], sort=False):
+        cell = (int(cohort), int(offset))
+        store['cells'][cell] = _add_to_cell(
+            store['cells'].get(cell),
+            group['CustomerKey'].to_numpy(dtype=np.int64),
+            precision,
+            exact_threshold
+        )
+    
+    stats['cells_touched'] = triples[['Cohort', 'Offset']].drop_duplicates().shape[0]
+    store['watermark'] = max(store['watermark'], int(rows['SalesKey'].max()))
+    
+    return stats
+
+
+def refresh_cohort_store(rebuild=False, path=None):
+    """
+    Load the store, apply completed sales past its watermark and save it
+    
+    The store is rebuilt from the full history instead when asked to, or when
+    its last full build is older than COHORT_STORE_CONFIG['full_rebuild_days'].
+    
+    Args:
+        rebuild (bool): Discard the saved store and rebuild from the full history
+        path (Path, optional): Store file (defaults to COHORT_STORE_FILE)
+    
+    Returns:
+        dict: Updated cohort store
+    """
+    store = None if rebuild else load_cohort_store(path)
+    
+    if store is not None and time.time() - store['built_at'] >= COHORT_STORE_CONFIG['full_rebuild_days'] * 86400:
+        logger.info(f"Cohort store is older than {COHORT_STORE_CONFIG['full_rebuild_days']} days; rebuilding")
+        store = None
+    if store is None:
+        store = new_cohort_store()
+    
+    # Fix the upper bound first so rows inserted during the refresh are picked up next time
+    upper, _ = get_sales_watermark()
+    if upper <= store['watermark']:
+        logger.info(f"Cohort store is up to date (watermark {store['watermark']})")
+        return store
+    
+    logger.info(f"Reading completed sales with SalesKey in ({store['watermark']}, {upper}]...")
+    rows = get_cohort_fact_rows(store['watermark'], upper)
+    
+    stats = update_cohort_store(store, rows)
+    store['watermark'] = upper
+    logger.info(
+        f"Applied {stats['rows']} rows: {stats['new_customers']} new customers, "
+        f"{stats['cells_touched']} cells updated"
+    )
+    
+    save_cohort_store(store, path)
+    return store
+
+
+def _round_half_up(values):
+    """Round to 2 decimals like CAST(... AS DECIMAL(5,2))"""
+    return np.floor(values * 100 + 0.5) / 100
+
+
+def retention_matrix(store, max_offset=None):
+    """
+    Read the cohort retention matrix from the sketches
+    
+    Args:
+        store (dict): Cohort store
+        max_offset (int, optional): Last single-month column (defaults to COHORT_STORE_CONFIG)
+    
+    Returns:
+        pd.DataFrame: Same columns as 05_cohort_analysis_extraction.sql, newest cohort first
+    """
+    max_offset = max_offset if max_offset is not None else COHORT_STORE_CONFIG['max_offset']
+    cells = store['cells']
+    
+    cohorts = sorted({cohort for cohort, _ in cells}, reverse=True)
+    rows = []
+    for cohort in cohorts:
+        row = {'CohortMonth': f"{cohort // 12:04d}-{cohort % 12 + 1:02d}"}
+        for offset in range(max_offset + 1):
+            row[f"Month_{offset}"] = cell_cardinality(cells.get((cohort, offset)))
+        
+        later = [cell for (c, offset), cell in cells.items() if c == cohort and offset > max_offset]
+        row[f"Month_{max_offset + 1}_Plus"] = cell_cardinality(_merge_cells(later, store['precision'])) if later else 0
+        rows.append(row)
+    
+    df = pd.DataFrame(rows, columns=(
+        ['CohortMonth'] + [f"Month_{offset}" for offset in range(max_offset + 1)] + [f"Month_{max_offset + 1}_Plus"]
+    ))
+    
+    base = df['Month_0'].replace(0, np.nan)
+    for offset in (1, 3, 6):
+        if offset <= max_offset:
+            df[f"RetentionRate_Month{offset}"] = _round_half_up(df[f"Month_{offset}"] * 100.0 / base)
+    
+    return df
+
+
+def main(rebuild=False):
+    """
+    Main execution function for the cohort store
+    
+    Args:
+        rebuild (bool): Rebuild the store from the full fact history
+    """
+    try:
+        logger.info("="*60)
+        logger.info("Starting Cohort Store Refresh")
+        logger.info("="*60)
+        
+        # 1. Apply new sales to the sketches
+        logger.info("Step 1: Updating cohort sketches...")
+        store = refresh_cohort_store(rebuild=rebuild)
+        
+        sketched = sum(1 for kind, _ in store['cells'].values() if kind == 'hll')
+        logger.info(f"{len(store['cells'])} cells ({sketched} HyperLogLog), {len(store['customer_keys'])} customers")
+        
+        # 2. Read the retention matrix
+        logger.info("Step 2: Reading retention matrix...")
+        matrix = retention_matrix(store)
+        
+        # 3. Save results
+        logger.info("Step 3: Saving results...")
+        matrix.to_csv(COHORT_OUTPUT_FILE, index=False)
+        logger.info(f"Cohort retention matrix saved to: {COHORT_OUTPUT_FILE}")
+        
+        print("\n" + "="*80)
+        print("COHORT RETENTION MATRIX")
+        print("="*80)
+        print(matrix.head(12).to_string(index=False))
+        print("\n" + "="*80)
+        
+        logger.info("="*60)
+        logger.info("Cohort Store Refresh Completed Successfully!")
+        logger.info("="*60)
+        
+        return matrix
+    
+    except Exception as e:
+        logger.error(f"Error in cohort store refresh: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consumer360 incremental cohort store')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the store from the full fact history')
+    args = parser.parse_args()
+    
+    matrix = main(rebuild=args.rebuild)
@@ -23,6 +23,40 @@ DB_CONFIG = {
 USE_SQLITE = False  # Set to True to use SQLite instead of SQL Server
 SQLITE_DB_PATH = 'data/consumer360.db'
 
+# Database Backend
+# 'sqlserver' - SQL Server through pyodbc (DB_CONFIG)
+# 'sqlite'    - local SQLite file (SQLITE_DB_PATH); also selected by USE_SQLITE
+# 'duckdb'    - embedded columnar DuckDB (DUCKDB_CONFIG); tables can be Parquet exports
+DB_BACKEND = 'sqlite' if USE_SQLITE else 'sqlserver'
+DUCKDB_CONFIG = {
+    'database': 'data/consumer360.duckdb',
+    # Tables read straight from Parquet as views, e.g. {'Fact_Sales': 'exports/fact_sales/*.parquet'}
+    'parquet_tables': {},
+    'threads': None,  # Worker threads (None = one per core)
+}
+
+# Data Source
+# 'database' - extract with SQL from SQL Server / SQLite
+# 'files'    - aggregate nightly Parquet/CSV exports locally (no SQL Server needed)
+DATA_SOURCE = 'database'
+LOCAL_EXPORT_CONFIG = {
+    'fact_sales': 'data/exports/Fact_Sales.parquet',  # File or directory of .parquet/.csv files
+    'dim_customer': 'data/exports/Dim_Customer.parquet',
+    'dim_product': 'data/exports/Dim_Product.parquet',
+    'dim_region': 'data/exports/Dim_Region.parquet',  # Needed for per-region RFM only
+    'batch_size': 500000,  # Rows per streaming batch
+}
+
+# Query Fetch Backend
+# 'auto'   - fetch results as Arrow record batches when an Arrow driver is
+#            installed (adbc-driver-sqlite / arrow-odbc), else row-based
+# 'arrow'  - same as auto, but logs a warning when falling back
+# 'python' - always use the row-based DB-API cursor
+QUERY_FETCH_BACKEND = 'auto'
+ARROW_FETCH_CONFIG = {
+    'batch_size': 100000,  # Rows per Arrow record batch (arrow-odbc)
+}
+
 # RFM Scoring Thresholds (can be tuned based on business requirements)
 RFM_THRESHOLDS = {
     'recency_days': [30, 90, 180, 365],  # Days for R-score 5, 4, 3, 2, 1
@@ -30,12 +64,138 @@ RFM_THRESHOLDS = {
     'monetary_revenue': [5000, 2000, 500, 100, 0],  # Revenue for M-score 5, 4, 3, 2, 1
 }
 
+# Sharded RFM Extraction
+# With num_shards > 1, customers are split by CustomerKey % num_shards and each
+# shard is extracted on its own connection in a worker process; scoring runs
+# once over the combined shards.
+RFM_SHARDING = {
+    'num_shards': 1,  # 1 = single query (no sharding)
+    'max_workers': None,  # None = one worker per shard, capped at CPU count
+}
+
+# Online RFM Scoring (rfm_scoring.py)
+# Scores customers from raw metrics using the breakpoints persisted by the
+# last batch run, without touching the database.
+RFM_SCORING_CONFIG = {
+    'host': '127.0.0.1',  # Local HTTP endpoint (python rfm_scoring.py --serve)
+    'port': 8360,
+    'max_batch_size': 10000,  # Customers per HTTP request
+    'keep_versions': 20,  # Versioned model files kept in RFM_MODEL_DIR (oldest are pruned)
+}
+
+# Grouped (per-region) RFM Scoring
+# F/M quantile breakpoints are fitted within each region; regions with fewer
+# customers than min_group_size, or with too few distinct values for five
+# bins, are scored against the global breakpoints instead.
+RFM_GROUPING = {
+    'enabled': False,  # Set to True to also produce per-region segments in the pipeline
+    'group_column': 'RegionKey',
+    'min_group_size': 500,
+}
+
+# Customer segment labels produced by rfm_analysis.assign_segments (in rule order)
+SEGMENT_NAMES = [
+    'Champions',
+    'Loyal Customers',
+    'Potential Loyalist',
+    'Recent Users',
+    'Promising',
+    'Needs Attention',
+    'About To Sleep',
+    "Can't Lose Them",
+    'Hibernating',
+    'Price Sensitive',
+    'Lost',
+    'Other',
+]
+
 # Market Basket Analysis Settings
 MARKET_BASKET_CONFIG = {
     'min_support': 0.01,  # Minimum support (1% of transactions)
     'min_confidence': 0.3,  # Minimum confidence (30%)
     'min_lift': 1.2,  # Minimum lift (20% increase over random)
     'max_length': 3,  # Maximum items in a rule
+    'reduce_transactions': True,  # Drop rare items and collapse duplicate baskets before mining
+}
+
+# Sampled Market Basket Settings (market_basket_analysis.py --sample)
+# For interactive exploration: mine a stratified random sample of transactions
+# at a lowered support threshold and report confidence intervals for each rule.
+MARKET_BASKET_SAMPLING = {
+    'sample_fraction': 0.1,  # Share of transactions drawn from every stratum
+    'stratify_by': 'month',  # 'month' (OrderDate) or 'category' (Category of the transaction's first line)
+    'confidence_level': 0.95,  # For rule intervals and for lowering the mining threshold
+    'random_state': 42,
+    'verify': False,  # Recount surviving rules exactly over all transactions
+}
+
+# Sequential Pattern Mining Settings
+# Mines item sequences across a customer's orders (e.g. "Laptop, then a
+# Laptop Bag within 30 days"); consecutive items must be bought in later orders.
+SEQUENCE_MINING_CONFIG = {
+    'enabled': False,  # Set to True to run sequential pattern mining in the pipeline
+    'min_support': 0.005,  # Minimum share of customers containing the pattern
+    'max_gap_days': 30,  # Maximum days between consecutive items (None = no limit)
+    'max_length': 3,  # Maximum items in a pattern
+    'max_workers': None,  # Worker processes (None = CPU count, 1 = no pool)
+    'chunk_rows': 5_000_000,  # Projected rows materialised at once
+}
+
+# Cohort Store Settings (cohort_store.py)
+# One mergeable distinct-customer sketch per (cohort month, month offset) cell,
+# updated incrementally from new Fact_Sales rows past a SalesKey watermark.
+COHORT_STORE_CONFIG = {
+    'enabled': False,  # Set to True to refresh the cohort matrix in the pipeline
+    'exact_threshold': 2048,  # Cells keep exact CustomerKeys up to this many customers
+    'hll_precision': 14,  # HyperLogLog registers = 2 ** precision (~0.8% standard error)
+    'max_offset': 6,  # Month_0 .. Month_6, then Month_7_Plus
+    'full_rebuild_days': 7,  # Rebuild from the full history periodically (see cohort_store.py)
+}
+
+# Lookalike Search Settings (lookalike.py)
+# Customers are compared on log-scaled, standardised RFM metrics with exact
+# nearest-neighbour search (KD-tree, or blocks of float64 matrix products).
+LOOKALIKE_CONFIG = {
+    'features': ['DaysSinceLastPurchase', 'TotalOrders', 'TotalRevenue', 'AvgOrderValue'],
+    'search': 'auto',  # 'auto' (KD-tree when scipy is installed), 'kdtree' or 'blocked'
+    'query_block': 1024,  # Query rows per distance tile
+    'reference_block': 8192,  # Indexed rows per distance tile (tile = 1024 x 8192 float64 = 64 MB)
+    'default_count': 10000,  # Lookalikes returned per seed set
+}
+
+# Dimension Cache Settings (dimension_cache.py)
+# A long-lived scheduler process keeps Dim_Customer and Dim_Product in memory;
+# RFM and market basket extraction then fetch only surrogate keys and measures
+# and join attributes locally. Changed rows are re-read by UpdatedDate.
+DIMENSION_CACHE_CONFIG = {
+    'enabled': False,  # Set to True when running under automation/scheduler.py
+    'refresh_interval_seconds': 60,  # Skip the UpdatedDate check if the cache is younger than this
+    'full_reload_hours': 24,  # Reload in full periodically to drop hard-deleted rows
+    'tables': {
+        'Dim_Customer': {'key': 'CustomerKey', 'columns': ['CustomerID', 'CustomerName', 'Email']},
+        'Dim_Product': {'key': 'ProductKey', 'columns': ['ProductName', 'Category', 'SubCategory']},
+    },
+}
+
+# Warehouse Write-Back Settings
+# Segmentation results and mined rules are bulk-loaded into warehouse tables
+# so Power BI can query them instead of reading the CSV exports.
+WRITEBACK_CONFIG = {
+    'enabled': False,  # Set to True to write results back to the warehouse
+    'batch_size': 5000,  # Rows per executemany batch
+    'segment_table': 'Fact_CustomerSegment',
+    'rules_table': 'Fact_MarketBasketRule',
+}
+
+# Step Checkpoints
+# Intermediate artifacts are stored under a hash of their inputs and config so
+# a failed run resumes from the last completed step and unchanged steps are skipped.
+CHECKPOINT_CONFIG = {
+    'enabled': True,
+    'extraction_ttl_hours': 12,  # Extracted frames are reused for resume within this window
+    'max_age_days': 14,  # Evict checkpoints not used for this long
+    'max_entries_per_step': 3,  # Keep only the most recently used entries per step
+    'max_total_mb': 2048,  # Evict least recently used checkpoints above this size
 }
 
 # Output Directories
@@ -48,11 +208,53 @@ REPORTS_DIR.mkdir(exist_ok=True)
 DATA_DIR = OUTPUT_DIR / 'data'
 DATA_DIR.mkdir(exist_ok=True)
 
+SEGMENT_HISTORY_DIR = DATA_DIR / 'segment_history'
+SEGMENT_HISTORY_DIR.mkdir(exist_ok=True)
+
+CHECKPOINT_DIR = OUTPUT_DIR / 'checkpoints'
+CHECKPOINT_DIR.mkdir(exist_ok=True)
+
+RFM_MODEL_DIR = DATA_DIR / 'rfm_models'
+RFM_MODEL_DIR.mkdir(exist_ok=True)
+
 # File Paths
 RFM_OUTPUT_FILE = DATA_DIR / 'rfm_segmentation.csv'
 MARKET_BASKET_OUTPUT_FILE = DATA_DIR / 'market_basket_rules.csv'
+MARKET_BASKET_SAMPLED_OUTPUT_FILE = DATA_DIR / 'market_basket_rules_sampled.csv'
 COHORT_OUTPUT_FILE = DATA_DIR / 'cohort_analysis.csv'
+COHORT_STORE_FILE = DATA_DIR / 'cohort_store.npz'
+LOOKALIKE_OUTPUT_FILE = DATA_DIR / 'lookalike_customers.csv'
+RFM_BACKFILL_OUTPUT_FILE = DATA_DIR / 'rfm_backfill.csv'
+RFM_REGION_OUTPUT_FILE = DATA_DIR / 'rfm_segmentation_by_region.csv'
+SEQUENCE_OUTPUT_FILE = DATA_DIR / 'sequential_patterns.csv'
+RFM_MODEL_FILE = RFM_MODEL_DIR / 'rfm_model_latest.json'
 
 # Logging Configuration
 LOG_FILE = OUTPUT_DIR / 'consumer360.log'
 LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+# Change-Driven Scheduling (automation/scheduler.py --mode triggered)
+# Polls a cheap Fact_Sales watermark and runs the pipeline once enough new
+# sales have landed, or once data has changed and the last run is stale.
+TRIGGER_CONFIG = {
+    'poll_interval_seconds': 300,  # How often to poll the watermark
+    'min_new_rows': 5000,  # New fact rows that trigger a run
+    'max_staleness_hours': 24,  # Run on any change once the last run is this old
+    'debounce_seconds': 600,  # Wait for the watermark to stop moving before running
+    'max_debounce_seconds': 3600,  # ...but never delay a due run longer than this
+    'retry_backoff_seconds': 300,  # Wait after a failed run, doubled per consecutive failure
+    'max_retry_backoff_seconds': 6 * 3600,  # Cap on that wait
+    'max_retries_per_watermark': 3,  # Then wait for new data before retrying
+}
+TRIGGER_STATE_FILE = OUTPUT_DIR / 'trigger_state.json'
+TRIGGER_LATENCY_FILE = OUTPUT_DIR / 'trigger_latency.csv'
+
+# Query Telemetry
+# Every execute_query call records execute / first-row / fetch / DataFrame
+# build timings; queries over the threshold go to the slow-query log.
+QUERY_TELEMETRY_CONFIG = {
+    'slow_query_threshold_seconds': 2.0,  # Matches the sub-2-second query target
+    'max_records': 1000,  # Telemetry records kept in memory per process
+}
+SLOW_QUERY_LOG_FILE = OUTPUT_DIR / 'slow_queries.log'
+
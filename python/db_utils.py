@@ -3,10 +3,18 @@ Consumer360: Database Connection Utilities
 Week 2: Python Logic Core
 """
 
+import re
+import time
+import hashlib
 import pyodbc
 import pandas as pd
 import sqlite3
-from config import DB_CONFIG, USE_SQLITE, SQLITE_DB_PATH
+from datetime import datetime
+from config import (
+    DB_CONFIG, DB_BACKEND, SQLITE_DB_PATH, DUCKDB_CONFIG, DATA_SOURCE,
+    QUERY_TELEMETRY_CONFIG, SLOW_QUERY_LOG_FILE,
+    QUERY_FETCH_BACKEND, ARROW_FETCH_CONFIG, DIMENSION_CACHE_CONFIG
+)
 import logging
 
 # Set up logging
@@ -16,6 +24,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-query telemetry records for this process (most recent last)
+TELEMETRY_COLUMNS = [
+    'query_name', 'backend', 'started_at', 'execute_s', 'first_row_s', 'fetch_s',
+    'build_s', 'total_s', 'rows', 'approx_bytes'
+]
+QUERY_TELEMETRY = []
+
+# Output schema version of each extraction, part of its checkpoint keys
+# (checkpoints.extract_key): bump an entry whenever that extraction's columns
+# or semantics change, so frames cached by older code are not reused
+EXTRACT_VERSIONS = {
+    'rfm': 1,
+    'rfm_by_region': 1,
+    'market_basket': 1,
+    'sequence': 1,
+}
+
+
+def get_sql_server_connection_string():
+    """
+    Build the ODBC connection string for SQL Server from DB_CONFIG
+    
+    Returns:
+        str: ODBC connection string
+    """
+    if DB_CONFIG.get('trusted_connection') == 'yes':
+        return (
+            f"DRIVER={{{DB_CONFIG['driver']}}};"
+            f"SERVER={DB_CONFIG['server']};"
+            f"DATABASE={DB_CONFIG['database']};"
+            f"Trusted_Connection=yes;"
+        )
+    
+    return (
+        f"DRIVER={{{DB_CONFIG['driver']}}};"
+        f"SERVER={DB_CONFIG['server']};"
+        f"DATABASE={DB_CONFIG['database']};"
+        f"UID={DB_CONFIG['username']};"
+        f"PWD={DB_CONFIG['password']};"
+    )
+
 
 def get_sql_server_connection():
     """
@@ -25,23 +74,7 @@ def get_sql_server_connection():
         pyodbc.Connection: Database connection object
     """
     try:
-        if DB_CONFIG.get('trusted_connection') == 'yes':
-            conn_str = (
-                f"DRIVER={{{DB_CONFIG['driver']}}};"
-                f"SERVER={DB_CONFIG['server']};"
-                f"DATABASE={DB_CONFIG['database']};"
-                f"Trusted_Connection=yes;"
-            )
-        else:
-            conn_str = (
-                f"DRIVER={{{DB_CONFIG['driver']}}};"
-                f"SERVER={DB_CONFIG['server']};"
-                f"DATABASE={DB_CONFIG['database']};"
-                f"UID={DB_CONFIG['username']};"
-                f"PWD={DB_CONFIG['password']};"
-            )
-        
-        conn = pyodbc.connect(conn_str)
+        conn = pyodbc.connect(get_sql_server_connection_string())
         logger.info("Successfully connected to SQL Server")
         return conn
     
@@ -67,40 +100,363 @@ def get_sqlite_connection():
         raise
 
 
+def get_duckdb_connection():
+    """
+    Create connection to the embedded DuckDB database
+    
+    Tables listed in DUCKDB_CONFIG['parquet_tables'] are created as temporary
+    views over their Parquet files, so nightly exports are queried in place
+    without being loaded first.
+    
+    Returns:
+        duckdb.DuckDBPyConnection: Database connection object
+    """
+    import duckdb
+    
+    try:
+        conn = duckdb.connect(DUCKDB_CONFIG['database'])
+        if DUCKDB_CONFIG['threads']:
+            conn.execute(f"SET threads = {int(DUCKDB_CONFIG['threads'])}")
+        
+        for table, path in DUCKDB_CONFIG['parquet_tables'].items():
+            escaped = str(path).replace("'", "''")
+            conn.execute(f"CREATE OR REPLACE TEMP VIEW {table} AS SELECT * FROM read_parquet('{escaped}')")
+        
+        logger.info(f"Successfully connected to DuckDB database: {DUCKDB_CONFIG['database']}")
+        return conn
+    
+    except Exception as e:
+        logger.error(f"Error connecting to DuckDB: {e}")
+        raise
+
+
 def get_connection():
     """
     Get database connection based on configuration
     
     Returns:
-        Connection object (pyodbc or sqlite3)
+        Connection object (pyodbc, sqlite3 or duckdb)
     """
-    if USE_SQLITE:
+    if DB_BACKEND == 'duckdb':
+        return get_duckdb_connection()
+    if DB_BACKEND == 'sqlite':
         return get_sqlite_connection()
+    return get_sql_server_connection()
+
+
+def _sql_days_since(column):
+    """Dialect SQL for DATEDIFF(DAY, column, GETDATE()) (day boundaries crossed)"""
+    if DB_BACKEND == 'duckdb':
+        return f"date_diff('day', CAST({column} AS DATE), current_date)"
+    if DB_BACKEND == 'sqlite':
+        return f"CAST(julianday(date('now', 'localtime')) - julianday(date({column})) AS INTEGER)"
+    return f"DATEDIFF(DAY, {column}, GETDATE())"
+
+
+def _sql_months_between(start, end):
+    """Dialect SQL for DATEDIFF(MONTH, start, end) (month boundaries crossed)"""
+    if DB_BACKEND == 'duckdb':
+        return f"date_diff('month', CAST({start} AS DATE), CAST({end} AS DATE))"
+    if DB_BACKEND == 'sqlite':
+        return (
+            f"((CAST(strftime('%Y', {end}) AS INTEGER) - CAST(strftime('%Y', {start}) AS INTEGER)) * 12"
+            f" + CAST(strftime('%m', {end}) AS INTEGER) - CAST(strftime('%m', {start}) AS INTEGER))"
+        )
+    return f"DATEDIFF(MONTH, {start}, {end})"
+
+
+def _sql_year_month(column):
+    """Dialect SQL for FORMAT(column, 'yyyy-MM')"""
+    if DB_BACKEND == 'duckdb':
+        return f"strftime(CAST({column} AS DATE), '%Y-%m')"
+    if DB_BACKEND == 'sqlite':
+        return f"strftime('%Y-%m', {column})"
+    return f"FORMAT({column}, 'yyyy-MM')"
+
+
+def _fingerprint_sql(query):
+    """
+    Normalise a SQL statement so repeated runs of the same query share a fingerprint
+    
+    Comments are stripped, literals replaced with '?', whitespace collapsed.
+    
+    Returns:
+        tuple: (fingerprint id, normalised SQL)
+    """
+    normalised = re.sub(r'--[^\n]*', ' ', query)
+    normalised = re.sub(r"'(?:[^']|'')*'", '?', normalised)
+    normalised = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalised)
+    normalised = re.sub(r'\s+', ' ', normalised).strip().lower()
+    fingerprint = hashlib.sha1(normalised.encode('utf-8')).hexdigest()[:16]
+    return fingerprint, normalised
+
+
+def _get_slow_query_logger():
+    """Logger writing to the slow-query log file (handler attached once)"""
+    slow_logger = logging.getLogger('consumer360.slow_queries')
+    if not slow_logger.handlers:
+        handler = logging.FileHandler(SLOW_QUERY_LOG_FILE)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        slow_logger.addHandler(handler)
+    return slow_logger
+
+
+def _record_query_telemetry(record, query):
+    """Store a telemetry record and write it to the slow-query log if over threshold"""
+    QUERY_TELEMETRY.append(record)
+    del QUERY_TELEMETRY[:-QUERY_TELEMETRY_CONFIG['max_records']]
+    
+    logger.info(
+        f"Query '{record['query_name']}' ({record['backend']}) returned {record['rows']} rows in {record['total_s']:.3f}s "
+        f"(execute {record['execute_s']:.3f}s, first row {record['first_row_s']:.3f}s, "
+        f"fetch {record['fetch_s']:.3f}s, DataFrame {record['build_s']:.3f}s, "
+        f"~{record['approx_bytes'] / 1024 / 1024:.1f} MB)"
+    )
+    
+    if record['total_s'] >= QUERY_TELEMETRY_CONFIG['slow_query_threshold_seconds']:
+        fingerprint, normalised = _fingerprint_sql(query)
+        _get_slow_query_logger().warning(
+            f"SLOW QUERY [{fingerprint}] name={record['query_name']} total={record['total_s']:.3f}s "
+            f"execute={record['execute_s']:.3f}s first_row={record['first_row_s']:.3f}s "
+            f"fetch={record['fetch_s']:.3f}s build={record['build_s']:.3f}s "
+            f"rows={record['rows']} bytes={record['approx_bytes']} sql={normalised}"
+        )
+
+
+def get_query_telemetry(summary=False):
+    """
+    Get telemetry for queries run through execute_query in this process
+    
+    Args:
+        summary (bool): Aggregate by query name instead of one row per query
+    
+    Returns:
+        pd.DataFrame: Timing breakdown, row counts and approximate bytes
+    """
+    df = pd.DataFrame(QUERY_TELEMETRY, columns=TELEMETRY_COLUMNS)
+    
+    if summary:
+        df = df.groupby('query_name').agg(
+            calls=('rows', 'count'),
+            total_s=('total_s', 'sum'),
+            execute_s=('execute_s', 'sum'),
+            first_row_s=('first_row_s', 'sum'),
+            fetch_s=('fetch_s', 'sum'),
+            build_s=('build_s', 'sum'),
+            rows=('rows', 'sum'),
+            approx_bytes=('approx_bytes', 'sum'),
+        ).sort_values('total_s', ascending=False)
+    
+    return df
+
+
+def _fetch_rows(query, params):
+    """
+    Fetch a query through the DB-API cursor (one Python object per cell)
+    
+    Returns:
+        tuple: (DataFrame, timings dict)
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    start = time.perf_counter()
+    if params:
+        cursor.execute(query, params)
     else:
-        return get_sql_server_connection()
+        cursor.execute(query)
+    executed = time.perf_counter()
+    
+    first_row = cursor.fetchone()
+    first_row_at = time.perf_counter()
+    
+    rows = [tuple(first_row)] if first_row is not None else []
+    rows.extend(tuple(row) for row in cursor.fetchall())
+    fetched = time.perf_counter()
+    
+    columns = [column[0] for column in cursor.description]
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    built = time.perf_counter()
+    
+    cursor.close()
+    conn.close()
+    
+    return df, {
+        'execute_s': executed - start,
+        'first_row_s': first_row_at - executed,
+        'fetch_s': fetched - first_row_at,
+        'build_s': built - fetched,
+        'total_s': built - start,
+    }
+
+
+def _open_arrow_reader(query, params):
+    """
+    Execute a query with an Arrow-native driver
+    
+    SQLite uses the ADBC SQLite driver; SQL Server uses arrow-odbc with the
+    same connection string as pyodbc. Raises ImportError if the driver for
+    the active backend is not installed.
+    
+    Returns:
+        tuple: (record batch reader, resources to close after reading)
+    """
+    if DB_BACKEND == 'sqlite':
+        from adbc_driver_sqlite import dbapi as adbc_sqlite
+        
+        conn = adbc_sqlite.connect(SQLITE_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute(query, params or None)
+        return cursor.fetch_record_batch(), [cursor, conn]
+    
+    from arrow_odbc import read_arrow_batches_from_odbc
+    
+    reader = read_arrow_batches_from_odbc(
+        query=query,
+        connection_string=get_sql_server_connection_string(),
+        batch_size=ARROW_FETCH_CONFIG['batch_size'],
+        parameters=[None if p is None else str(p) for p in params] if params else None,
+    )
+    return reader, []
+
+
+def _fetch_arrow(query, params):
+    """
+    Fetch a query as Arrow record batches and hand pandas columnar buffers
+    
+    Decimal columns are cast to float64 to match coerce_float on the
+    row-based path.
+    
+    Returns:
+        tuple: (DataFrame, timings dict)
+    """
+    import pyarrow as pa
+    
+    start = time.perf_counter()
+    reader, resources = _open_arrow_reader(query, params)
+    executed = time.perf_counter()
+    
+    try:
+        batches = []
+        first_batch = next(iter(reader), None)
+        first_row_at = time.perf_counter()
+        
+        if first_batch is not None:
+            batches.append(first_batch)
+            batches.extend(reader)
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        fetched = time.perf_counter()
+    
+    finally:
+        for resource in resources:
+            resource.close()
+    
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    
+    df = table.to_pandas()
+    built = time.perf_counter()
+    
+    return df, {
+        'execute_s': executed - start,
+        'first_row_s': first_row_at - executed,
+        'fetch_s': fetched - first_row_at,
+        'build_s': built - fetched,
+        'total_s': built - start,
+    }
 
 
-def execute_query(query, params=None):
+def _fetch_duckdb(query, params):
+    """
+    Run a query on DuckDB and materialise the result straight into a DataFrame
+    
+    DuckDB builds the pandas columns from its columnar vectors (DECIMAL
+    becomes float64), so there is no per-row fetch.
+    
+    Returns:
+        tuple: (DataFrame, timings dict)
+    """
+    conn = get_duckdb_connection()
+    
+    try:
+        start = time.perf_counter()
+        result = conn.execute(query, list(params) if params else None)
+        executed = time.perf_counter()
+        
+        df = result.df()
+        fetched = time.perf_counter()
+    
+    finally:
+        conn.close()
+    
+    return df, {
+        'execute_s': executed - start,
+        'first_row_s': 0.0,
+        'fetch_s': fetched - executed,
+        'build_s': 0.0,
+        'total_s': fetched - start,
+    }
+
+
+def execute_query(query, params=None, query_name='adhoc', fetch_backend=None):
     """
     Execute a SQL query and return results as a pandas DataFrame
     
+    Execute time, time to first row, fetch time, DataFrame build time, row
+    count and approximate size are recorded under query_name (see
+    get_query_telemetry). Queries slower than the configured threshold are
+    written to the slow-query log with their SQL fingerprint.
+    
+    With the 'arrow' or 'auto' fetch backend the result is fetched as Arrow
+    record batches; if the Arrow driver is missing or fails, the query falls
+    back to the row-based DB-API path. The DuckDB backend always returns
+    DataFrames natively and ignores fetch_backend.
+    
     Args:
         query (str): SQL query to execute
         params (tuple, optional): Query parameters for parameterized queries
+        query_name (str): Name used to group telemetry (e.g. 'rfm', 'market_basket')
+        fetch_backend (str, optional): 'auto', 'arrow' or 'python' (defaults to QUERY_FETCH_BACKEND)
     
     Returns:
         pd.DataFrame: Query results
     """
+    fetch_backend = fetch_backend or QUERY_FETCH_BACKEND
+    started_at = datetime.now()
+    
     try:
-        conn = get_connection()
+        df = None
         
-        if params:
-            df = pd.read_sql_query(query, conn, params=params)
-        else:
-            df = pd.read_sql_query(query, conn)
+        if DB_BACKEND == 'duckdb':
+            df, timings = _fetch_duckdb(query, params)
+            backend = 'duckdb'
+        
+        elif fetch_backend in ('auto', 'arrow'):
+            try:
+                df, timings = _fetch_arrow(query, params)
+                backend = 'arrow'
+            
+            except ImportError as e:
+                log = logger.warning if fetch_backend == 'arrow' else logger.debug
+                log(f"Arrow fetch unavailable ({e}); using row-based fetch")
+            
+            except Exception as e:
+                logger.warning(f"Arrow fetch failed for '{query_name}' ({e}); falling back to row-based fetch")
+        
+        if df is None:
+            df, timings = _fetch_rows(query, params)
+            backend = 'python'
+        
+        _record_query_telemetry({
+            'query_name': query_name,
+            'backend': backend,
+            'started_at': started_at,
+            **timings,
+            'rows': len(df),
+            'approx_bytes': int(df.memory_usage(deep=True).sum()),
+        }, query)
         
-        conn.close()
-        logger.info(f"Query executed successfully. Returned {len(df)} rows.")
         return df
     
     except Exception as e:
@@ -145,14 +501,36 @@ def execute_sql_file(file_path):
         raise
 
 
-def get_rfm_data():
+def get_rfm_data(num_shards=None, shard=None):
     """
     Extract RFM data from database
     
+    Args:
+        num_shards (int, optional): Split customers into this many shards by CustomerKey % num_shards
+        shard (int, optional): Shard to extract (0 to num_shards - 1)
+    
     Returns:
         pd.DataFrame: Customer RFM metrics
     """
-    query = """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_rfm_data_local
+        
+        df = get_rfm_data_local()
+        if num_shards:
+            df = df[df['CustomerKey'] % num_shards == shard].reset_index(drop=True)
+        return df
+    
+    if DIMENSION_CACHE_CONFIG['enabled']:
+        return join_customer_attributes(get_rfm_metrics(num_shards, shard))
+    
+    if num_shards:
+        shard_filter = "WHERE c.CustomerKey % ? = ?"
+        params = (num_shards, shard)
+    else:
+        shard_filter = ""
+        params = None
+    
+    query = f"""
     WITH CustomerMetrics AS (
         SELECT 
             c.CustomerKey,
@@ -161,7 +539,7 @@ def get_rfm_data():
             c.Email,
             c.SignUpDate,
             c.FirstPurchaseDate,
-            DATEDIFF(DAY, MAX(s.OrderDate), GETDATE()) AS DaysSinceLastPurchase,
+            {_sql_days_since('MAX(s.OrderDate)')} AS DaysSinceLastPurchase,
             COUNT(DISTINCT CASE WHEN s.OrderStatus = 'Completed' THEN s.TransactionID END) AS TotalOrders,
             SUM(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount ELSE 0 END) AS TotalRevenue,
             AVG(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount END) AS AvgOrderValue,
@@ -169,6 +547,7 @@ def get_rfm_data():
             MAX(s.OrderDate) AS LastOrderDate
         FROM Dim_Customer c
         LEFT JOIN Fact_Sales s ON c.CustomerKey = s.CustomerKey
+        {shard_filter}
         GROUP BY 
             c.CustomerKey, c.CustomerID, c.CustomerName, 
             c.Email, c.SignUpDate, c.FirstPurchaseDate
@@ -189,7 +568,279 @@ def get_rfm_data():
     ORDER BY TotalRevenue DESC
     """
     
-    return execute_query(query)
+    return execute_query(query, params, query_name='rfm')
+
+
+def get_rfm_metrics(num_shards=None, shard=None):
+    """
+    Extract get_rfm_data's measures by CustomerKey, without customer attributes
+    
+    Used with the dimension cache: join_customer_attributes adds the
+    attributes afterwards. Grouping Fact_Sales alone gives the same customers
+    as the Dim_Customer LEFT JOIN once the join drops unknown keys, since
+    customers without completed orders are filtered out either way.
+    
+    Args:
+        num_shards (int, optional): Split customers into this many shards by CustomerKey % num_shards
+        shard (int, optional): Shard to extract (0 to num_shards - 1)
+    
+    Returns:
+        pd.DataFrame: CustomerKey and RFM measures
+    """
+    if num_shards:
+        shard_filter = "WHERE s.CustomerKey % ? = ?"
+        params = (num_shards, shard)
+    else:
+        shard_filter = ""
+        params = None
+    
+    query = f"""
+    WITH CustomerMetrics AS (
+        SELECT 
+            s.CustomerKey,
+            {_sql_days_since('MAX(s.OrderDate)')} AS DaysSinceLastPurchase,
+            COUNT(DISTINCT CASE WHEN s.OrderStatus = 'Completed' THEN s.TransactionID END) AS TotalOrders,
+            SUM(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount ELSE 0 END) AS TotalRevenue,
+            AVG(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount END) AS AvgOrderValue,
+            MIN(s.OrderDate) AS FirstOrderDate,
+            MAX(s.OrderDate) AS LastOrderDate
+        FROM Fact_Sales s
+        {shard_filter}
+        GROUP BY s.CustomerKey
+    )
+    SELECT 
+        CustomerKey,
+        DaysSinceLastPurchase,
+        TotalOrders,
+        CAST(TotalRevenue AS DECIMAL(12,2)) AS TotalRevenue,
+        CAST(AvgOrderValue AS DECIMAL(10,2)) AS AvgOrderValue,
+        FirstOrderDate,
+        LastOrderDate
+    FROM CustomerMetrics
+    WHERE TotalOrders > 0
+    ORDER BY TotalRevenue DESC
+    """
+    
+    return execute_query(query, params, query_name='rfm_keys')
+
+
+def join_customer_attributes(df):
+    """
+    Add cached Dim_Customer attributes to get_rfm_metrics rows
+    
+    Args:
+        df (pd.DataFrame): Output of get_rfm_metrics
+    
+    Returns:
+        pd.DataFrame: Same columns as get_rfm_data
+    """
+    from dimension_cache import join_attributes
+    
+    df = join_attributes(df, 'Dim_Customer')
+    return df[[
+        'CustomerKey', 'CustomerID', 'CustomerName', 'Email', 'DaysSinceLastPurchase',
+        'TotalOrders', 'TotalRevenue', 'AvgOrderValue', 'FirstOrderDate', 'LastOrderDate'
+    ]]
+
+
+def get_rfm_data_by_region():
+    """
+    Extract RFM data per (customer, region) pair
+    
+    Same metrics as get_rfm_data, but grouped by the region of each sale, so a
+    customer who buys in two regions appears once per region.
+    
+    Returns:
+        pd.DataFrame: Customer-region RFM metrics with RegionKey and RegionName
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_rfm_data_by_region_local
+        
+        return get_rfm_data_by_region_local()
+    
+    query = f"""
+    WITH CustomerRegionMetrics AS (
+        SELECT 
+            s.CustomerKey,
+            s.RegionKey,
+            c.CustomerID,
+            c.CustomerName,
+            c.Email,
+            r.RegionName,
+            {_sql_days_since('MAX(s.OrderDate)')} AS DaysSinceLastPurchase,
+            COUNT(DISTINCT CASE WHEN s.OrderStatus = 'Completed' THEN s.TransactionID END) AS TotalOrders,
+            SUM(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount ELSE 0 END) AS TotalRevenue,
+            AVG(CASE WHEN s.OrderStatus = 'Completed' THEN s.TotalAmount END) AS AvgOrderValue,
+            MIN(s.OrderDate) AS FirstOrderDate,
+            MAX(s.OrderDate) AS LastOrderDate
+        FROM Fact_Sales s
+        INNER JOIN Dim_Customer c ON s.CustomerKey = c.CustomerKey
+        INNER JOIN Dim_Region r ON s.RegionKey = r.RegionKey
+        GROUP BY 
+            s.CustomerKey, s.RegionKey, c.CustomerID, c.CustomerName,
+            c.Email, r.RegionName
+    )
+    SELECT 
+        CustomerKey,
+        RegionKey,
+        RegionName,
+        CustomerID,
+        CustomerName,
+        Email,
+        DaysSinceLastPurchase,
+        TotalOrders,
+        CAST(TotalRevenue AS DECIMAL(12,2)) AS TotalRevenue,
+        CAST(AvgOrderValue AS DECIMAL(10,2)) AS AvgOrderValue,
+        FirstOrderDate,
+        LastOrderDate
+    FROM CustomerRegionMetrics
+    WHERE TotalOrders > 0
+    ORDER BY RegionKey, TotalRevenue DESC
+    """
+    
+    return execute_query(query, query_name='rfm_by_region')
+
+
+def get_rfm_fact_rows():
+    """
+    Extract the fact rows needed to rebuild RFM metrics at any point in time
+    
+    Returns:
+        pd.DataFrame: CustomerKey, TransactionID, OrderDate, OrderStatus, TotalAmount sorted by OrderDate
+    """
+    query = """
+    SELECT 
+        s.CustomerKey,
+        s.TransactionID,
+        s.OrderDate,
+        s.OrderStatus,
+        s.TotalAmount
+    FROM Fact_Sales s
+    ORDER BY s.OrderDate
+    """
+    
+    return execute_query(query, query_name='rfm_fact_rows')
+
+
+def get_customer_attributes():
+    """
+    Extract descriptive customer attributes
+    
+    Returns:
+        pd.DataFrame: CustomerKey, CustomerID, CustomerName, Email
+    """
+    query = """
+    SELECT 
+        CustomerKey,
+        CustomerID,
+        CustomerName,
+        Email
+    FROM Dim_Customer
+    """
+    
+    return execute_query(query, query_name='dim_customer')
+
+
+def get_sales_watermark():
+    """
+    Get a cheap change watermark for Fact_Sales
+    
+    MAX(SalesKey) is a seek on the clustered primary key. On SQL Server the
+    row count comes from partition metadata instead of scanning the table.
+    
+    Returns:
+        tuple: (max SalesKey, row count)
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_sales_watermark_local
+        
+        return get_sales_watermark_local()
+    
+    if DB_BACKEND in ('sqlite', 'duckdb'):
+        query = "SELECT MAX(SalesKey) AS MaxSalesKey, COUNT(*) AS TotalRows FROM Fact_Sales"
+    else:
+        query = """
+        SELECT 
+            (SELECT MAX(SalesKey) FROM Fact_Sales) AS MaxSalesKey,
+            (SELECT SUM(p.rows) FROM sys.partitions p
+             WHERE p.object_id = OBJECT_ID('Fact_Sales') AND p.index_id IN (0, 1)) AS TotalRows
+        """
+    
+    df = execute_query(query, query_name='sales_watermark', fetch_backend='python')
+    max_key, total_rows = df.iloc[0]
+    
+    return int(max_key or 0), int(total_rows or 0)
+
+
+def get_dimension_watermark():
+    """
+    Get a cheap change watermark for the dimensions joined by the extractions
+    
+    Dim_Customer and Dim_Product rows carry UpdatedDate (set on insert, and
+    by any update that maintains it); their row counts catch hard deletes.
+    Dim_Region has no UpdatedDate but only a handful of rows, so its content
+    is hashed instead.
+    
+    Returns:
+        dict: (newest UpdatedDate, row count) per table, and a Dim_Region hash
+    """
+    query = """
+    SELECT
+        (SELECT MAX(UpdatedDate) FROM Dim_Customer) AS CustomerUpdated,
+        (SELECT COUNT(*) FROM Dim_Customer) AS CustomerRows,
+        (SELECT MAX(UpdatedDate) FROM Dim_Product) AS ProductUpdated,
+        (SELECT COUNT(*) FROM Dim_Product) AS ProductRows
+    """
+    customer_updated, customer_rows, product_updated, product_rows = execute_query(
+        query, query_name='dimension_watermark', fetch_backend='python'
+    ).iloc[0]
+    
+    regions = execute_query("SELECT * FROM Dim_Region", query_name='region_watermark', fetch_backend='python')
+    regions = regions.sort_values(list(regions.columns)).to_csv(index=False)
+    
+    return {
+        'Dim_Customer': [str(customer_updated), int(customer_rows or 0)],
+        'Dim_Product': [str(product_updated), int(product_rows or 0)],
+        'Dim_Region': hashlib.sha256(regions.encode('utf-8')).hexdigest(),
+    }
+
+
+def get_cohort_fact_rows(after_sales_key=0, up_to_sales_key=None):
+    """
+    Extract completed sales in a SalesKey range for incremental cohort updates
+    
+    Only customers in Dim_Customer are returned, as in the INNER JOIN of
+    05_cohort_analysis_extraction.sql.
+    
+    Args:
+        after_sales_key (int): Exclusive lower bound (the cohort store watermark)
+        up_to_sales_key (int, optional): Inclusive upper bound (defaults to no limit)
+    
+    Returns:
+        pd.DataFrame: SalesKey, CustomerKey, OrderDate sorted by SalesKey
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_cohort_fact_rows_local
+        
+        return get_cohort_fact_rows_local(after_sales_key, up_to_sales_key)
+    
+    upper_filter = "AND s.SalesKey <= ?" if up_to_sales_key is not None else ""
+    params = (after_sales_key, up_to_sales_key) if up_to_sales_key is not None else (after_sales_key,)
+    
+    query = f"""
+    SELECT 
+        s.SalesKey,
+        s.CustomerKey,
+        s.OrderDate
+    FROM Fact_Sales s
+    INNER JOIN Dim_Customer c ON s.CustomerKey = c.CustomerKey
+    WHERE s.OrderStatus = 'Completed'
+      AND s.SalesKey > ?
+      {upper_filter}
+    ORDER BY s.SalesKey
+    """
+    
+    return execute_query(query, params, query_name='cohort_fact_rows')
 
 
 def get_market_basket_data():
@@ -197,11 +848,33 @@ def get_market_basket_data():
     Extract transaction data for market basket analysis
     
     Returns:
-        pd.DataFrame: Transaction-product pairs
+        pd.DataFrame: Transaction-product pairs with the order date
     """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_market_basket_data_local
+        
+        return get_market_basket_data_local()
+    
+    if DIMENSION_CACHE_CONFIG['enabled']:
+        from dimension_cache import join_attributes
+        
+        query = """
+        SELECT 
+            s.TransactionID,
+            s.OrderDate,
+            s.ProductKey
+        FROM Fact_Sales s
+        WHERE s.OrderStatus = 'Completed'
+        ORDER BY s.TransactionID
+        """
+        
+        df = join_attributes(execute_query(query, query_name='market_basket_keys'), 'Dim_Product')
+        return df.drop(columns='ProductKey')
+    
     query = """
     SELECT 
         s.TransactionID,
+        s.OrderDate,
         p.ProductName,
         p.Category,
         p.SubCategory
@@ -211,7 +884,149 @@ def get_market_basket_data():
     ORDER BY s.TransactionID
     """
     
-    return execute_query(query)
+    return execute_query(query, query_name='market_basket')
+
+
+def get_product_cooccurrence(min_count=3):
+    """
+    Count product pairs bought in the same transaction
+    
+    Same self-join as the co-occurrence matrix in 04_market_basket_extraction.sql.
+    
+    Args:
+        min_count (int): Minimum transactions a pair must appear in
+    
+    Returns:
+        pd.DataFrame: Product1, Product2, Category1, Category2, CoOccurrenceCount,
+                      CoOccurrencePercentage
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_product_cooccurrence_local
+        
+        return get_product_cooccurrence_local(min_count)
+    
+    query = """
+    WITH ProductPairs AS (
+        SELECT 
+            s1.TransactionID,
+            p1.ProductName AS Product1,
+            p2.ProductName AS Product2,
+            p1.Category AS Category1,
+            p2.Category AS Category2
+        FROM Fact_Sales s1
+        INNER JOIN Fact_Sales s2 ON s1.TransactionID = s2.TransactionID AND s1.ProductKey < s2.ProductKey
+        INNER JOIN Dim_Product p1 ON s1.ProductKey = p1.ProductKey
+        INNER JOIN Dim_Product p2 ON s2.ProductKey = p2.ProductKey
+        WHERE s1.OrderStatus = 'Completed' AND s2.OrderStatus = 'Completed'
+    )
+    SELECT 
+        Product1,
+        Product2,
+        Category1,
+        Category2,
+        COUNT(*) AS CoOccurrenceCount,
+        CAST(COUNT(*) * 100.0 / (SELECT COUNT(DISTINCT TransactionID) FROM Fact_Sales WHERE OrderStatus = 'Completed') AS DECIMAL(5,2)) AS CoOccurrencePercentage
+    FROM ProductPairs
+    GROUP BY Product1, Product2, Category1, Category2
+    HAVING COUNT(*) >= ?
+    ORDER BY CoOccurrenceCount DESC, Product1, Product2
+    """
+    
+    return execute_query(query, (min_count,), query_name='product_cooccurrence')
+
+
+def get_cohort_data():
+    """
+    Extract the cohort retention matrix
+    
+    Same result as 05_cohort_analysis_extraction.sql (and cohort_store.retention_matrix).
+    
+    Returns:
+        pd.DataFrame: CohortMonth, Month_0 .. Month_6, Month_7_Plus and retention rates,
+                      newest cohort first
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_cohort_data_local
+        
+        return get_cohort_data_local()
+    
+    months = _sql_months_between('cc.FirstPurchaseDate', 'ca.OrderDate')
+    month_counts = ',\n        '.join(
+        f"COUNT(DISTINCT CASE WHEN MonthsSinceFirstPurchase = {offset} THEN CustomerKey END) AS Month_{offset}"
+        for offset in range(7)
+    )
+    retention_rates = ',\n        '.join(
+        f"CAST(COUNT(DISTINCT CASE WHEN MonthsSinceFirstPurchase = {offset} THEN CustomerKey END) * 100.0 / "
+        f"NULLIF(COUNT(DISTINCT CASE WHEN MonthsSinceFirstPurchase = 0 THEN CustomerKey END), 0) "
+        f"AS DECIMAL(5,2)) AS RetentionRate_Month{offset}"
+        for offset in (1, 3, 6)
+    )
+    
+    query = f"""
+    WITH CustomerCohort AS (
+        SELECT 
+            s.CustomerKey,
+            MIN(s.OrderDate) AS FirstPurchaseDate,
+            {_sql_year_month('MIN(s.OrderDate)')} AS CohortMonth
+        FROM Fact_Sales s
+        INNER JOIN Dim_Customer c ON c.CustomerKey = s.CustomerKey
+        WHERE s.OrderStatus = 'Completed'
+        GROUP BY s.CustomerKey
+    ),
+    CustomerActivity AS (
+        SELECT DISTINCT
+            s.CustomerKey,
+            s.OrderDate
+        FROM Fact_Sales s
+        WHERE s.OrderStatus = 'Completed'
+    ),
+    CohortActivity AS (
+        SELECT 
+            cc.CohortMonth,
+            ca.CustomerKey,
+            {months} AS MonthsSinceFirstPurchase
+        FROM CustomerCohort cc
+        INNER JOIN CustomerActivity ca ON cc.CustomerKey = ca.CustomerKey
+    )
+    SELECT 
+        CohortMonth,
+        {month_counts},
+        COUNT(DISTINCT CASE WHEN MonthsSinceFirstPurchase >= 7 THEN CustomerKey END) AS Month_7_Plus,
+        {retention_rates}
+    FROM CohortActivity
+    GROUP BY CohortMonth
+    ORDER BY CohortMonth DESC
+    """
+    
+    return execute_query(query, query_name='cohort')
+
+
+def get_sequence_data():
+    """
+    Extract completed purchases in per-customer order for sequential pattern mining
+    
+    Returns:
+        pd.DataFrame: CustomerID, TransactionID, OrderDate, ProductName sorted by customer and date
+    """
+    if DATA_SOURCE == 'files':
+        from local_engine import get_sequence_data_local
+        
+        return get_sequence_data_local()
+    
+    query = """
+    SELECT 
+        c.CustomerID,
+        s.TransactionID,
+        s.OrderDate,
+        p.ProductName
+    FROM Fact_Sales s
+    INNER JOIN Dim_Customer c ON s.CustomerKey = c.CustomerKey
+    INNER JOIN Dim_Product p ON s.ProductKey = p.ProductKey
+    WHERE s.OrderStatus = 'Completed'
+    ORDER BY c.CustomerID, s.OrderDate, s.TransactionID
+    """
+    
+    return execute_query(query, query_name='sequence')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""
+Consumer360: Dimension Cache
+Week 4: Automation & Handoff
+
+In-process cache of the Dim_Customer and Dim_Product attributes used by the
+RFM and market basket extractions, for the long-lived automation/scheduler.py
+process.
+
+Each table is read in full on first use. Later lookups re-read only rows with
+UpdatedDate newer than the newest UpdatedDate already cached (new rows get
+UpdatedDate = GETDATE() on insert), at most once per refresh_interval_seconds,
+and upsert them by surrogate key. Hard deletes, and rows stamped in the same
+clock tick as the watermark after it was read, are not visible to that query,
+so the table is reloaded in full every full_reload_hours.
+
+Hits and misses are counted per distinct surrogate key looked up: a key is a
+hit if its row was already cached before the lookup, and a miss if it had to
+be read (cold load, new or changed row) or is unknown.
+"""
+
+import time
+import logging
+import pandas as pd
+from config import DIMENSION_CACHE_CONFIG
+from db_utils import execute_query
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Cached dimension state keyed by table name
+_CACHE = {}
+
+
+def _read_rows(table, since=None):
+    """
+    Read the cached columns of a dimension table
+    
+    Args:
+        table (str): Dimension table name
+        since (optional): Only rows with UpdatedDate after this value
+    
+    Returns:
+        pd.DataFrame: Rows indexed by surrogate key, with UpdatedDate
+    """
+    spec = DIMENSION_CACHE_CONFIG['tables'][table]
+    columns = ', '.join([spec['key']] + spec['columns'] + ['UpdatedDate'])
+    
+    if since is None:
+        query = f"SELECT {columns} FROM {table}"
+        params = None
+    else:
+        query = f"SELECT {columns} FROM {table} WHERE UpdatedDate > ?"
+        params = (since,)
+    
+    df = execute_query(query, params, query_name=f"dimension_cache_{table}")
+    return df.set_index(spec['key'])
+
+
+def _watermark(frame):
+    """Newest UpdatedDate in the cached rows, as a driver-friendly parameter"""
+    watermark = frame['UpdatedDate'].max()
+    if pd.isna(watermark):
+        return None
+    if isinstance(watermark, pd.Timestamp):
+        return watermark.to_pydatetime()
+    return watermark
+
+
+def refresh_dimension(table, force=False):
+    """
+    Bring one cached dimension up to date
+    
+    Args:
+        table (str): Dimension table name (a key of DIMENSION_CACHE_CONFIG['tables'])
+        force (bool): Check for changed rows even within the refresh interval
+    
+    Returns:
+        pd.Index: Surrogate keys read by this refresh (empty if none)
+    """
+    now = time.monotonic()
+    entry = _CACHE.get(table)
+    
+    full_reload_s = DIMENSION_CACHE_CONFIG['full_reload_hours'] * 3600
+    if entry is None or now - entry['loaded_at'] >= full_reload_s:
+        frame = _read_rows(table)
+        if entry is None:
+            entry = _CACHE[table] = {
+                'hits': 0, 'misses': 0, 'full_loads': 0,
+                'refreshes': 0, 'rows_refreshed': 0,
+            }
+        entry.update(frame=frame, loaded_at=now, checked_at=now, watermark=_watermark(frame))
+        entry['full_loads'] += 1
+        logger.info(f"Dimension cache: loaded {len(frame):,} rows of {table}")
+        return frame.index
+    
+    if not force and now - entry['checked_at'] < DIMENSION_CACHE_CONFIG['refresh_interval_seconds']:
+        return entry['frame'].index[:0]
+    
+    entry['checked_at'] = now
+    if entry['watermark'] is None:
+        return entry['frame'].index[:0]
+    
+    changed = _read_rows(table, since=entry['watermark'])
+    entry['refreshes'] += 1
+    if changed.empty:
+        return changed.index
+    
+    frame = entry['frame']
+    entry['frame'] = pd.concat([frame[~frame.index.isin(changed.index)], changed])
+    entry['watermark'] = _watermark(entry['frame'])
+    entry['rows_refreshed'] += len(changed)
+    logger.info(f"Dimension cache: refreshed {len(changed):,} changed rows of {table}")
+    return changed.index
+
+
+def join_attributes(df, table, key=None):
+    """
+    Add cached dimension attributes to rows carrying a surrogate key
+    
+    Rows whose key is not in the dimension are dropped, like an INNER JOIN;
+    row order is kept.
+    
+    Args:
+        df (pd.DataFrame): Rows with the table's surrogate key column
+        table (str): Dimension table name
+        key (str, optional): Key column in df (defaults to the table's key)
+    
+    Returns:
+        pd.DataFrame: df with the cached attribute columns appended
+    """
+    spec = DIMENSION_CACHE_CONFIG['tables'][table]
+    key = key or spec['key']
+    
+    read_keys = refresh_dimension(table)
+    entry = _CACHE[table]
+    frame = entry['frame']
+    
+    requested = pd.Index(df[key].unique())
+    missed = requested[~requested.isin(frame.index) | requested.isin(read_keys)]
+    entry['misses'] += len(missed)
+    entry['hits'] += len(requested) - len(missed)
+    
+    positions = frame.index.get_indexer(df[key])
+    found = positions >= 0
+    if not found.all():
+        logger.warning(f"Dimension cache: {int((~found).sum()):,} rows reference keys missing from {table}")
+        df = df[found]
+        positions = positions[found]
+    
+    df = df.reset_index(drop=True)
+    attributes = frame[spec['columns']].iloc[positions].reset_index(drop=True)
+    return pd.concat([df, attributes], axis=1)
+
+
+def cache_stats():
+    """
+    Report hit rate and memory size of each cached dimension
+    
+    Returns:
+        pd.DataFrame: One row per table
+    """
+    rows = []
+    for table, entry in _CACHE.items():
+        lookups = entry['hits'] + entry['misses']
+        rows.append({
+            'Table': table,
+            'Rows': len(entry['frame']),
+            'MemoryMB': round(entry['frame'].memory_usage(deep=True).sum() / 1024 ** 2, 2),
+            'Hits': entry['hits'],
+            'Misses': entry['misses'],
+            'HitRate': round(entry['hits'] / lookups, 4) if lookups else None,
+            'FullLoads': entry['full_loads'],
+            'Refreshes': entry['refreshes'],
+            'RowsRefreshed': entry['rows_refreshed'],
+        })
+    
+    return pd.DataFrame(rows, columns=[
+        'Table', 'Rows', 'MemoryMB', 'Hits', 'Misses', 'HitRate',
+        'FullLoads', 'Refreshes', 'RowsRefreshed'
+    ])
+
+
+def log_cache_stats():
+    """Log one line per cached dimension"""
+    for stats in cache_stats().itertuples(index=False):
+        hit_rate = 'n/a' if pd.isna(stats.HitRate) else f"{stats.HitRate:.1%}"
+        logger.info(
+            f"Dimension cache {stats.Table}: {stats.Rows:,} rows, {stats.MemoryMB:.1f} MB, "
+            f"hit rate {hit_rate} ({stats.Hits:,} hits / {stats.Misses:,} misses), "
+            f"{stats.FullLoads} full loads, {stats.Refreshes} refreshes ({stats.RowsRefreshed:,} rows)"
+        )
+
+
+def clear_cache():
+    """Drop all cached dimensions (the next lookup reloads them in full)"""
+    _CACHE.clear()
@@ -0,0 +1,593 @@
+"""
+Consumer360: Local Aggregation Engine
+Week 2: Python Logic Core
+
+This script builds the same frames as db_utils.get_rfm_data,
+db_utils.get_rfm_data_by_region, db_utils.get_market_basket_data,
+db_utils.get_product_cooccurrence and db_utils.get_cohort_data directly
+from exported Fact_Sales, Dim_Customer, Dim_Product and Dim_Region files
+(Parquet or CSV), for environments that receive nightly exports but have no
+SQL Server.
+
+The fact table is read in streaming batches. Per-customer recency, frequency
+and monetary values are accumulated with sorted-key NumPy reductions
+(np.maximum.reduceat / np.minimum.reduceat / np.bincount) into arrays indexed
+by CustomerKey, so memory grows with the number of customers, not fact rows.
+Distinct orders are counted from 64-bit hashes of the (CustomerKey,
+TransactionID) pairs seen so far (16 bytes per distinct order), so the count
+does not depend on how the export is sorted.
+"""
+
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import LOCAL_EXPORT_CONFIG
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+NS_PER_DAY = 86_400 * 10**9
+NO_DATE = np.iinfo(np.int64).min
+
+
+def _export_files(path):
+    """Resolve an export path (file or directory) to a sorted list of data files"""
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(list(path.glob('*.parquet')) + list(path.glob('*.csv')))
+    else:
+        files = [path]
+    
+    if not files or not all(f.exists() for f in files):
+        raise FileNotFoundError(f"No export files found at {path}")
+    
+    return files
+
+
+def iter_export_batches(path, columns, batch_size=None):
+    """
+    Stream an exported table in batches
+    
+    Args:
+        path (str): Parquet/CSV file or a directory of them
+        columns (list): Columns to read
+        batch_size (int, optional): Rows per batch
+    
+    Yields:
+        pd.DataFrame: One batch of rows
+    """
+    batch_size = batch_size or LOCAL_EXPORT_CONFIG['batch_size']
+    
+    for file in _export_files(path):
+        if file.suffix == '.parquet':
+            import pyarrow.parquet as pq
+            
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(file, usecols=columns, chunksize=batch_size)
+
+
+def read_export(path, columns):
+    """Read a (small) exported dimension table in full"""
+    return pd.concat(iter_export_batches(path, columns), ignore_index=True)
+
+
+def _grow(array, size, fill):
+    """Extend a per-customer accumulator so it can be indexed up to size - 1"""
+    if len(array) >= size:
+        return array
+    return np.concatenate([array, np.full(size - len(array), fill, dtype=array.dtype)])
+
+
+def _join_rows(sorted_keys, keys):
+    """INNER JOIN helper: row of each key in sorted_keys, and whether it was found"""
+    pos = np.searchsorted(sorted_keys, keys)
+    pos_clipped = np.minimum(pos, max(len(sorted_keys) - 1, 0))
+    matched = (pos < len(sorted_keys)) & (sorted_keys[pos_clipped] == keys)
+    return pos, matched
+
+
+def aggregate_customer_metrics(fact_path=None, batch_size=None, region_keys=None):
+    """
+    Stream Fact_Sales and accumulate per-customer RFM inputs
+    
+    Distinct completed transactions are counted over the whole export, like
+    COUNT(DISTINCT TransactionID): each batch's (slot, TransactionID) pairs
+    are hashed to uint64 and merged into the distinct hashes seen so far, so a
+    transaction whose lines are spread over several batches counts once in
+    any row order. Two distinct pairs sharing a 64-bit hash would undercount
+    by one (about a 1 in 10^4 chance at 10^8 orders).
+    
+    Args:
+        fact_path (str, optional): Fact_Sales export (defaults to LOCAL_EXPORT_CONFIG)
+        batch_size (int, optional): Rows per batch
+        region_keys (np.ndarray, optional): Sorted RegionKeys; accumulate per
+            (customer, region) instead, dropping rows of unknown regions
+    
+    Returns:
+        dict: Arrays indexed by CustomerKey, or by CustomerKey * len(region_keys)
+              + region row (first/last order, revenue cents, completed lines,
+              distinct completed orders)
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    columns = ['CustomerKey', 'TransactionID', 'OrderDate', 'OrderStatus', 'TotalAmount']
+    if region_keys is not None:
+        columns.append('RegionKey')
+    
+    first_order = np.full(0, np.iinfo(np.int64).max, dtype=np.int64)
+    last_order = np.full(0, NO_DATE, dtype=np.int64)
+    revenue_cents = np.zeros(0, dtype=np.float64)
+    completed_lines = np.zeros(0, dtype=np.int64)
+    order_hashes, order_slots = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    pending_hashes, pending_slots = [], []
+    pending = 0
+    total_rows = 0
+    
+    for batch in iter_export_batches(fact_path, columns, batch_size):
+        keys = batch['CustomerKey'].to_numpy(dtype=np.int64)
+        
+        if region_keys is not None:
+            # INNER JOIN Dim_Region, then one accumulator slot per (customer, region)
+            region_rows, matched = _join_rows(region_keys, batch['RegionKey'].to_numpy(dtype=np.int64))
+            batch = batch[matched]
+            keys = keys[matched] * len(region_keys) + region_rows[matched]
+        
+        if len(keys) == 0:
+            continue
+        total_rows += len(keys)
+        
+        size = keys.max() + 1
+        first_order = _grow(first_order, size, np.iinfo(np.int64).max)
+        last_order = _grow(last_order, size, NO_DATE)
+        revenue_cents = _grow(revenue_cents, size, 0.0)
+        completed_lines = _grow(completed_lines, size, 0)
+        
+        # MIN/MAX(OrderDate) over all statuses: reduce each customer's run of sorted keys
+        dates = pd.to_datetime(batch['OrderDate']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        sorted_dates = dates[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        batch_customers = sorted_keys[starts]
+        
+        first_order[batch_customers] = np.minimum(
+            first_order[batch_customers], np.minimum.reduceat(sorted_dates, starts))
+        last_order[batch_customers] = np.maximum(
+            last_order[batch_customers], np.maximum.reduceat(sorted_dates, starts))
+        
+        # Completed revenue (in whole cents, as DECIMAL(12,2)) and line counts
+        completed = (batch['OrderStatus'] == 'Completed').to_numpy()
+        cents = np.round(batch['TotalAmount'].to_numpy(dtype=np.float64)[completed] * 100)
+        revenue_cents += np.bincount(keys[completed], weights=cents, minlength=len(revenue_cents))
+        completed_lines += np.bincount(keys[completed], minlength=len(completed_lines))
+        
+        # Distinct completed (slot, TransactionID) pairs of the batch, as hashes
+        pairs = pd.DataFrame({
+            'Slot': keys[completed],
+            'TransactionID': batch['TransactionID'].to_numpy()[completed],
+        })
+        hashes, first = np.unique(pd.util.hash_pandas_object(pairs, index=False).to_numpy(), return_index=True)
+        pending_hashes.append(hashes)
+        pending_slots.append(pairs['Slot'].to_numpy()[first])
+        pending += len(hashes)
+        
+        # Merge into the distinct pairs once pending ones outnumber them (amortised O(n log n))
+        if pending > len(order_hashes):
+            order_hashes, order_slots = _merge_distinct(order_hashes, order_slots, pending_hashes, pending_slots)
+            pending_hashes, pending_slots, pending = [], [], 0
+    
+    order_hashes, order_slots = _merge_distinct(order_hashes, order_slots, pending_hashes, pending_slots)
+    total_orders = np.bincount(order_slots, minlength=len(last_order))
+    
+    groups = 'customer-region pairs' if region_keys is not None else 'customers'
+    logger.info(f"Aggregated {total_rows} fact rows for {np.count_nonzero(last_order != NO_DATE)} {groups}")
+    
+    return {
+        'first_order': first_order,
+        'last_order': last_order,
+        'revenue_cents': revenue_cents,
+        'completed_lines': completed_lines,
+        'total_orders': total_orders,
+    }
+
+
+def _merge_distinct(hashes, slots, pending_hashes, pending_slots):
+    """Union of sorted distinct pair hashes with pending ones, keeping each hash's slot"""
+    hashes, first = np.unique(np.concatenate([hashes, *pending_hashes]), return_index=True)
+    return hashes, np.concatenate([slots, *pending_slots])[first]
+
+
+def _metric_columns(metrics, slots, as_of):
+    """RFM measure columns of get_rfm_data for the given accumulator slots"""
+    revenue_cents = metrics['revenue_cents'][slots]
+    lines = metrics['completed_lines'][slots]
+    last_day = metrics['last_order'][slots] // NS_PER_DAY
+    
+    return {
+        # DATEDIFF(DAY, ...) counts day boundaries crossed
+        'DaysSinceLastPurchase': as_of.normalize().value // NS_PER_DAY - last_day,
+        'TotalOrders': metrics['total_orders'][slots],
+        'TotalRevenue': revenue_cents / 100,
+        # CAST(... AS DECIMAL(10,2)) rounds half away from zero
+        'AvgOrderValue': np.floor(revenue_cents / lines + 0.5) / 100,
+        'FirstOrderDate': pd.to_datetime(metrics['first_order'][slots]),
+        'LastOrderDate': pd.to_datetime(metrics['last_order'][slots]),
+    }
+
+
+def get_rfm_data_local(as_of=None, fact_path=None, customer_path=None):
+    """
+    Build the get_rfm_data frame from exported files
+    
+    Args:
+        as_of (datetime, optional): Reference time replacing GETDATE() (defaults to now)
+        fact_path (str, optional): Fact_Sales export
+        customer_path (str, optional): Dim_Customer export
+    
+    Returns:
+        pd.DataFrame: Customer RFM metrics, same columns and order as get_rfm_data
+    """
+    customer_path = customer_path or LOCAL_EXPORT_CONFIG['dim_customer']
+    as_of = pd.Timestamp(as_of or pd.Timestamp.now())
+    
+    metrics = aggregate_customer_metrics(fact_path)
+    customers = read_export(customer_path, ['CustomerKey', 'CustomerID', 'CustomerName', 'Email'])
+    
+    keys = customers['CustomerKey'].to_numpy(dtype=np.int64)
+    in_range = keys < len(metrics['last_order'])
+    customers = customers[in_range]
+    keys = keys[in_range]
+    
+    has_orders = metrics['total_orders'][keys] > 0
+    customers, keys = customers[has_orders], keys[has_orders]
+    
+    df = pd.DataFrame({
+        'CustomerKey': keys,
+        'CustomerID': customers['CustomerID'].to_numpy(),
+        'CustomerName': customers['CustomerName'].to_numpy(),
+        'Email': customers['Email'].to_numpy(),
+        **_metric_columns(metrics, keys, as_of),
+    })
+    
+    df = df.sort_values('TotalRevenue', ascending=False, kind='mergesort').reset_index(drop=True)
+    logger.info(f"Local RFM extraction returned {len(df)} rows.")
+    return df
+
+
+def get_rfm_data_by_region_local(as_of=None, fact_path=None, customer_path=None, region_path=None):
+    """
+    Build the get_rfm_data_by_region frame from exported files
+    
+    Args:
+        as_of (datetime, optional): Reference time replacing GETDATE() (defaults to now)
+        fact_path (str, optional): Fact_Sales export (with RegionKey)
+        customer_path (str, optional): Dim_Customer export
+        region_path (str, optional): Dim_Region export
+    
+    Returns:
+        pd.DataFrame: Customer-region RFM metrics, same columns and order as get_rfm_data_by_region
+    """
+    customer_path = customer_path or LOCAL_EXPORT_CONFIG['dim_customer']
+    region_path = region_path or LOCAL_EXPORT_CONFIG['dim_region']
+    as_of = pd.Timestamp(as_of or pd.Timestamp.now())
+    
+    regions = read_export(region_path, ['RegionKey', 'RegionName']).sort_values('RegionKey')
+    region_keys = regions['RegionKey'].to_numpy(dtype=np.int64)
+    metrics = aggregate_customer_metrics(fact_path, region_keys=region_keys)
+    
+    # Slots with completed orders, split back into (customer, region)
+    slots = np.flatnonzero(metrics['total_orders'] > 0)
+    
+    # INNER JOIN Dim_Customer
+    customers = read_export(customer_path, ['CustomerKey', 'CustomerID', 'CustomerName', 'Email'])
+    customers = customers.sort_values('CustomerKey')
+    customer_rows, matched = _join_rows(customers['CustomerKey'].to_numpy(dtype=np.int64), slots // len(region_keys))
+    slots, customer_rows = slots[matched], customer_rows[matched]
+    region_rows = slots % len(region_keys)
+    
+    df = pd.DataFrame({
+        'CustomerKey': slots // len(region_keys),
+        'RegionKey': region_keys[region_rows],
+        'RegionName': regions['RegionName'].to_numpy()[region_rows],
+        'CustomerID': customers['CustomerID'].to_numpy()[customer_rows],
+        'CustomerName': customers['CustomerName'].to_numpy()[customer_rows],
+        'Email': customers['Email'].to_numpy()[customer_rows],
+        **_metric_columns(metrics, slots, as_of),
+    })
+    
+    df = df.sort_values(['RegionKey', 'TotalRevenue'], ascending=[True, False], kind='mergesort')
+    df = df.reset_index(drop=True)
+    logger.info(f"Local per-region RFM extraction returned {len(df)} rows.")
+    return df
+
+
+def get_market_basket_data_local(fact_path=None, product_path=None, batch_size=None):
+    """
+    Build the get_market_basket_data frame from exported files
+    
+    Args:
+        fact_path (str, optional): Fact_Sales export
+        product_path (str, optional): Dim_Product export
+        batch_size (int, optional): Rows per batch
+    
+    Returns:
+        pd.DataFrame: Transaction-product pairs, same columns and order as get_market_basket_data
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    product_path = product_path or LOCAL_EXPORT_CONFIG['dim_product']
+    
+    products = read_export(product_path, ['ProductKey', 'ProductName', 'Category', 'SubCategory'])
+    products = products.sort_values('ProductKey').reset_index(drop=True)
+    product_keys = products['ProductKey'].to_numpy(dtype=np.int64)
+    
+    frames = []
+    for batch in iter_export_batches(fact_path, ['TransactionID', 'OrderDate', 'ProductKey', 'OrderStatus'], batch_size):
+        batch = batch[batch['OrderStatus'] == 'Completed']
+        keys = batch['ProductKey'].to_numpy(dtype=np.int64)
+        
+        # INNER JOIN Dim_Product via a sorted-key lookup
+        pos, matched = _join_rows(product_keys, keys)
+        
+        frames.append(pd.DataFrame({
+            'TransactionID': batch['TransactionID'].to_numpy()[matched],
+            'OrderDate': pd.to_datetime(batch['OrderDate']).to_numpy()[matched],
+            'ProductRow': pos[matched],
+        }))
+    
+    pairs = pd.concat(frames, ignore_index=True).sort_values('TransactionID', kind='mergesort')
+    rows = pairs['ProductRow'].to_numpy()
+    
+    df = pd.DataFrame({
+        'TransactionID': pairs['TransactionID'].to_numpy(),
+        'OrderDate': pairs['OrderDate'].to_numpy(),
+        'ProductName': products['ProductName'].to_numpy()[rows],
+        'Category': products['Category'].to_numpy()[rows],
+        'SubCategory': products['SubCategory'].to_numpy()[rows],
+    })
+    
+    logger.info(f"Local market basket extraction returned {len(df)} rows.")
+    return df
+
+
+def get_product_cooccurrence_local(min_count=3, fact_path=None, product_path=None, batch_size=None):
+    """
+    Build the get_product_cooccurrence frame from exported files
+    
+    Like the SQL self-join, a pair is counted once per pair of completed
+    lines (s1.ProductKey < s2.ProductKey) in the same transaction.
+    
+    Args:
+        min_count (int): Minimum count a pair must reach
+        fact_path (str, optional): Fact_Sales export
+        product_path (str, optional): Dim_Product export
+        batch_size (int, optional): Rows per batch
+    
+    Returns:
+        pd.DataFrame: Same columns and order as get_product_cooccurrence
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    product_path = product_path or LOCAL_EXPORT_CONFIG['dim_product']
+    
+    products = read_export(product_path, ['ProductKey', 'ProductName', 'Category']).sort_values('ProductKey')
+    product_keys = products['ProductKey'].to_numpy(dtype=np.int64)
+    
+    transactions, product_rows, all_transactions = [], [], []
+    for batch in iter_export_batches(fact_path, ['TransactionID', 'ProductKey', 'OrderStatus'], batch_size):
+        batch = batch[batch['OrderStatus'] == 'Completed']
+        all_transactions.append(batch['TransactionID'].to_numpy())
+        
+        # INNER JOIN Dim_Product
+        pos, matched = _join_rows(product_keys, batch['ProductKey'].to_numpy(dtype=np.int64))
+        transactions.append(batch['TransactionID'].to_numpy()[matched])
+        product_rows.append(pos[matched])
+    
+    # Denominator: distinct completed transactions, with or without a known product
+    total_transactions = len(pd.unique(np.concatenate(all_transactions))) if all_transactions else 0
+    
+    lines = pd.DataFrame({
+        'Transaction': pd.factorize(np.concatenate(transactions))[0] if transactions else np.zeros(0, dtype=np.int64),
+        'ProductRow': np.concatenate(product_rows) if product_rows else np.zeros(0, dtype=np.int64),
+    })
+    pairs = lines.merge(lines, on='Transaction', suffixes=('1', '2'))
+    pairs = pairs[pairs['ProductRow1'] < pairs['ProductRow2']]
+    
+    # Product rows are sorted by ProductKey, so row order is key order
+    counts = pairs.groupby(['ProductRow1', 'ProductRow2']).size()
+    rows1 = counts.index.get_level_values(0).to_numpy()
+    rows2 = counts.index.get_level_values(1).to_numpy()
+    
+    df = pd.DataFrame({
+        'Product1': products['ProductName'].to_numpy()[rows1],
+        'Product2': products['ProductName'].to_numpy()[rows2],
+        'Category1': products['Category'].to_numpy()[rows1],
+        'Category2': products['Category'].to_numpy()[rows2],
+        'CoOccurrenceCount': counts.to_numpy(),
+    })
+    
+    # GROUP BY the names, as the SQL does
+    df = df.groupby(['Product1', 'Product2', 'Category1', 'Category2'], as_index=False)['CoOccurrenceCount'].sum()
+    df = df[df['CoOccurrenceCount'] >= min_count]
+    df['CoOccurrencePercentage'] = np.floor(df['CoOccurrenceCount'] * 10000.0 / max(total_transactions, 1) + 0.5) / 100
+    
+    df = df.sort_values(
+        ['CoOccurrenceCount', 'Product1', 'Product2'], ascending=[False, True, True], kind='mergesort'
+    ).reset_index(drop=True)
+    
+    logger.info(f"Local co-occurrence extraction returned {len(df)} rows.")
+    return df
+
+
+def get_cohort_data_local(fact_path=None, customer_path=None, batch_size=None, max_offset=6):
+    """
+    Build the get_cohort_data frame from exported files
+    
+    Two streaming passes: the first finds every customer's first completed
+    purchase month, the second sets one bit per month offset (0 .. max_offset,
+    then one for later months) in a per-customer mask. Counts are exact and
+    memory grows with the number of customers.
+    
+    Args:
+        fact_path (str, optional): Fact_Sales export
+        customer_path (str, optional): Dim_Customer export
+        batch_size (int, optional): Rows per batch
+        max_offset (int): Last month offset with its own column (6 matches the SQL)
+    
+    Returns:
+        pd.DataFrame: Same columns and order as get_cohort_data
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    customer_path = customer_path or LOCAL_EXPORT_CONFIG['dim_customer']
+    columns = ['CustomerKey', 'OrderDate', 'OrderStatus']
+    no_month = np.iinfo(np.int64).max
+    
+    def completed_months(batch):
+        batch = batch[batch['OrderStatus'] == 'Completed']
+        keys = batch['CustomerKey'].to_numpy(dtype=np.int64)
+        # Months since 1970-01: DATEDIFF(MONTH, ...) is a difference of these
+        months = pd.to_datetime(batch['OrderDate']).to_numpy(dtype='datetime64[M]').astype(np.int64)
+        return keys, months
+    
+    # Pass 1: first completed purchase month per customer
+    first_month = np.full(0, no_month, dtype=np.int64)
+    for batch in iter_export_batches(fact_path, columns, batch_size):
+        keys, months = completed_months(batch)
+        if len(keys) == 0:
+            continue
+        first_month = _grow(first_month, keys.max() + 1, no_month)
+        np.minimum.at(first_month, keys, months)
+    
+    # Pass 2: month offsets each customer was active in, as a bitmask
+    active = np.zeros(len(first_month), dtype=np.uint16)
+    for batch in iter_export_batches(fact_path, columns, batch_size):
+        keys, months = completed_months(batch)
+        offsets = np.minimum(months - first_month[keys], max_offset + 1)
+        np.bitwise_or.at(active, keys, (1 << offsets).astype(np.uint16))
+    
+    # INNER JOIN Dim_Customer
+    customer_keys = read_export(customer_path, ['CustomerKey'])['CustomerKey'].to_numpy(dtype=np.int64)
+    customer_keys = customer_keys[(customer_keys < len(first_month))]
+    customer_keys = np.unique(customer_keys[first_month[customer_keys] != no_month])
+    
+    cohort_codes, cohorts = pd.factorize(first_month[customer_keys], sort=True)
+    masks = active[customer_keys]
+    
+    df = pd.DataFrame({
+        'CohortMonth': pd.to_datetime(cohorts.astype('datetime64[M]')).strftime('%Y-%m'),
+    })
+    for offset in range(max_offset + 2):
+        name = f"Month_{offset}" if offset <= max_offset else f"Month_{max_offset + 1}_Plus"
+        df[name] = np.bincount(cohort_codes, weights=(masks >> offset) & 1, minlength=len(cohorts)).astype(np.int64)
+    
+    for offset in (1, 3, 6):
+        df[f"RetentionRate_Month{offset}"] = np.floor(df[f"Month_{offset}"] * 10000.0 / df['Month_0'] + 0.5) / 100
+    
+    df = df.sort_values('CohortMonth', ascending=False).reset_index(drop=True)
+    logger.info(f"Local cohort extraction returned {len(df)} cohorts.")
+    return df
+
+
+def get_sequence_data_local(fact_path=None, customer_path=None, product_path=None, batch_size=None):
+    """
+    Build the get_sequence_data frame from exported files
+    
+    Args:
+        fact_path (str, optional): Fact_Sales export
+        customer_path (str, optional): Dim_Customer export
+        product_path (str, optional): Dim_Product export
+        batch_size (int, optional): Rows per batch
+    
+    Returns:
+        pd.DataFrame: CustomerID, TransactionID, OrderDate, ProductName sorted by customer and date
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    customer_path = customer_path or LOCAL_EXPORT_CONFIG['dim_customer']
+    product_path = product_path or LOCAL_EXPORT_CONFIG['dim_product']
+    
+    customers = read_export(customer_path, ['CustomerKey', 'CustomerID']).sort_values('CustomerKey')
+    products = read_export(product_path, ['ProductKey', 'ProductName']).sort_values('ProductKey')
+    customer_keys = customers['CustomerKey'].to_numpy(dtype=np.int64)
+    product_keys = products['ProductKey'].to_numpy(dtype=np.int64)
+    
+    columns = ['CustomerKey', 'TransactionID', 'OrderDate', 'ProductKey', 'OrderStatus']
+    frames = []
+    for batch in iter_export_batches(fact_path, columns, batch_size):
+        batch = batch[batch['OrderStatus'] == 'Completed']
+        customer_pos, customer_found = _join_rows(customer_keys, batch['CustomerKey'].to_numpy(dtype=np.int64))
+        product_pos, product_found = _join_rows(product_keys, batch['ProductKey'].to_numpy(dtype=np.int64))
+        matched = customer_found & product_found
+        
+        frames.append(pd.DataFrame({
+            'CustomerID': customers['CustomerID'].to_numpy()[customer_pos[matched]],
+            'TransactionID': batch['TransactionID'].to_numpy()[matched],
+            'OrderDate': pd.to_datetime(batch['OrderDate']).to_numpy()[matched],
+            'ProductName': products['ProductName'].to_numpy()[product_pos[matched]],
+        }))
+    
+    df = pd.concat(frames, ignore_index=True)
+    df = df.sort_values(['CustomerID', 'OrderDate', 'TransactionID'], kind='mergesort').reset_index(drop=True)
+    
+    logger.info(f"Local sequence extraction returned {len(df)} rows.")
+    return df
+
+
+def get_sales_watermark_local(fact_path=None):
+    """
+    Max SalesKey and row count of the Fact_Sales export (reads only SalesKey)
+    
+    Args:
+        fact_path (str, optional): Fact_Sales export
+    
+    Returns:
+        tuple: (max SalesKey, row count)
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    
+    max_key, total_rows = 0, 0
+    for batch in iter_export_batches(fact_path, ['SalesKey']):
+        if len(batch):
+            max_key = max(max_key, int(batch['SalesKey'].max()))
+            total_rows += len(batch)
+    
+    return max_key, total_rows
+
+
+def get_cohort_fact_rows_local(after_sales_key=0, up_to_sales_key=None, fact_path=None,
+                               customer_path=None, batch_size=None):
+    """
+    Build the get_cohort_fact_rows frame from exported files
+    
+    Args:
+        after_sales_key (int): Exclusive lower SalesKey bound
+        up_to_sales_key (int, optional): Inclusive upper SalesKey bound
+        fact_path (str, optional): Fact_Sales export
+        customer_path (str, optional): Dim_Customer export
+        batch_size (int, optional): Rows per batch
+    
+    Returns:
+        pd.DataFrame: SalesKey, CustomerKey, OrderDate sorted by SalesKey
+    """
+    fact_path = fact_path or LOCAL_EXPORT_CONFIG['fact_sales']
+    customer_path = customer_path or LOCAL_EXPORT_CONFIG['dim_customer']
+    columns = ['SalesKey', 'CustomerKey', 'OrderDate', 'OrderStatus']
+    customer_keys = np.sort(read_export(customer_path, ['CustomerKey'])['CustomerKey'].to_numpy(dtype=np.int64))
+    
+    frames = []
+    for batch in iter_export_batches(fact_path, columns, batch_size):
+        keep = (batch['OrderStatus'] == 'Completed') & (batch['SalesKey'] > after_sales_key)
+        if up_to_sales_key is not None:
+            keep &= batch['SalesKey'] <= up_to_sales_key
+        # INNER JOIN Dim_Customer
+        keep &= _join_rows(customer_keys, batch['CustomerKey'].to_numpy(dtype=np.int64))[1]
+        frames.append(batch.loc[keep, ['SalesKey', 'CustomerKey', 'OrderDate']])
+    
+    df = pd.concat(frames, ignore_index=True).sort_values('SalesKey').reset_index(drop=True)
+    df['OrderDate'] = pd.to_datetime(df['OrderDate'])
+    
+    logger.info(f"Local cohort extraction returned {len(df)} rows.")
+    return df
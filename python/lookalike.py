@@ -0,0 +1,386 @@
+"""
+Consumer360: Lookalike Customer Search
+Week 2: Python Logic Core
+
+This script finds the customers most similar to a seed set (e.g. "the 10k
+customers most like our Champions") for targeting.
+
+Each customer is a point in a small feature space built from the RFM output:
+log1p of DaysSinceLastPurchase, TotalOrders, TotalRevenue and AvgOrderValue,
+standardised to zero mean and unit variance so no metric dominates.
+
+Search is exact k-nearest-neighbour by Euclidean distance. With only a handful
+of dimensions a KD-tree (scipy's cKDTree) answers queries in roughly
+logarithmic time, so it is used whenever scipy is installed. Without scipy,
+candidates are ranked by |q|^2 - 2 q.x + |x|^2 computed with float64 matrix
+products over (query block x reference block) tiles, keeping a running top-k
+per query, so memory stays bounded and the heavy lifting runs in BLAS. The
+final neighbours' distances are recomputed from direct differences, as the
+KD-tree does, so both methods return the same result up to exact ties.
+"""
+
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from config import LOOKALIKE_CONFIG, LOOKALIKE_OUTPUT_FILE, RFM_OUTPUT_FILE
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def build_feature_matrix(df, features=None, mean=None, std=None):
+    """
+    Build the normalised feature matrix
+    
+    Args:
+        df (pd.DataFrame): RFM output with the feature columns
+        features (list, optional): Feature columns (defaults to LOOKALIKE_CONFIG)
+        mean (np.ndarray, optional): Column means to reuse (fitted on df when not given)
+        std (np.ndarray, optional): Column standard deviations to reuse
+    
+    Returns:
+        np.ndarray: float32 matrix, one row per customer
+        np.ndarray: Column means of the log-scaled features
+        np.ndarray: Column standard deviations of the log-scaled features
+    """
+    features = features or LOOKALIKE_CONFIG['features']
+    
+    values = np.log1p(np.clip(df[features].to_numpy(dtype=np.float64), 0, None))
+    if mean is None:
+        mean = values.mean(axis=0)
+        std = values.std(axis=0)
+        std[std == 0] = 1.0
+    
+    return ((values - mean) / std).astype(np.float32), mean, std
+
+
+def _kdtree_class(search=None):
+    """
+    Resolve the search method to scipy's cKDTree, or None for blocked search
+    
+    Args:
+        search (str, optional): 'auto', 'kdtree' or 'blocked' (defaults to LOOKALIKE_CONFIG)
+    
+    Returns:
+        type: cKDTree, or None when blocked search should be used
+    """
+    search = search or LOOKALIKE_CONFIG['search']
+    if search == 'blocked':
+        return None
+    
+    try:
+        from scipy.spatial import cKDTree
+        return cKDTree
+    
+    except ImportError as e:
+        if search == 'kdtree':
+            raise
+        logger.debug(f"KD-tree search unavailable ({e}); using blocked search")
+        return None
+
+
+def build_index(df, features=None, search=None):
+    """
+    Build a lookalike index over all customers
+    
+    Args:
+        df (pd.DataFrame): RFM output (rfm_analysis.main)
+        features (list, optional): Feature columns
+        search (str, optional): 'auto', 'kdtree' or 'blocked' (defaults to LOOKALIKE_CONFIG)
+    
+    Returns:
+        dict: Customer keys, feature matrix, float64 squared norms, scaling
+              parameters and the KD-tree (None for blocked search)
+    """
+    features = features or LOOKALIKE_CONFIG['features']
+    matrix, mean, std = build_feature_matrix(df, features)
+    
+    kdtree = _kdtree_class(search)
+    tree = kdtree(matrix) if kdtree is not None and len(matrix) else None
+    
+    logger.info(
+        f"Built lookalike index over {len(matrix)} customers and {len(features)} features "
+        f"({'KD-tree' if tree is not None else 'blocked'} search)"
+    )
+    return {
+        'keys': df['CustomerKey'].to_numpy(dtype=np.int64),
+        'matrix': matrix,
+        'sq_norms': np.einsum('ij,ij->i', matrix, matrix, dtype=np.float64),
+        'features': list(features),
+        'mean': mean,
+        'std': std,
+        'tree': tree,
+    }
+
+
+def _blocked_knn(queries, reference, reference_sq_norms, k, query_block=None, reference_block=None):
+    """
+    Exact k nearest reference rows for every query row
+    
+    Tiles are ranked with the expanded form in float64 (float32 loses about
+    1e-3 to cancellation near zero), then the final k distances are
+    recomputed from direct differences and re-sorted.
+    
+    Args:
+        queries (np.ndarray): (q, d) float32 query matrix
+        reference (np.ndarray): (n, d) float32 reference matrix
+        reference_sq_norms (np.ndarray): float64 squared row norms of reference
+        k (int): Neighbours per query
+        query_block (int, optional): Query rows per tile
+        reference_block (int, optional): Reference rows per tile
+    
+    Returns:
+        np.ndarray: (q, k) reference row indices, nearest first
+        np.ndarray: (q, k) Euclidean distances
+    """
+    query_block = query_block or LOOKALIKE_CONFIG['query_block']
+    reference_block = reference_block or LOOKALIKE_CONFIG['reference_block']
+    k = min(k, len(reference))
+    reference = reference.astype(np.float64)
+    
+    all_indices = np.empty((len(queries), k), dtype=np.int64)
+    all_distances = np.empty((len(queries), k), dtype=np.float64)
+    
+    for q_start in range(0, len(queries), query_block):
+        block = queries[q_start:q_start + query_block].astype(np.float64)
+        block_sq_norms = np.einsum('ij,ij->i', block, block)[:, None]
+        
+        best_distances = np.full((len(block), 0), np.inf)
+        best_indices = np.empty((len(block), 0), dtype=np.int64)
+        
+        for r_start in range(0, len(reference), reference_block):
+            tile = reference[r_start:r_start + reference_block]
+            # In place to avoid tile-sized temporaries
+            distances = block @ tile.T
+            distances *= -2
+            distances += block_sq_norms
+            distances += reference_sq_norms[r_start:r_start + len(tile)]
+            
+            if k == 1:
+                # Nearest neighbour only: a row-wise argmin is much cheaper than a partition
+                nearest = np.argmin(distances, axis=1)[:, None]
+                distances = np.take_along_axis(distances, nearest, axis=1)
+                if best_distances.shape[1]:
+                    better = distances < best_distances
+                    best_distances = np.where(better, distances, best_distances)
+                    best_indices = np.where(better, nearest + r_start, best_indices)
+                else:
+                    best_distances, best_indices = distances, nearest + r_start
+                continue
+            
+            # Merge this tile's candidates with the running top-k
+            candidates = np.concatenate([best_distances, distances], axis=1)
+            candidate_indices = np.concatenate(
+                [best_indices, np.broadcast_to(np.arange(r_start, r_start + len(tile)), distances.shape)],
+                axis=1
+            )
+            if candidates.shape[1] > k:
+                top = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+                candidates = np.take_along_axis(candidates, top, axis=1)
+                candidate_indices = np.take_along_axis(candidate_indices, top, axis=1)
+            best_distances, best_indices = candidates, candidate_indices
+        
+        # Exact distances of the survivors from direct differences
+        differences = block[:, None, :] - reference[best_indices]
+        best_distances = np.sqrt(np.einsum('ijk,ijk->ij', differences, differences))
+        
+        order = np.argsort(best_distances, axis=1, kind='stable')
+        all_indices[q_start:q_start + len(block)] = np.take_along_axis(best_indices, order, axis=1)
+        all_distances[q_start:q_start + len(block)] = np.take_along_axis(best_distances, order, axis=1)
+    
+    return all_indices, all_distances
+
+
+def knn(index, query_keys, k=10):
+    """
+    Batched k-nearest-neighbour query for indexed customers
+    
+    Args:
+        index (dict): Index from build_index
+        query_keys (array-like): CustomerKeys to query
+        k (int): Neighbours per customer (the customer itself is excluded)
+    
+    Returns:
+        pd.DataFrame: QueryKey, Rank, NeighborKey, Distance
+    """
+    rows = _rows_for_keys(index, query_keys)
+    
+    if index['tree'] is not None:
+        neighbours = list(range(1, min(k + 1, len(index['keys'])) + 1))
+        distances, indices = index['tree'].query(index['matrix'][rows], k=neighbours, workers=-1)
+    else:
+        indices, distances = _blocked_knn(index['matrix'][rows], index['matrix'], index['sq_norms'], k + 1)
+    
+    # Drop each customer's own row; if duplicate points pushed it out of the
+    # k + 1 candidates, drop the furthest neighbour instead
+    keep = indices != rows[:, None]
+    keep[keep.all(axis=1), -1] = False
+    
+    query_rows = np.repeat(rows, keep.sum(axis=1))
+    ranks = np.cumsum(keep, axis=1)[keep]
+    return pd.DataFrame({
+        'QueryKey': index['keys'][query_rows],
+        'Rank': ranks,
+        'NeighborKey': index['keys'][indices[keep]],
+        'Distance': distances[keep],
+    })
+
+
+def _rows_for_keys(index, keys):
+    """Index rows of the given CustomerKeys (raises for unknown keys)"""
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.argsort(index['keys'], kind='stable')
+    pos = np.minimum(np.searchsorted(index['keys'], keys, sorter=order), len(order) - 1)
+    rows = order[pos]
+    
+    missing = index['keys'][rows] != keys
+    if missing.any():
+        raise KeyError(f"{missing.sum()} customers are not in the index, e.g. {keys[missing][:5].tolist()}")
+    
+    return rows
+
+
+def _lookalike_distance_bound(index, seed_rows, seed_tree, count, exclude_seeds):
+    """
+    Upper bound on the count-th smallest nearest-seed distance
+    
+    Seeds are usually a tight cluster, so querying every customer against the
+    seed tree without a bound barely prunes. The neighbours of the seeds in
+    the full tree are a cheap candidate set; the count-th smallest true
+    nearest-seed distance among any count eligible customers bounds the final
+    answer, so customers beyond it can be skipped without losing exactness.
+    
+    Returns:
+        float: Search radius (inf when no bound could be found)
+    """
+    n = len(index['keys'])
+    k = 2
+    # Gathering more neighbours than about twice the index size costs more than it saves
+    while k < n and k * len(seed_rows) <= 2 * n:
+        _, candidates = index['tree'].query(index['matrix'][seed_rows], k=k, workers=-1)
+        candidates = np.unique(candidates)
+        if exclude_seeds:
+            candidates = np.setdiff1d(candidates, seed_rows, assume_unique=True)
+        
+        if len(candidates) >= count:
+            distances, _ = seed_tree.query(index['matrix'][candidates], k=1, workers=-1)
+            bound = np.partition(distances, count - 1)[count - 1]
+            # Slack so customers tied exactly at the bound are not dropped by rounding
+            return bound * (1 + 1e-6) + 1e-9
+        
+        k *= 2
+    
+    return np.inf
+
+
+def find_lookalikes(index, seed_keys, count=None, exclude_seeds=True):
+    """
+    Find the customers closest to a seed set
+    
+    Every customer is ranked by its distance to the nearest seed customer, which
+    is a 1-nearest-neighbour query of all customers against the seed set.
+    
+    Args:
+        index (dict): Index from build_index
+        seed_keys (array-like): CustomerKeys of the seed set (e.g. current Champions)
+        count (int, optional): Lookalikes to return (defaults to LOOKALIKE_CONFIG)
+        exclude_seeds (bool): Leave the seed customers out of the result
+    
+    Returns:
+        pd.DataFrame: CustomerKey, Distance, NearestSeedKey, nearest first
+    """
+    count = count or LOOKALIKE_CONFIG['default_count']
+    seed_rows = np.unique(_rows_for_keys(index, seed_keys))
+    logger.info(f"Searching lookalikes for {len(seed_rows)} seed customers among {len(index['keys'])}...")
+    
+    seeds = index['matrix'][seed_rows]
+    if index['tree'] is not None:
+        seed_tree = _kdtree_class('kdtree')(seeds)
+        bound = _lookalike_distance_bound(index, seed_rows, seed_tree, count, exclude_seeds)
+        distances, nearest = seed_tree.query(index['matrix'], k=1, distance_upper_bound=bound, workers=-1)
+    else:
+        nearest, distances = _blocked_knn(index['matrix'], seeds, index['sq_norms'][seed_rows], 1)
+        nearest, distances = nearest[:, 0], distances[:, 0]
+    
+    candidates = np.arange(len(index['keys']))
+    if exclude_seeds:
+        candidates = np.setdiff1d(candidates, seed_rows, assume_unique=True)
+    
+    count = min(count, len(candidates))
+    top = candidates[np.argpartition(distances[candidates], count - 1)[:count]] if count else candidates[:0]
+    top = top[np.lexsort((index['keys'][top], distances[top]))]
+    
+    return pd.DataFrame({
+        'CustomerKey': index['keys'][top],
+        'Distance': distances[top],
+        'NearestSeedKey': index['keys'][seed_rows[nearest[top]]],
+    })
+
+
+def main(segment='Champions', count=None):
+    """
+    Main execution function for lookalike search
+    
+    Args:
+        segment (str): Segment whose customers form the seed set
+        count (int, optional): Lookalikes to return
+    """
+    try:
+        logger.info("="*60)
+        logger.info("Starting Lookalike Customer Search")
+        logger.info("="*60)
+        
+        # 1. Load the RFM segmentation
+        logger.info("Step 1: Loading RFM segmentation...")
+        df = pd.read_csv(RFM_OUTPUT_FILE)
+        logger.info(f"Loaded {len(df)} customers")
+        
+        # 2. Build the index
+        logger.info("Step 2: Building feature index...")
+        index = build_index(df)
+        
+        # 3. Search
+        seed_keys = df.loc[df['Segment'] == segment, 'CustomerKey']
+        if seed_keys.empty:
+            raise ValueError(f"No customers in segment '{segment}'")
+        
+        logger.info(f"Step 3: Finding customers most like {segment}...")
+        lookalikes = find_lookalikes(index, seed_keys, count)
+        
+        # 4. Save results with the customers' current segment and metrics
+        logger.info("Step 4: Saving results...")
+        columns = ['CustomerKey', 'CustomerID', 'CustomerName', 'Email', 'Segment'] + index['features']
+        result = lookalikes.merge(df[[c for c in columns if c in df.columns]], on='CustomerKey', how='left')
+        result.insert(0, 'SeedSegment', segment)
+        result.to_csv(LOOKALIKE_OUTPUT_FILE, index=False)
+        logger.info(f"{len(result)} lookalike customers saved to: {LOOKALIKE_OUTPUT_FILE}")
+        
+        print("\n" + "="*80)
+        print(f"LOOKALIKES OF {segment.upper()} (by current segment)")
+        print("="*80)
+        print(result['Segment'].value_counts().to_string())
+        print("\n" + "="*80)
+        
+        logger.info("="*60)
+        logger.info("Lookalike Search Completed Successfully!")
+        logger.info("="*60)
+        
+        return result
+    
+    except Exception as e:
+        logger.error(f"Error in lookalike search: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consumer360 lookalike customer search')
+    parser.add_argument('--segment', default='Champions', help='Seed segment')
+    parser.add_argument('--count', type=int, default=None, help='Lookalikes to return')
+    args = parser.parse_args()
+    
+    result = main(args.segment, args.count)
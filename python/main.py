@@ -15,9 +15,17 @@ from pathlib import Path
 import sys
 
 # Import analysis modules
-from rfm_analysis import main as rfm_main
+from rfm_analysis import main as rfm_main, main_by_region as rfm_region_main
 from market_basket_analysis import main as market_basket_main
-from config import OUTPUT_DIR, LOG_FILE
+from sequence_mining import main as sequence_main
+from cohort_store import main as cohort_main
+from checkpoints import evict_checkpoints
+from warehouse_writeback import write_rfm_segments, write_market_basket_rules
+from dimension_cache import log_cache_stats
+from config import (
+    OUTPUT_DIR, LOG_FILE, WRITEBACK_CONFIG, RFM_GROUPING, SEQUENCE_MINING_CONFIG,
+    COHORT_STORE_CONFIG, DIMENSION_CACHE_CONFIG
+)
 
 # Set up logging
 logging.basicConfig(
@@ -54,14 +62,37 @@ def main():
         rfm_df, rfm_summary = rfm_main()
         logger.info("✓ RFM analysis completed successfully")
         
+        if RFM_GROUPING['enabled']:
+            logger.info("Starting per-region RFM analysis...")
+            rfm_region_main()
+            logger.info("✓ Per-region RFM analysis completed successfully")
+        
         # Step 2: Market Basket Analysis
         print_banner("STEP 2: MARKET BASKET ANALYSIS")
         logger.info("Starting Market Basket analysis...")
         rules, report = market_basket_main()
         logger.info("✓ Market Basket analysis completed successfully")
         
-        # Step 3: Generate Combined Report
-        print_banner("STEP 3: GENERATING COMBINED INSIGHTS REPORT")
+        if SEQUENCE_MINING_CONFIG['enabled']:
+            logger.info("Starting sequential pattern mining...")
+            sequence_main()
+            logger.info("✓ Sequential pattern mining completed successfully")
+        
+        if COHORT_STORE_CONFIG['enabled']:
+            logger.info("Refreshing cohort retention matrix...")
+            cohort_main()
+            logger.info("✓ Cohort store refresh completed successfully")
+        
+        # Step 3: Write results back to the warehouse
+        if WRITEBACK_CONFIG['enabled']:
+            print_banner("STEP 3: WRITING RESULTS TO WAREHOUSE")
+            logger.info("Writing results back to the warehouse...")
+            write_rfm_segments(rfm_df)
+            write_market_basket_rules(report)
+            logger.info("✓ Warehouse write-back completed successfully")
+        
+        # Step 4: Generate Combined Report
+        print_banner("STEP 4: GENERATING COMBINED INSIGHTS REPORT")
         generate_insights_report(rfm_summary, report)
         
         # Calculate execution time
@@ -84,6 +115,13 @@ def main():
         
         logger.info(f"Pipeline completed in {duration:.2f} seconds")
         
+        # Cached dimensions persist across scheduled runs in the same process
+        if DIMENSION_CACHE_CONFIG['enabled']:
+            log_cache_stats()
+        
+        # Apply checkpoint retention now that the run has succeeded
+        evict_checkpoints()
+        
         return True
     
     except Exception as e:
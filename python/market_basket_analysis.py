@@ -4,15 +4,24 @@ Week 2: Python Logic Core
 
 This script performs Market Basket Analysis using the Apriori algorithm
 to discover association rules (e.g., "People who bought Bread often bought Butter")
+
+For interactive exploration, --sample mines a stratified random sample of
+transactions instead and reports confidence intervals for every rule.
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from mlxtend.frequent_patterns import apriori, association_rules
 from mlxtend.preprocessing import TransactionEncoder
 import logging
-from config import MARKET_BASKET_CONFIG, MARKET_BASKET_OUTPUT_FILE
+from statistics import NormalDist
+from config import (
+    MARKET_BASKET_CONFIG, MARKET_BASKET_OUTPUT_FILE, MARKET_BASKET_SAMPLING,
+    MARKET_BASKET_SAMPLED_OUTPUT_FILE, CHECKPOINT_CONFIG
+)
 from db_utils import get_market_basket_data
+from checkpoints import run_step, checkpoint_key, extract_key, frame_fingerprint
 
 # Set up logging
 logging.basicConfig(
@@ -52,25 +61,165 @@ def prepare_transactions(df):
     return df_encoded, transactions
 
 
-def find_frequent_itemsets(df_encoded, min_support):
+def reduce_transactions(df, min_support, transaction_weights=None):
+    """
+    Shrink the transaction data before mining
+    
+    Items below min_support are dropped after a single counting pass (no
+    itemset containing them can be frequent), then identical baskets are
+    collapsed into one row with an integer weight. Transactions left with
+    no frequent items are kept as an empty basket so supports are still
+    divided by the full transaction count.
+    
+    Args:
+        df (pd.DataFrame): Transaction-product data
+        min_support (float): Minimum support threshold
+        transaction_weights (pd.Series, optional): Weight per TransactionID (e.g. sampling
+            weights); collapsed baskets then carry the summed weight
+    
+    Returns:
+        pd.DataFrame: One-hot encoded matrix of unique baskets
+        np.ndarray: Number of transactions (or total weight) behind each unique basket
+    """
+    logger.info("Reducing transactions before mining...")
+    
+    pairs = df[['TransactionID', 'ProductName']].drop_duplicates()
+    transaction_codes, transaction_ids = pd.factorize(pairs['TransactionID'])
+    n_transactions = len(transaction_ids)
+    
+    # 1. Drop items that can never reach min_support
+    if transaction_weights is None:
+        item_counts = pairs['ProductName'].value_counts()
+        total_weight = n_transactions
+    else:
+        transaction_weights = transaction_weights.reindex(transaction_ids).to_numpy(dtype=np.float64)
+        item_counts = pd.Series(transaction_weights[transaction_codes]).groupby(pairs['ProductName'].to_numpy()).sum()
+        total_weight = transaction_weights.sum()
+    frequent_items = np.sort(item_counts.index[item_counts / total_weight >= min_support].to_numpy())
+    keep = pairs['ProductName'].isin(frequent_items).to_numpy()
+    
+    # 2. Encode the remaining items and collapse identical baskets
+    item_codes = np.searchsorted(frequent_items, pairs['ProductName'].to_numpy()[keep])
+    encoded = np.zeros((n_transactions, len(frequent_items)), dtype=bool)
+    encoded[transaction_codes[keep], item_codes] = True
+    
+    _, first_rows, basket_codes, weights = np.unique(
+        np.packbits(encoded, axis=1),
+        axis=0,
+        return_index=True,
+        return_inverse=True,
+        return_counts=True
+    )
+    if transaction_weights is not None:
+        weights = np.bincount(basket_codes.ravel(), weights=transaction_weights, minlength=len(first_rows))
+    df_encoded = pd.DataFrame(encoded[first_rows], columns=frequent_items)
+    
+    logger.info(
+        f"Items: {len(item_counts)} -> {len(frequent_items)} "
+        f"({len(frequent_items) / max(len(item_counts), 1):.1%} kept)"
+    )
+    logger.info(
+        f"Baskets: {n_transactions} -> {len(df_encoded)} unique "
+        f"({n_transactions / max(len(df_encoded), 1):.1f}x reduction)"
+    )
+    
+    return df_encoded, weights
+
+
+def weighted_apriori(df_encoded, weights, min_support, max_len=None, chunk_cells=50_000_000):
+    """
+    Apriori over weighted baskets
+    
+    Support of an itemset is the total weight of the baskets containing it
+    divided by the total weight, so collapsed baskets give exactly the same
+    supports as mining every transaction.
+    
+    Args:
+        df_encoded (pd.DataFrame): One-hot encoded basket matrix
+        weights (np.ndarray): Number of transactions behind each basket (integer), or
+            sampling weights (float)
+        min_support (float): Minimum support threshold
+        max_len (int, optional): Maximum itemset length
+        chunk_cells (int): Upper bound on matrix cells evaluated per candidate chunk
+    
+    Returns:
+        pd.DataFrame: Frequent itemsets ('support', 'itemsets'), as mlxtend apriori returns them
+    """
+    X = df_encoded.to_numpy(dtype=bool)
+    weights = np.asarray(weights)
+    if weights.dtype.kind != 'f':
+        weights = weights.astype(np.int64)
+    n_transactions = weights.sum()
+    columns = df_encoded.columns
+    
+    supports = (weights @ X) / n_transactions
+    current = np.flatnonzero(supports >= min_support).reshape(-1, 1)
+    results = [(supports[current[:, 0]], current)]
+    
+    while len(current) and (max_len is None or current.shape[1] < max_len):
+        # Join itemsets sharing all but their last item, then drop candidates
+        # with an infrequent subset
+        frequent = set(map(tuple, current))
+        prefixes = {}
+        for itemset in current:
+            prefixes.setdefault(tuple(itemset[:-1]), []).append(itemset[-1])
+        
+        candidates = []
+        for prefix, last_items in prefixes.items():
+            for i, a in enumerate(last_items):
+                for b in last_items[i + 1:]:
+                    candidate = prefix + (a, b)
+                    if all(candidate[:j] + candidate[j + 1:] in frequent for j in range(len(candidate) - 2)):
+                        candidates.append(candidate)
+        
+        if not candidates:
+            break
+        
+        candidates = np.array(candidates)
+        chunk = max(1, chunk_cells // max(X.shape[0] * candidates.shape[1], 1))
+        counts = np.concatenate([
+            weights @ X[:, candidates[i:i + chunk]].all(axis=2)
+            for i in range(0, len(candidates), chunk)
+        ])
+        
+        candidate_supports = counts / n_transactions
+        is_frequent = candidate_supports >= min_support
+        current = candidates[is_frequent]
+        results.append((candidate_supports[is_frequent], current))
+    
+    return pd.DataFrame({
+        'support': np.concatenate([level_supports for level_supports, _ in results]),
+        'itemsets': [
+            frozenset(columns[itemset])
+            for _, level_itemsets in results
+            for itemset in level_itemsets
+        ],
+    })
+
+
+def find_frequent_itemsets(df_encoded, min_support, weights=None):
     """
     Find frequent itemsets using Apriori algorithm
     
     Args:
         df_encoded (pd.DataFrame): One-hot encoded transaction matrix
         min_support (float): Minimum support threshold
+        weights (np.ndarray, optional): Transactions behind each row (from reduce_transactions)
     
     Returns:
         pd.DataFrame: Frequent itemsets
     """
     logger.info(f"Finding frequent itemsets (min_support={min_support})...")
     
-    frequent_itemsets = apriori(
-        df_encoded,
-        min_support=min_support,
-        use_colnames=True,
-        low_memory=True
-    )
+    if weights is not None:
+        frequent_itemsets = weighted_apriori(df_encoded, weights, min_support)
+    else:
+        frequent_itemsets = apriori(
+            df_encoded,
+            min_support=min_support,
+            use_colnames=True,
+            low_memory=True
+        )
     
     logger.info(f"Found {len(frequent_itemsets)} frequent itemsets")
     
@@ -193,6 +342,326 @@ def generate_market_basket_report(rules):
     return report
 
 
+def transaction_strata(df, stratify_by):
+    """
+    Stratum label of every transaction
+    
+    Args:
+        df (pd.DataFrame): Transaction-product data
+        stratify_by (str): 'month' (OrderDate month) or 'category' (Category of
+            the transaction's first line)
+    
+    Returns:
+        pd.Series: Stratum label indexed by TransactionID
+    """
+    if stratify_by == 'month':
+        first_lines = df.groupby('TransactionID', sort=False)['OrderDate'].first()
+        return pd.to_datetime(first_lines).dt.strftime('%Y-%m')
+    if stratify_by == 'category':
+        return df.groupby('TransactionID', sort=False)['Category'].first()
+    
+    raise ValueError(f"Unknown stratify_by '{stratify_by}' (expected 'month' or 'category')")
+
+
+def sample_transactions(df, fraction, stratify_by='month', random_state=None):
+    """
+    Draw a stratified random sample of transactions
+    
+    Every stratum contributes the same share of its transactions (at least two
+    where it has them, so its variance can be estimated), and each sampled
+    transaction stands for N_h / n_h transactions of its stratum.
+    
+    Args:
+        df (pd.DataFrame): Transaction-product data
+        fraction (float): Share of transactions to draw from each stratum
+        stratify_by (str): 'month' or 'category'
+        random_state (int, optional): Seed for reproducible samples
+    
+    Returns:
+        pd.DataFrame: Rows of the sampled transactions
+        dict: Sampling design (stratum code and weight per sampled TransactionID,
+              stratum labels, population and sample sizes)
+    """
+    strata = transaction_strata(df, stratify_by)
+    codes, labels = pd.factorize(strata.to_numpy(), sort=True)
+    
+    population = np.bincount(codes, minlength=len(labels))
+    sample_sizes = np.minimum(population, np.maximum(2, np.round(population * fraction))).astype(np.int64)
+    
+    # Shuffle within each stratum and keep its first n_h transactions
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(len(codes)), codes))
+    stratum_starts = np.cumsum(population) - population
+    rank = np.arange(len(order)) - stratum_starts[codes[order]]
+    chosen = np.sort(order[rank < sample_sizes[codes[order]]])
+    
+    chosen_ids = strata.index[chosen]
+    chosen_codes = codes[chosen]
+    design = {
+        'strata': pd.Series(chosen_codes, index=chosen_ids),
+        'weights': pd.Series(population[chosen_codes] / sample_sizes[chosen_codes], index=chosen_ids),
+        'labels': labels,
+        'population': population,
+        'sample_sizes': sample_sizes,
+    }
+    
+    logger.info(
+        f"Sampled {len(chosen_ids)} of {len(codes)} transactions "
+        f"({len(chosen_ids) / max(len(codes), 1):.1%}) across {len(labels)} {stratify_by} strata"
+    )
+    return df[df['TransactionID'].isin(chosen_ids)], design
+
+
+def lowered_support(min_support, sample_size, confidence_level):
+    """
+    Support threshold to mine a sample at so frequent itemsets are not missed
+    
+    An itemset whose true support is exactly min_support shows a sample support
+    below min_support - z * sqrt(s(1 - s) / n) only with probability
+    1 - confidence_level (one-sided, normal approximation). The threshold is
+    never lowered below half of min_support.
+    
+    Args:
+        min_support (float): Target support threshold
+        sample_size (int): Sampled transactions
+        confidence_level (float): Probability of keeping a borderline itemset
+    
+    Returns:
+        float: Lowered support threshold
+    """
+    z = NormalDist().inv_cdf(confidence_level)
+    margin = z * np.sqrt(min_support * (1 - min_support) / max(sample_size, 1))
+    return max(min_support - margin, min_support / 2)
+
+
+def count_itemsets(df, itemsets, groups=None, n_groups=1, chunk_cells=50_000_000):
+    """
+    Count the transactions containing each itemset, optionally per group
+    
+    Only the items that occur in the itemsets are encoded, and identical
+    (group, basket) rows are collapsed before counting.
+    
+    Args:
+        df (pd.DataFrame): Transaction-product data
+        itemsets (list): frozensets of product names
+        groups (pd.Series, optional): Group code (0 .. n_groups - 1) per TransactionID
+        n_groups (int): Number of groups
+        chunk_cells (int): Upper bound on matrix cells evaluated per itemset chunk
+    
+    Returns:
+        np.ndarray: (len(itemsets), n_groups) transaction counts
+    """
+    items = np.array(sorted(set().union(*itemsets)), dtype=object)
+    counts = np.zeros((len(itemsets), n_groups), dtype=np.int64)
+    
+    pairs = df.loc[df['ProductName'].isin(items), ['TransactionID', 'ProductName']].drop_duplicates()
+    if pairs.empty:
+        return counts
+    
+    transaction_codes, transaction_ids = pd.factorize(pairs['TransactionID'])
+    if groups is None:
+        group_codes = np.zeros(len(transaction_ids), dtype=np.int64)
+    else:
+        group_codes = groups.reindex(transaction_ids).to_numpy(dtype=np.int64)
+    
+    # Last column is always set, so shorter itemsets can be padded with it
+    encoded = np.zeros((len(transaction_ids), len(items) + 1), dtype=bool)
+    encoded[:, -1] = True
+    encoded[transaction_codes, np.searchsorted(items, pairs['ProductName'].to_numpy())] = True
+    
+    _, first_rows, basket_codes = np.unique(
+        np.packbits(encoded, axis=1), axis=0, return_index=True, return_inverse=True
+    )
+    keys, key_rows, key_counts = np.unique(
+        group_codes * len(first_rows) + basket_codes.ravel(), return_index=True, return_counts=True
+    )
+    X = encoded[key_rows]
+    row_groups = group_codes[key_rows]
+    present = np.unique(row_groups)
+    group_starts = np.searchsorted(row_groups, present)
+    
+    width = max(len(itemset) for itemset in itemsets)
+    padded = np.full((len(itemsets), width), len(items), dtype=np.int64)
+    for i, itemset in enumerate(itemsets):
+        padded[i, :len(itemset)] = np.searchsorted(items, sorted(itemset))
+    
+    chunk = max(1, chunk_cells // max(X.shape[0] * width, 1))
+    for i in range(0, len(itemsets), chunk):
+        contains = X[:, padded[i:i + chunk]].all(axis=2) * key_counts[:, None]
+        counts[i:i + chunk, present] = np.add.reduceat(contains, group_starts, axis=0).T
+    
+    return counts
+
+
+def _stratified_variance(sums, sums_sq, design):
+    """
+    Variance of a stratified mean from per-stratum sums and sums of squares
+    
+    Var = sum_h W_h^2 (1 - n_h / N_h) s_h^2 / n_h, with W_h = N_h / N and s_h^2
+    the within-stratum sample variance (taken as 0 for single-transaction strata).
+    """
+    population = design['population']
+    n = design['sample_sizes']
+    stratum_weights = population / population.sum()
+    
+    within = np.divide(
+        sums_sq - sums ** 2 / n,
+        n - 1,
+        out=np.zeros_like(sums, dtype=np.float64),
+        where=n > 1
+    )
+    return (stratum_weights ** 2 * (1 - n / population) * np.maximum(within, 0) / n).sum(axis=1)
+
+
+def rule_intervals(df_sample, design, rules, confidence_level):
+    """
+    Stratified estimates and confidence intervals for support, confidence and lift
+    
+    Support is a stratified proportion. Confidence (a ratio of supports) and
+    lift (via its logarithm) use delta-method linearisation, whose per-stratum
+    sums reduce to counts of the antecedent, consequent and rule itemsets
+    because every transaction containing the rule contains both sides.
+    
+    Args:
+        df_sample (pd.DataFrame): Sampled transaction-product data
+        design (dict): Sampling design from sample_transactions
+        rules (pd.DataFrame): Rules mined from the sample ('antecedents', 'consequents')
+        confidence_level (float): Two-sided interval coverage
+    
+    Returns:
+        pd.DataFrame: rules with re-estimated support/confidence/lift and _low/_high bounds
+    """
+    rules = rules.copy()
+    if rules.empty:
+        for metric in ('support', 'confidence', 'lift'):
+            rules[f'{metric}_low'] = rules[f'{metric}_high'] = pd.Series(dtype=np.float64)
+        return rules
+    
+    antecedents = list(rules['antecedents'])
+    consequents = list(rules['consequents'])
+    itemsets = list(dict.fromkeys(antecedents + consequents + [a | c for a, c in zip(antecedents, consequents)]))
+    position = {itemset: i for i, itemset in enumerate(itemsets)}
+    
+    counts = count_itemsets(df_sample, itemsets, design['strata'], len(design['labels']))
+    k_a = counts[[position[a] for a in antecedents]]
+    k_c = counts[[position[c] for c in consequents]]
+    k_ac = counts[[position[a | c] for a, c in zip(antecedents, consequents)]]
+    
+    n = design['sample_sizes']
+    stratum_weights = design['population'] / design['population'].sum()
+    s_a = (stratum_weights * k_a / n).sum(axis=1)
+    s_c = (stratum_weights * k_c / n).sum(axis=1)
+    s_ac = (stratum_weights * k_ac / n).sum(axis=1)
+    confidence = s_ac / s_a
+    lift = confidence / s_c
+    
+    z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+    
+    # Support: indicator y of the rule itemset (y^2 = y)
+    support_se = np.sqrt(_stratified_variance(k_ac, k_ac, design))
+    
+    # Confidence: (y - r a) / s_a, using y a = y and a^2 = a
+    r = confidence[:, None]
+    confidence_se = np.sqrt(_stratified_variance(
+        (k_ac - r * k_a) / s_a[:, None],
+        (k_ac - 2 * r * k_ac + r ** 2 * k_a) / s_a[:, None] ** 2,
+        design
+    ))
+    
+    # Log lift: y / s_ac - a / s_a - c / s_c, using y a = y c = a c = y
+    s_a, s_c, s_ac = s_a[:, None], s_c[:, None], s_ac[:, None]
+    log_lift_se = np.sqrt(_stratified_variance(
+        k_ac / s_ac - k_a / s_a - k_c / s_c,
+        k_ac / s_ac ** 2 + k_a / s_a ** 2 + k_c / s_c ** 2
+        - 2 * k_ac / (s_ac * s_a) - 2 * k_ac / (s_ac * s_c) + 2 * k_ac / (s_a * s_c),
+        design
+    ))
+    
+    rules['support'] = s_ac[:, 0]
+    rules['support_low'] = np.clip(s_ac[:, 0] - z * support_se, 0, 1)
+    rules['support_high'] = np.clip(s_ac[:, 0] + z * support_se, 0, 1)
+    rules['confidence'] = confidence
+    rules['confidence_low'] = np.clip(confidence - z * confidence_se, 0, 1)
+    rules['confidence_high'] = np.clip(confidence + z * confidence_se, 0, 1)
+    rules['lift'] = lift
+    rules['lift_low'] = lift * np.exp(-z * log_lift_se)
+    rules['lift_high'] = lift * np.exp(z * log_lift_se)
+    
+    return rules
+
+
+def verify_rules_exact(df_transactions, rules):
+    """
+    Recount sampled rules over every transaction
+    
+    Args:
+        df_transactions (pd.DataFrame): Full transaction-product data
+        rules (pd.DataFrame): Candidate rules ('antecedents', 'consequents')
+    
+    Returns:
+        pd.DataFrame: rules with exact_support, exact_confidence and exact_lift added
+    """
+    rules = rules.copy()
+    if rules.empty:
+        for metric in ('exact_support', 'exact_confidence', 'exact_lift'):
+            rules[metric] = pd.Series(dtype=np.float64)
+        return rules
+    
+    logger.info(f"Verifying {len(rules)} candidate rules over all transactions...")
+    antecedents = list(rules['antecedents'])
+    consequents = list(rules['consequents'])
+    itemsets = list(dict.fromkeys(antecedents + consequents + [a | c for a, c in zip(antecedents, consequents)]))
+    position = {itemset: i for i, itemset in enumerate(itemsets)}
+    
+    counts = count_itemsets(df_transactions, itemsets)[:, 0]
+    n_transactions = df_transactions['TransactionID'].nunique()
+    support_a = counts[[position[a] for a in antecedents]] / n_transactions
+    support_c = counts[[position[c] for c in consequents]] / n_transactions
+    support_ac = counts[[position[a | c] for a, c in zip(antecedents, consequents)]] / n_transactions
+    
+    rules['exact_support'] = support_ac
+    rules['exact_confidence'] = support_ac / support_a
+    rules['exact_lift'] = support_ac / (support_a * support_c)
+    
+    return rules
+
+
+def generate_sampled_report(rules):
+    """
+    Summary report of sampled market basket analysis with confidence intervals
+    
+    Args:
+        rules (pd.DataFrame): Rules from rule_intervals (and optionally verify_rules_exact)
+    
+    Returns:
+        pd.DataFrame: Rules with estimates, interval bounds and exact values when verified
+    """
+    logger.info("Generating sampled market basket report...")
+    
+    report = pd.DataFrame({
+        'If_Customer_Buys': rules['antecedents_str'],
+        'Then_Also_Buys': rules['consequents_str'],
+    })
+    for metric, label in (('support', 'Support'), ('confidence', 'Confidence')):
+        report[f'{label}_%'] = (rules[metric] * 100).round(2)
+        report[f'{label}_Low_%'] = (rules[f'{metric}_low'] * 100).round(2)
+        report[f'{label}_High_%'] = (rules[f'{metric}_high'] * 100).round(2)
+    report['Lift'] = rules['lift'].round(2)
+    report['Lift_Low'] = rules['lift_low'].round(2)
+    report['Lift_High'] = rules['lift_high'].round(2)
+    report['Antecedent_Category'] = rules['antecedent_categories']
+    report['Consequent_Category'] = rules['consequent_categories']
+    report['Cross_Category'] = rules['is_cross_category']
+    
+    if 'exact_support' in rules.columns:
+        report['Exact_Support_%'] = (rules['exact_support'] * 100).round(2)
+        report['Exact_Confidence_%'] = (rules['exact_confidence'] * 100).round(2)
+        report['Exact_Lift'] = rules['exact_lift'].round(2)
+        report['Verified'] = rules['verified']
+    
+    return report.sort_values('Lift', ascending=False).reset_index(drop=True)
+
+
 def main():
     """
     Main execution function for Market Basket Analysis
@@ -204,18 +673,43 @@ def main():
         
         # 1. Extract data from database
         logger.info("Step 1: Extracting transaction data from database...")
-        df_transactions = get_market_basket_data()
+        df_transactions = run_step(
+            'mb_extract',
+            extract_key('mb_extract', 'market_basket'),
+            get_market_basket_data,
+            max_age_hours=CHECKPOINT_CONFIG['extraction_ttl_hours']
+        )
         logger.info(f"Loaded {df_transactions['TransactionID'].nunique()} transactions")
         
         # 2. Prepare transactions
         logger.info("Step 2: Preparing transaction matrix...")
-        df_encoded, transactions = prepare_transactions(df_transactions)
+        encode_key = checkpoint_key(
+            'mb_encode',
+            frame_fingerprint(df_transactions),
+            MARKET_BASKET_CONFIG['min_support'],
+            MARKET_BASKET_CONFIG['reduce_transactions']
+        )
+        if MARKET_BASKET_CONFIG['reduce_transactions']:
+            df_encoded, weights = run_step(
+                'mb_encode',
+                encode_key,
+                reduce_transactions,
+                df_transactions,
+                MARKET_BASKET_CONFIG['min_support']
+            )
+        else:
+            df_encoded, transactions = run_step('mb_encode', encode_key, prepare_transactions, df_transactions)
+            weights = None
         
         # 3. Find frequent itemsets
         logger.info("Step 3: Finding frequent itemsets...")
-        frequent_itemsets = find_frequent_itemsets(
+        frequent_itemsets = run_step(
+            'mb_itemsets',
+            checkpoint_key('mb_itemsets', encode_key, MARKET_BASKET_CONFIG['min_support']),
+            find_frequent_itemsets,
             df_encoded,
-            MARKET_BASKET_CONFIG['min_support']
+            MARKET_BASKET_CONFIG['min_support'],
+            weights
         )
         
         # 4. Generate association rules
@@ -277,5 +771,113 @@ def main():
         raise
 
 
+def main_sampled(fraction=None, stratify_by=None, verify=None):
+    """
+    Sampled Market Basket Analysis for interactive exploration
+    
+    Mines a stratified sample at a lowered support threshold, keeps the rules
+    whose confidence intervals reach the configured thresholds, and optionally
+    recounts them exactly over all transactions.
+    
+    Args:
+        fraction (float, optional): Share of transactions to sample (defaults to MARKET_BASKET_SAMPLING)
+        stratify_by (str, optional): 'month' or 'category'
+        verify (bool, optional): Run the exact verification pass
+    """
+    fraction = fraction or MARKET_BASKET_SAMPLING['sample_fraction']
+    stratify_by = stratify_by or MARKET_BASKET_SAMPLING['stratify_by']
+    verify = MARKET_BASKET_SAMPLING['verify'] if verify is None else verify
+    confidence_level = MARKET_BASKET_SAMPLING['confidence_level']
+    min_support = MARKET_BASKET_CONFIG['min_support']
+    min_confidence = MARKET_BASKET_CONFIG['min_confidence']
+    min_lift = MARKET_BASKET_CONFIG['min_lift']
+    
+    try:
+        logger.info("="*60)
+        logger.info("Starting Sampled Market Basket Analysis")
+        logger.info("="*60)
+        
+        # 1. Extract data from database
+        logger.info("Step 1: Extracting transaction data from database...")
+        df_transactions = run_step(
+            'mb_extract',
+            extract_key('mb_extract', 'market_basket'),
+            get_market_basket_data,
+            max_age_hours=CHECKPOINT_CONFIG['extraction_ttl_hours']
+        )
+        logger.info(f"Loaded {df_transactions['TransactionID'].nunique()} transactions")
+        
+        # 2. Draw a stratified sample
+        logger.info(f"Step 2: Sampling {fraction:.1%} of transactions by {stratify_by}...")
+        df_sample, design = sample_transactions(
+            df_transactions, fraction, stratify_by, MARKET_BASKET_SAMPLING['random_state']
+        )
+        mining_support = lowered_support(min_support, len(design['strata']), confidence_level)
+        logger.info(f"Mining the sample at min_support={mining_support:.4f} (target {min_support})")
+        
+        # 3. Find frequent itemsets in the weighted sample
+        logger.info("Step 3: Finding frequent itemsets in the sample...")
+        df_encoded, weights = reduce_transactions(df_sample, mining_support, design['weights'])
+        frequent_itemsets = find_frequent_itemsets(df_encoded, mining_support, weights)
+        
+        # 4. Generate rules and keep those whose intervals reach the thresholds
+        logger.info("Step 4: Generating association rules with confidence intervals...")
+        rules = generate_association_rules(frequent_itemsets, 0, 0)
+        rules = rule_intervals(df_sample, design, rules, confidence_level)
+        rules = rules[
+            (rules['support_high'] >= min_support)
+            & (rules['confidence_high'] >= min_confidence)
+            & (rules['lift_high'] >= min_lift)
+        ]
+        logger.info(f"{len(rules)} candidate rules can reach the thresholds")
+        
+        # 5. Optional exact verification pass
+        if verify:
+            logger.info("Step 5: Verifying candidate rules over all transactions...")
+            rules = verify_rules_exact(df_transactions, rules)
+            rules['verified'] = (
+                (rules['exact_support'] >= min_support)
+                & (rules['exact_confidence'] >= min_confidence)
+                & (rules['exact_lift'] >= min_lift)
+            )
+            logger.info(f"{rules['verified'].sum()} of {len(rules)} candidate rules verified")
+        
+        # 6. Analyze by category and generate report
+        logger.info("Step 6: Generating summary report...")
+        rules = analyze_rules_by_category(df_transactions, rules)
+        report = generate_sampled_report(rules)
+        
+        # 7. Save results
+        logger.info("Step 7: Saving results...")
+        report.to_csv(MARKET_BASKET_SAMPLED_OUTPUT_FILE, index=False)
+        logger.info(f"Sampled market basket rules saved to: {MARKET_BASKET_SAMPLED_OUTPUT_FILE}")
+        
+        print("\n" + "="*120)
+        print(f"TOP 20 ASSOCIATION RULES FROM A {fraction:.0%} SAMPLE ({confidence_level:.0%} intervals)")
+        print("="*120)
+        print(report.head(20).to_string(index=False))
+        print("\n" + "="*120)
+        
+        logger.info("="*60)
+        logger.info("Sampled Market Basket Analysis Completed Successfully!")
+        logger.info("="*60)
+        
+        return rules, report
+    
+    except Exception as e:
+        logger.error(f"Error in sampled market basket analysis: {e}")
+        raise
+
+
 if __name__ == "__main__":
-    rules, report = main()
+    parser = argparse.ArgumentParser(description='Consumer360 market basket analysis')
+    parser.add_argument('--sample', action='store_true', help='Mine a stratified sample with confidence intervals')
+    parser.add_argument('--fraction', type=float, default=None, help='Share of transactions to sample')
+    parser.add_argument('--stratify-by', choices=['month', 'category'], default=None, help='Sampling strata')
+    parser.add_argument('--verify', action='store_true', default=None, help='Recount sampled rules exactly')
+    args = parser.parse_args()
+    
+    if args.sample:
+        rules, report = main_sampled(args.fraction, args.stratify_by, args.verify)
+    else:
+        rules, report = main()
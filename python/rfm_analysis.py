@@ -6,12 +6,23 @@ This script performs RFM (Recency, Frequency, Monetary) analysis to segment cust
 into actionable groups like Champions, Loyal Customers, At Risk, etc.
 """
 
+import os
+import json
+import uuid
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import logging
-from config import RFM_THRESHOLDS, RFM_OUTPUT_FILE
-from db_utils import get_rfm_data
+from config import (
+    RFM_THRESHOLDS, RFM_OUTPUT_FILE, RFM_SHARDING, CHECKPOINT_CONFIG,
+    RFM_GROUPING, RFM_REGION_OUTPUT_FILE, RFM_MODEL_FILE, RFM_MODEL_DIR, DATA_SOURCE,
+    DIMENSION_CACHE_CONFIG, RFM_SCORING_CONFIG
+)
+from db_utils import get_rfm_data, get_rfm_data_by_region, get_rfm_metrics, join_customer_attributes
+from segment_history import save_snapshot
+from checkpoints import run_step, checkpoint_key, extract_key, frame_fingerprint
 
 # Set up logging
 logging.basicConfig(
@@ -21,43 +32,67 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def calculate_rfm_scores(df):
+def fit_rfm_breakpoints(df):
+    """
+    Fit the quantile breakpoints used for the F and M scores
+    
+    Args:
+        df (pd.DataFrame): Customer data with TotalOrders and TotalRevenue
+    
+    Returns:
+        dict: Bin edges for 'F' (TotalOrders) and 'M' (TotalRevenue)
+    """
+    _, f_bins = pd.qcut(df['TotalOrders'], q=5, retbins=True, duplicates='drop')
+    _, m_bins = pd.qcut(df['TotalRevenue'], q=5, retbins=True, duplicates='drop')
+    
+    return {'F': f_bins, 'M': m_bins}
+
+
+def _recency_scores(df):
+    """Score recency against the fixed RFM_THRESHOLDS day boundaries"""
+    return pd.cut(
+        df['DaysSinceLastPurchase'],
+        bins=[-1] + RFM_THRESHOLDS['recency_days'] + [float('inf')],
+        labels=[5, 4, 3, 2, 1]
+    ).astype(int)
+
+
+def calculate_rfm_scores(df, breakpoints=None, save_model=False):
     """
     Calculate R, F, M scores (1-5 scale) for each customer
     
     Args:
         df (pd.DataFrame): Customer data with Recency, Frequency, Monetary values
+        breakpoints (dict, optional): F/M bin edges from fit_rfm_breakpoints.
+            Fitted on df when not given.
+        save_model (bool): Persist the breakpoints and segment lookup for online scoring
     
     Returns:
         pd.DataFrame: Data with R, F, M scores added
     """
     logger.info("Calculating RFM scores...")
     
+    if breakpoints is None:
+        breakpoints = fit_rfm_breakpoints(df)
+    
     # Recency Score (lower days = higher score)
     # Score 5: Most recent, Score 1: Least recent
-    df['R_Score'] = pd.cut(
-        df['DaysSinceLastPurchase'],
-        bins=[-1] + RFM_THRESHOLDS['recency_days'] + [float('inf')],
-        labels=[5, 4, 3, 2, 1]
-    ).astype(int)
+    df['R_Score'] = _recency_scores(df)
     
     # Frequency Score (higher orders = higher score)
-    # Using quantiles for more balanced distribution
-    df['F_Score'] = pd.qcut(
-        df['TotalOrders'],
-        q=5,
-        labels=[1, 2, 3, 4, 5],
-        duplicates='drop'
-    ).astype(int)
+    # Using quantiles for more balanced distribution. Edges dropped as
+    # duplicates (few distinct values) are padded, so the top scores go unused
+    df['F_Score'] = _scores_from_edges(
+        df['TotalOrders'].to_numpy(dtype=np.float64),
+        _padded_inner_edges(breakpoints['F'])
+    )
     
     # Monetary Score (higher revenue = higher score)
     # Using quantiles for more balanced distribution
-    df['M_Score'] = pd.qcut(
-        df['TotalRevenue'],
-        q=5,
-        labels=[1, 2, 3, 4, 5],
-        duplicates='drop'
-    ).astype(int)
+    df['M_Score'] = _scores_from_edges(
+        df['TotalRevenue'].to_numpy(dtype=np.float64),
+        _padded_inner_edges(breakpoints['M'])
+    )
     
     # Combined RFM Score
     df['RFM_Score'] = df['R_Score'].astype(str) + df['F_Score'].astype(str) + df['M_Score'].astype(str)
@@ -65,10 +100,90 @@ def calculate_rfm_scores(df):
     # Overall RFM Value (simple average)
     df['RFM_Value'] = (df['R_Score'] + df['F_Score'] + df['M_Score']) / 3
     
+    # Publish the breakpoints only once scoring has succeeded
+    if save_model:
+        publish_rfm_model(breakpoints, len(df))
+    
     logger.info("RFM scores calculated successfully")
     return df
 
 
+def segment_for_scores(r, f, m):
+    """
+    Determine the segment for one combination of R, F, M scores
+    
+    Args:
+        r (int): Recency score (1-5)
+        f (int): Frequency score (1-5)
+        m (int): Monetary score (1-5)
+    
+    Returns:
+        str: Segment name
+    """
+    # Champions: High R, F, M
+    if r >= 4 and f >= 4 and m >= 4:
+        return 'Champions'
+    
+    # Loyal Customers: High F and M, moderate R
+    elif f >= 4 and m >= 4:
+        return 'Loyal Customers'
+    
+    # Potential Loyalist: Recent customers with good frequency
+    elif r >= 4 and f >= 3:
+        return 'Potential Loyalist'
+    
+    # Recent Users: Very recent, low frequency
+    elif r >= 4 and f <= 2:
+        return 'Recent Users'
+    
+    # Promising: Recent with moderate spending
+    elif r >= 3 and m >= 3:
+        return 'Promising'
+    
+    # Needs Attention: Above average recency, frequency, and monetary
+    elif r >= 3 and f >= 2 and m >= 2:
+        return 'Needs Attention'
+    
+    # About To Sleep: Below average recency and frequency
+    elif r <= 2 and f >= 2:
+        return 'About To Sleep'
+    
+    # At Risk (Can't Lose Them): High spenders who haven't purchased recently
+    elif r <= 2 and f >= 4 and m >= 4:
+        return "Can't Lose Them"
+    
+    # Hibernating: Low recency, frequency, monetary
+    elif r <= 2 and f <= 2 and m >= 2:
+        return 'Hibernating'
+    
+    # Price Sensitive: Low monetary value regardless of recency
+    elif m <= 2:
+        return 'Price Sensitive'
+    
+    # Lost: Very low scores across the board
+    elif r == 1 and f <= 2:
+        return 'Lost'
+    
+    else:
+        return 'Other'
+
+
+def build_segment_lookup():
+    """
+    Tabulate segment_for_scores for all 125 score combinations
+    
+    Returns:
+        list: Segment names indexed by (R - 1) * 25 + (F - 1) * 5 + (M - 1)
+    """
+    return [
+        segment_for_scores(r, f, m)
+        for r in range(1, 6) for f in range(1, 6) for m in range(1, 6)
+    ]
+
+
+SEGMENT_LOOKUP = np.array(build_segment_lookup(), dtype=object)
+
+
 def assign_segments(df):
     """
     Assign customer segments based on RFM scores
@@ -81,76 +196,286 @@ def assign_segments(df):
     """
     logger.info("Assigning customer segments...")
     
-    def segment_customer(row):
-        """Determine segment based on R, F, M scores"""
-        r, f, m = row['R_Score'], row['F_Score'], row['M_Score']
-        
-        # Champions: High R, F, M
-        if r >= 4 and f >= 4 and m >= 4:
-            return 'Champions'
-        
-        # Loyal Customers: High F and M, moderate R
-        elif f >= 4 and m >= 4:
-            return 'Loyal Customers'
-        
-        # Potential Loyalist: Recent customers with good frequency
-        elif r >= 4 and f >= 3:
-            return 'Potential Loyalist'
-        
-        # Recent Users: Very recent, low frequency
-        elif r >= 4 and f <= 2:
-            return 'Recent Users'
-        
-        # Promising: Recent with moderate spending
-        elif r >= 3 and m >= 3:
-            return 'Promising'
-        
-        # Needs Attention: Above average recency, frequency, and monetary
-        elif r >= 3 and f >= 2 and m >= 2:
-            return 'Needs Attention'
-        
-        # About To Sleep: Below average recency and frequency
-        elif r <= 2 and f >= 2:
-            return 'About To Sleep'
-        
-        # At Risk (Can't Lose Them): High spenders who haven't purchased recently
-        elif r <= 2 and f >= 4 and m >= 4:
-            return "Can't Lose Them"
-        
-        # Hibernating: Low recency, frequency, monetary
-        elif r <= 2 and f <= 2 and m >= 2:
-            return 'Hibernating'
-        
-        # Price Sensitive: Low monetary value regardless of recency
-        elif m <= 2:
-            return 'Price Sensitive'
-        
-        # Lost: Very low scores across the board
-        elif r == 1 and f <= 2:
-            return 'Lost'
-        
-        else:
-            return 'Other'
-    
-    df['Segment'] = df.apply(segment_customer, axis=1)
+    # Index the 125-entry lookup table instead of evaluating the rules row by row
+    codes = (df['R_Score'].to_numpy() - 1) * 25 + (df['F_Score'].to_numpy() - 1) * 5 + (df['M_Score'].to_numpy() - 1)
+    df['Segment'] = SEGMENT_LOOKUP[codes]
     
     logger.info("Customer segments assigned successfully")
     return df
 
 
-def generate_rfm_report(df):
+def save_rfm_model(breakpoints, fitted_customers=None):
     """
-    Generate summary report of RFM analysis
+    Persist the fitted breakpoints and segment lookup as a versioned JSON artifact
+    
+    Each version is kept under RFM_MODEL_DIR (the newest
+    RFM_SCORING_CONFIG['keep_versions'] of them); RFM_MODEL_FILE always holds
+    the latest one and is replaced atomically so online scorers never read a
+    partial file. Versions are the creation time plus a random suffix, so two
+    saves within the same second do not overwrite each other.
     
     Args:
-        df (pd.DataFrame): RFM segmented data
+        breakpoints (dict): F/M bin edges from fit_rfm_breakpoints
+        fitted_customers (int, optional): Customers the breakpoints were fitted on
     
     Returns:
-        pd.DataFrame: Summary statistics by segment
+        dict: The saved model
+    
+    Raises:
+        ValueError: If F or M does not have six edges (rfm_scoring.load_model would reject it)
     """
-    logger.info("Generating RFM summary report...")
+    for score in ('F', 'M'):
+        if len(breakpoints[score]) != 6:
+            raise ValueError(
+                f"{score} breakpoints have {len(breakpoints[score])} edges instead of 6 "
+                f"(too few distinct values)"
+            )
+    
+    created = datetime.now()
+    model = {
+        'schema_version': 1,
+        'version': f"{created.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}",
+        'created': created.isoformat(timespec='seconds'),
+        'fitted_customers': fitted_customers,
+        'recency_days': list(RFM_THRESHOLDS['recency_days']),
+        'F': [float(edge) for edge in breakpoints['F']],
+        'M': [float(edge) for edge in breakpoints['M']],
+        'segments': build_segment_lookup(),
+    }
+    
+    payload = json.dumps(model, indent=2)
+    version_file = RFM_MODEL_DIR / f"rfm_model_{model['version']}.json"
+    version_file.write_text(payload)
+    
+    tmp_file = RFM_MODEL_FILE.with_suffix('.tmp')
+    tmp_file.write_text(payload)
+    os.replace(tmp_file, RFM_MODEL_FILE)
+    
+    logger.info(f"RFM model {model['version']} saved to: {RFM_MODEL_FILE}")
+    _prune_model_versions()
+    return model
+
+
+def _prune_model_versions():
+    """Delete all but the newest RFM_SCORING_CONFIG['keep_versions'] versioned model files"""
+    versions = [path for path in RFM_MODEL_DIR.glob('rfm_model_*.json') if path.name != RFM_MODEL_FILE.name]
+    versions.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+    
+    for path in versions[RFM_SCORING_CONFIG['keep_versions']:]:
+        path.unlink(missing_ok=True)
+
+
+def publish_rfm_model(breakpoints, fitted_customers=None):
+    """
+    Save the model for online scoring, keeping the previous one if the breakpoints are degenerate
+    
+    Args:
+        breakpoints (dict): F/M bin edges from fit_rfm_breakpoints
+        fitted_customers (int, optional): Customers the breakpoints were fitted on
+    
+    Returns:
+        dict: The saved model, or None if it was not saved
+    """
+    try:
+        return save_rfm_model(breakpoints, fitted_customers)
+    except ValueError as e:
+        logger.warning(f"RFM model not saved, online scoring keeps the previous model: {e}")
+        return None
+
+
+def _score_customers(df, save_model=False):
+    """
+    Steps 2-3 of main: score and segment the extracted customers
+    
+    Rows are returned by TotalRevenue descending, ties by CustomerKey, so
+    the sharded and unsharded paths produce the same order.
+    """
+    logger.info("Step 2: Calculating RFM scores...")
+    df = calculate_rfm_scores(df, save_model=save_model)
+    
+    logger.info("Step 3: Assigning customer segments...")
+    df = assign_segments(df)
+    
+    df = df.sort_values(['TotalRevenue', 'CustomerKey'], ascending=[False, True], kind='mergesort')
+    return df.reset_index(drop=True)
+
+
+def _uses_dimension_cache():
+    """Whether get_rfm_data joins customer attributes from the dimension cache"""
+    return DIMENSION_CACHE_CONFIG['enabled'] and DATA_SOURCE != 'files'
+
+
+def _extract_shard(args):
+    """
+    Extract one customer shard (worker process)
+    
+    With the dimension cache enabled only keys and measures are extracted:
+    a worker's cache would be read in full and discarded with the pool, so
+    the parent joins the attributes from its own cache instead.
+    """
+    num_shards, shard = args
+    if _uses_dimension_cache():
+        return get_rfm_metrics(num_shards=num_shards, shard=shard)
+    return get_rfm_data(num_shards=num_shards, shard=shard)
+
+
+def score_rfm_sharded(num_shards, max_workers=None, save_model=False):
+    """
+    Extract customers in parallel shards, then score and segment them
+    
+    Customers are split by CustomerKey % num_shards and each shard is
+    extracted on its own connection in a worker process. The shards are then
+    combined and scored in this process, exactly as the unsharded path
+    scores them: scoring is vectorised, so shipping shards back to workers
+    would cost more than it saves. With the dimension cache enabled, customer
+    attributes are joined here too, so the cache persists across runs and its
+    hit/miss stats cover sharded runs.
+    
+    Args:
+        num_shards (int): Number of shards
+        max_workers (int, optional): Worker processes (defaults to num_shards, capped at CPU count)
+        save_model (bool): Persist the global breakpoints for online scoring
     
-    summary = df.groupby('Segment').agg({
+    Returns:
+        pd.DataFrame: RFM segmented data for all customers
+    """
+    max_workers = max_workers or min(num_shards, os.cpu_count() or 1)
+    logger.info(f"Extracting {num_shards} customer shards with {max_workers} workers...")
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_extract_shard, [(num_shards, shard) for shard in range(num_shards)]))
+    
+    if _uses_dimension_cache():
+        results = [join_customer_attributes(df) for df in results]
+    for shard, df in enumerate(results):
+        logger.info(f"Shard {shard}: {len(df)} customers")
+    
+    df = pd.concat([df for df in results if len(df) > 0] or results[:1], ignore_index=True)
+    return _score_customers(df, save_model=save_model)
+
+
+QUINTILES = np.linspace(0, 1, 6)
+
+
+def _group_quantile_edges(codes, values, counts):
+    """
+    Quintile edges of `values` within every group, in one vectorized pass
+    
+    Matches pd.qcut(q=5) per group (linear interpolation, numpy's lerp).
+    
+    Args:
+        codes (np.ndarray): Group code (0 to len(counts) - 1) of every row
+        values (np.ndarray): Values to bin
+        counts (np.ndarray): Rows per group
+    
+    Returns:
+        np.ndarray: (groups, 6) array of bin edges
+    """
+    sorted_values = values[np.lexsort((values, codes))].astype(np.float64)
+    starts = np.cumsum(counts) - counts
+    
+    position = (counts[:, None] - 1) * QUINTILES[None, :]
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[:, None] - 1)
+    weight = position - lower
+    
+    a = sorted_values[starts[:, None] + lower]
+    b = sorted_values[starts[:, None] + upper]
+    diff = b - a
+    return np.where(weight >= 0.5, b - diff * (1 - weight), a + diff * weight)
+
+
+def _scores_from_edges(values, inner_edges):
+    """Score 1-5 against per-row inner edges, as pd.cut(include_lowest=True) does"""
+    return 1 + (values[:, None] > inner_edges).sum(axis=1)
+
+
+def _padded_inner_edges(edges):
+    """Four inner edges from qcut bin edges, padded with inf where duplicates were dropped"""
+    inner = np.full(4, np.inf)
+    inner[:max(len(edges) - 2, 0)] = np.asarray(edges, dtype=np.float64)[1:-1]
+    return inner
+
+
+def _customer_totals(df):
+    """
+    Per-customer TotalOrders and TotalRevenue from customer-group rows
+    
+    Revenue adds up exactly; orders add up to the distinct count as long as
+    each transaction belongs to one group (a sale has a single RegionKey).
+    """
+    totals = df.groupby('CustomerKey')[['TotalOrders', 'TotalRevenue']].sum()
+    totals['TotalRevenue'] = totals['TotalRevenue'].round(2)
+    return totals
+
+
+def score_rfm_by_group(df, group_column=None, min_group_size=None, global_breakpoints=None):
+    """
+    Calculate RFM scores and segments relative to each group (e.g. region)
+    
+    F and M quantile breakpoints are fitted per group for all groups at once.
+    Groups smaller than min_group_size, or whose values do not yield five
+    distinct bins, are scored against the global breakpoints. These are
+    fitted on per-customer totals, so a customer active in several groups
+    counts once, as in the ungrouped model. Recency uses the fixed
+    RFM_THRESHOLDS for every group.
+    
+    Args:
+        df (pd.DataFrame): Customer data with a group column
+        group_column (str, optional): Column to group by (defaults to RFM_GROUPING)
+        min_group_size (int, optional): Smallest group given its own breakpoints
+            (defaults to RFM_GROUPING; 0 gives every group its own)
+        global_breakpoints (dict, optional): Fallback F/M bin edges (defaults
+            to fitting the per-customer totals of df)
+    
+    Returns:
+        pd.DataFrame: Data with scores, segments and Breakpoint_Source ('group' or 'global')
+    """
+    group_column = group_column or RFM_GROUPING['group_column']
+    if min_group_size is None:
+        min_group_size = RFM_GROUPING['min_group_size']
+    logger.info(f"Calculating RFM scores per {group_column}...")
+    
+    codes, groups = pd.factorize(df[group_column], sort=True)
+    counts = np.bincount(codes, minlength=len(groups))
+    if global_breakpoints is None:
+        global_breakpoints = fit_rfm_breakpoints(_customer_totals(df))
+    
+    columns = {'F': 'TotalOrders', 'M': 'TotalRevenue'}
+    edges = {
+        score: _group_quantile_edges(codes, df[column].to_numpy(dtype=np.float64), counts)
+        for score, column in columns.items()
+    }
+    
+    # A group keeps its own breakpoints only if it is large enough and both
+    # F and M split into five non-empty bins
+    use_group = counts >= min_group_size
+    for score_edges in edges.values():
+        use_group &= np.all(np.diff(score_edges, axis=1) > 0, axis=1)
+    
+    fallback = groups[~use_group]
+    if len(fallback):
+        logger.info(f"{len(fallback)} of {len(groups)} groups use the global breakpoints: {list(fallback)}")
+    
+    df['R_Score'] = _recency_scores(df)
+    for score, column in columns.items():
+        # Pad degenerate global edges so a row can still be scored against four inner edges
+        global_inner = _padded_inner_edges(global_breakpoints[score])
+        
+        inner = np.where(use_group[:, None], edges[score][:, 1:5], global_inner[None, :])
+        df[f"{score}_Score"] = _scores_from_edges(df[column].to_numpy(dtype=np.float64), inner[codes])
+    
+    df['RFM_Score'] = df['R_Score'].astype(str) + df['F_Score'].astype(str) + df['M_Score'].astype(str)
+    df['RFM_Value'] = (df['R_Score'] + df['F_Score'] + df['M_Score']) / 3
+    df['Breakpoint_Source'] = np.where(use_group[codes], 'group', 'global')
+    
+    logger.info("Grouped RFM scores calculated successfully")
+    return assign_segments(df)
+
+
+def _summarize_segments(df, keys):
+    """Aggregate the RFM summary columns over the given grouping keys"""
+    summary = df.groupby(keys).agg({
         'CustomerKey': 'count',
         'TotalRevenue': ['sum', 'mean'],
         'TotalOrders': 'mean',
@@ -173,6 +498,23 @@ def generate_rfm_report(df):
         'Avg_M_Score'
     ]
     
+    return summary
+
+
+def generate_rfm_report(df):
+    """
+    Generate summary report of RFM analysis
+    
+    Args:
+        df (pd.DataFrame): RFM segmented data
+    
+    Returns:
+        pd.DataFrame: Summary statistics by segment
+    """
+    logger.info("Generating RFM summary report...")
+    
+    summary = _summarize_segments(df, 'Segment')
+    
     # Calculate percentage of total customers
     summary['Percentage_of_Customers'] = (summary['Customer_Count'] / summary['Customer_Count'].sum() * 100).round(2)
     
@@ -186,6 +528,97 @@ def generate_rfm_report(df):
     return summary
 
 
+def generate_group_rfm_report(df, group_columns=('RegionKey', 'RegionName')):
+    """
+    Generate the RFM summary report for every group
+    
+    Args:
+        df (pd.DataFrame): Output of score_rfm_by_group
+        group_columns (tuple): Group identifier columns
+    
+    Returns:
+        pd.DataFrame: Summary statistics by group and segment, with
+                      percentages relative to each group's totals
+    """
+    logger.info("Generating per-group RFM summary report...")
+    
+    group_columns = list(group_columns)
+    summary = _summarize_segments(df, group_columns + ['Segment'])
+    
+    group_totals = summary.groupby(level=group_columns)[['Customer_Count', 'Total_Revenue']].transform('sum')
+    summary['Percentage_of_Customers'] = (summary['Customer_Count'] / group_totals['Customer_Count'] * 100).round(2)
+    summary['Percentage_of_Revenue'] = (summary['Total_Revenue'] / group_totals['Total_Revenue'] * 100).round(2)
+    
+    # Within each group, sort by total revenue descending
+    summary = summary.reset_index().sort_values(
+        group_columns + ['Total_Revenue'],
+        ascending=[True] * len(group_columns) + [False]
+    ).set_index(group_columns + ['Segment'])
+    
+    logger.info("Per-group RFM summary report generated successfully")
+    return summary
+
+
+def main_by_region():
+    """
+    Per-region RFM analysis: one extraction, breakpoints fitted per region
+    """
+    try:
+        logger.info("="*60)
+        logger.info("Starting Per-Region RFM Segmentation Analysis")
+        logger.info("="*60)
+        
+        # 1. Extract customer-region metrics once
+        logger.info("Step 1: Extracting customer-region data from database...")
+        df = run_step(
+            'rfm_region_extract',
+            extract_key('rfm_region_extract', 'rfm_by_region', by_run_date=True),
+            get_rfm_data_by_region,
+            max_age_hours=CHECKPOINT_CONFIG['extraction_ttl_hours']
+        )
+        logger.info(f"Loaded {len(df)} customer-region rows in {df['RegionKey'].nunique()} regions")
+        
+        # 2-3. Score against per-region breakpoints and assign segments
+        logger.info("Steps 2-3: Calculating per-region RFM scores and segments...")
+        df = run_step(
+            'rfm_region_scored',
+            checkpoint_key('rfm_region_scored', frame_fingerprint(df), RFM_THRESHOLDS, RFM_GROUPING),
+            score_rfm_by_group,
+            df,
+            'RegionKey'
+        )
+        
+        # 4. Generate per-region summary report
+        logger.info("Step 4: Generating per-region summary report...")
+        summary = generate_group_rfm_report(df)
+        
+        # 5. Save results
+        logger.info("Step 5: Saving results...")
+        df.to_csv(RFM_REGION_OUTPUT_FILE, index=False)
+        logger.info(f"Per-region RFM segmentation saved to: {RFM_REGION_OUTPUT_FILE}")
+        
+        summary_file = RFM_REGION_OUTPUT_FILE.parent / 'rfm_summary_by_region.csv'
+        summary.to_csv(summary_file)
+        logger.info(f"Per-region RFM summary saved to: {summary_file}")
+        
+        # 6. Display results
+        print("\n" + "="*80)
+        print("PER-REGION RFM SEGMENTATION SUMMARY")
+        print("="*80)
+        print(summary.to_string())
+        print("\n" + "="*80)
+        
+        logger.info("="*60)
+        logger.info("Per-Region RFM Analysis Completed Successfully!")
+        logger.info("="*60)
+        
+        return df, summary
+    
+    except Exception as e:
+        logger.error(f"Error in per-region RFM analysis: {e}")
+        raise
+
+
 def main():
     """
     Main execution function for RFM analysis
@@ -195,18 +628,47 @@ def main():
         logger.info("Starting RFM Segmentation Analysis")
         logger.info("="*60)
         
-        # 1. Extract data from database
-        logger.info("Step 1: Extracting customer data from database...")
-        df = get_rfm_data()
-        logger.info(f"Loaded {len(df)} customers")
+        extraction_ttl = CHECKPOINT_CONFIG['extraction_ttl_hours']
+        
+        sharded = RFM_SHARDING['num_shards'] > 1
+        if sharded and DATA_SOURCE == 'files':
+            # Every shard would stream and aggregate the whole export, then filter
+            logger.info("RFM_SHARDING is ignored with DATA_SOURCE = 'files' (the export is aggregated in one pass)")
+            sharded = False
         
-        # 2. Calculate RFM scores
-        logger.info("Step 2: Calculating RFM scores...")
-        df = calculate_rfm_scores(df)
+        if sharded:
+            # 1-3. Extract, score and segment customers shard by shard
+            logger.info("Steps 1-3: Extracting and scoring customers in shards...")
+            df = run_step(
+                'rfm_sharded',
+                extract_key('rfm_sharded', 'rfm', RFM_SHARDING, RFM_THRESHOLDS, by_run_date=True),
+                score_rfm_sharded,
+                RFM_SHARDING['num_shards'],
+                RFM_SHARDING['max_workers'],
+                True,
+                max_age_hours=extraction_ttl
+            )
+            logger.info(f"Loaded {len(df)} customers")
         
-        # 3. Assign segments
-        logger.info("Step 3: Assigning customer segments...")
-        df = assign_segments(df)
+        else:
+            # 1. Extract data from database
+            logger.info("Step 1: Extracting customer data from database...")
+            df = run_step(
+                'rfm_extract',
+                extract_key('rfm_extract', 'rfm', by_run_date=True),
+                get_rfm_data,
+                max_age_hours=extraction_ttl
+            )
+            logger.info(f"Loaded {len(df)} customers")
+            
+            # 2-3. Calculate RFM scores and assign segments
+            df = run_step(
+                'rfm_scored',
+                checkpoint_key('rfm_scored', frame_fingerprint(df), RFM_THRESHOLDS),
+                _score_customers,
+                df,
+                True
+            )
         
         # 4. Generate summary report
         logger.info("Step 4: Generating summary report...")
@@ -221,6 +683,8 @@ def main():
         summary.to_csv(summary_file)
         logger.info(f"RFM summary saved to: {summary_file}")
         
+        save_snapshot(df)
+        
         # 6. Display results
         print("\n" + "="*80)
         print("RFM SEGMENTATION SUMMARY")
@@ -247,4 +711,11 @@ def main():
 
 
 if __name__ == "__main__":
-    df, summary = main()
+    parser = argparse.ArgumentParser(description='Consumer360 RFM segmentation')
+    parser.add_argument('--by-region', action='store_true', help='Score customers relative to each region')
+    args = parser.parse_args()
+    
+    if args.by_region:
+        df, summary = main_by_region()
+    else:
+        df, summary = main()
@@ -0,0 +1,260 @@
+"""
+Consumer360: Online RFM Scoring
+Week 4: Automation & Handoff
+
+This script scores customers from raw metrics (days since last purchase,
+completed orders, revenue) with the breakpoints and segment lookup persisted
+by the last batch run of rfm_analysis, so the CRM can re-score a customer
+right after an order without querying the database or re-fitting quantiles.
+
+    - score_customer: one customer, pure Python (bisect + table lookup)
+    - score_batch:    many customers, vectorized with np.searchsorted
+    - serve:          optional local HTTP endpoint (POST /score, GET /model)
+
+The model file is re-read automatically when a new batch run replaces it.
+"""
+
+import os
+import json
+import bisect
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from config import RFM_MODEL_FILE, RFM_SCORING_CONFIG
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SCHEMA_VERSION = 1
+
+# Loaded models keyed by path, with the file mtime they were read at
+_MODEL_CACHE = {}
+
+
+def load_model(path=None):
+    """
+    Load a persisted RFM model and precompute its lookup structures
+    
+    Args:
+        path (str, optional): Model file (defaults to RFM_MODEL_FILE)
+    
+    Returns:
+        dict: Model with inner bin edges ready for bisect/searchsorted
+    """
+    path = path or RFM_MODEL_FILE
+    with open(path) as file:
+        model = json.load(file)
+    
+    if model.get('schema_version') != SUPPORTED_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported RFM model schema: {model.get('schema_version')}")
+    if len(model['F']) != 6 or len(model['M']) != 6 or len(model['segments']) != 125:
+        raise ValueError(f"Malformed RFM model in {path}")
+    
+    # pd.cut with include_lowest: a value's score is 1 + the number of inner edges below it
+    model['f_inner'] = model['F'][1:5]
+    model['m_inner'] = model['M'][1:5]
+    model['segment_array'] = np.array(model['segments'], dtype=object)
+    
+    logger.info(f"Loaded RFM model {model['version']} from {path}")
+    return model
+
+
+def get_model(path=None):
+    """
+    Return the cached model, reloading it if the file has been replaced
+    
+    Args:
+        path (str, optional): Model file (defaults to RFM_MODEL_FILE)
+    
+    Returns:
+        dict: Loaded model
+    """
+    path = str(path or RFM_MODEL_FILE)
+    mtime = os.stat(path).st_mtime_ns
+    
+    cached = _MODEL_CACHE.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_model(path))
+        _MODEL_CACHE[path] = cached
+    
+    return cached[1]
+
+
+def score_customer(days_since_last_purchase, total_orders, total_revenue, model=None):
+    """
+    Score one customer from raw metrics
+    
+    Args:
+        days_since_last_purchase (int): Days since the customer's last order
+        total_orders (int): Completed orders
+        total_revenue (float): Completed revenue
+        model (dict, optional): Model from load_model (defaults to the cached latest model)
+    
+    Returns:
+        dict: R_Score, F_Score, M_Score, RFM_Score, RFM_Value, Segment and ModelVersion
+    """
+    model = model or get_model()
+    
+    # Recency bins are right-closed: days <= 30 scores 5, (30, 90] scores 4, ...
+    r = 5 - bisect.bisect_left(model['recency_days'], days_since_last_purchase)
+    f = 1 + bisect.bisect_left(model['f_inner'], total_orders)
+    m = 1 + bisect.bisect_left(model['m_inner'], total_revenue)
+    
+    return {
+        'R_Score': r,
+        'F_Score': f,
+        'M_Score': m,
+        'RFM_Score': f"{r}{f}{m}",
+        'RFM_Value': (r + f + m) / 3,
+        'Segment': model['segments'][(r - 1) * 25 + (f - 1) * 5 + (m - 1)],
+        'ModelVersion': model['version'],
+    }
+
+
+def score_batch(df, model=None):
+    """
+    Score many customers from raw metrics
+    
+    Args:
+        df (pd.DataFrame): DaysSinceLastPurchase, TotalOrders and TotalRevenue columns
+        model (dict, optional): Model from load_model (defaults to the cached latest model)
+    
+    Returns:
+        pd.DataFrame: Copy of df with R/F/M scores, RFM_Score, RFM_Value, Segment and ModelVersion added
+    """
+    model = model or get_model()
+    df = df.copy()
+    
+    r = 5 - np.searchsorted(model['recency_days'], df['DaysSinceLastPurchase'].to_numpy(), side='left')
+    f = 1 + np.searchsorted(model['f_inner'], df['TotalOrders'].to_numpy(), side='left')
+    m = 1 + np.searchsorted(model['m_inner'], df['TotalRevenue'].to_numpy(), side='left')
+    
+    df['R_Score'] = r
+    df['F_Score'] = f
+    df['M_Score'] = m
+    df['RFM_Score'] = df['R_Score'].astype(str) + df['F_Score'].astype(str) + df['M_Score'].astype(str)
+    df['RFM_Value'] = (r + f + m) / 3
+    df['Segment'] = model['segment_array'][(r - 1) * 25 + (f - 1) * 5 + (m - 1)]
+    df['ModelVersion'] = model['version']
+    
+    return df
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    Local HTTP endpoint
+    
+    POST /score with a JSON object (one customer) or a list of objects, each with
+    DaysSinceLastPurchase, TotalOrders and TotalRevenue. GET /model returns the
+    active model's version and breakpoints.
+    """
+    
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _load_model(self):
+        """Active model, or None after replying 503 if it cannot be loaded"""
+        try:
+            return get_model()
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot load RFM model: {e}")
+            self._send_json(503, {'error': f"RFM model unavailable: {e}"})
+            return None
+    
+    def do_GET(self):
+        if self.path != '/model':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        
+        model = self._load_model()
+        if model is None:
+            return
+        
+        self._send_json(200, {
+            key: model[key]
+            for key in ('version', 'created', 'fitted_customers', 'recency_days', 'F', 'M')
+        })
+    
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        
+        # Model errors are the server's, not the request's
+        model = self._load_model()
+        if model is None:
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length))
+            
+            if isinstance(payload, list):
+                if len(payload) > RFM_SCORING_CONFIG['max_batch_size']:
+                    raise ValueError(f"Batch larger than {RFM_SCORING_CONFIG['max_batch_size']} customers")
+                scored = score_batch(pd.DataFrame(payload), model)
+                self._send_json(200, json.loads(scored.to_json(orient='records')))
+            else:
+                self._send_json(200, score_customer(
+                    payload['DaysSinceLastPurchase'],
+                    payload['TotalOrders'],
+                    payload['TotalRevenue'],
+                    model
+                ))
+        
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {'error': f"Invalid request: {e}"})
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(host=None, port=None):
+    """
+    Run the local scoring endpoint until interrupted
+    
+    Args:
+        host (str, optional): Bind address (defaults to RFM_SCORING_CONFIG)
+        port (int, optional): Port (defaults to RFM_SCORING_CONFIG)
+    """
+    host = host or RFM_SCORING_CONFIG['host']
+    port = port or RFM_SCORING_CONFIG['port']
+    
+    model = get_model()
+    server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    logger.info(f"Serving RFM model {model['version']} on http://{host}:{port} (POST /score, GET /model)")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Scoring endpoint stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consumer360 online RFM scoring')
+    parser.add_argument('--serve', action='store_true', help='Run the local HTTP endpoint')
+    parser.add_argument('--host', default=None, help='Bind address')
+    parser.add_argument('--port', type=int, default=None, help='Port')
+    parser.add_argument('--score', nargs=3, type=float, metavar=('DAYS', 'ORDERS', 'REVENUE'),
+                        help='Score one customer and print the result')
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.host, args.port)
+    elif args.score:
+        print(json.dumps(score_customer(*args.score), indent=2))
+    else:
+        parser.print_help()
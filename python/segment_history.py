@@ -0,0 +1,252 @@
+"""
+Consumer360: Segment History Store
+Week 2: Python Logic Core
+
+This script keeps a compact per-run snapshot of every customer's R, F, M scores
+and segment so we can answer questions like "who dropped from Champions to
+About To Sleep this week" without keeping full CSV copies of every run.
+
+Each snapshot is one compressed .npz file per run date holding:
+    - key_deltas: sorted CustomerKeys, delta-encoded in the smallest unsigned type
+    - R, F, M:    uint8 scores
+    - Segment:    uint8 codes into SEGMENT_NAMES
+
+Arrays in an .npz file are decompressed on access, so transition and history
+queries only read the columns they need.
+"""
+
+import logging
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from config import SEGMENT_HISTORY_DIR, SEGMENT_NAMES
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'segments_'
+SCORE_FIELDS = {'R': 'R_Score', 'F': 'F_Score', 'M': 'M_Score'}
+
+
+def _snapshot_path(run_date):
+    """Path of the snapshot file for a run date"""
+    return SEGMENT_HISTORY_DIR / f"{SNAPSHOT_PREFIX}{_as_date(run_date).isoformat()}.npz"
+
+
+def _as_date(value):
+    """Normalise a date, datetime or ISO string to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _encode_keys(keys):
+    """Delta-encode sorted keys using the smallest unsigned dtype that fits"""
+    deltas = np.diff(keys, prepend=0)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if deltas.max(initial=0) <= np.iinfo(dtype).max:
+            return deltas.astype(dtype)
+    return deltas.astype(np.uint64)
+
+
+def _decode_keys(deltas):
+    """Rebuild sorted CustomerKeys from their deltas"""
+    return np.cumsum(deltas, dtype=np.int64)
+
+
+def save_snapshot(df, run_date=None):
+    """
+    Store the R, F, M scores and segment of every customer for a run
+    
+    Args:
+        df (pd.DataFrame): RFM segmented data (output of assign_segments)
+        run_date (date, optional): Run date (defaults to today)
+    
+    Returns:
+        Path: Snapshot file written
+    """
+    run_date = _as_date(run_date or date.today())
+    
+    unknown = set(df['Segment'].unique()) - set(SEGMENT_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown segments in snapshot: {sorted(unknown)}")
+    
+    ordered = df.sort_values('CustomerKey')
+    keys = ordered['CustomerKey'].to_numpy(dtype=np.int64)
+    if len(keys) and (keys[0] < 0 or np.any(np.diff(keys) == 0)):
+        raise ValueError("CustomerKey must be non-negative and unique per snapshot")
+    
+    segment_codes = pd.Categorical(ordered['Segment'], categories=SEGMENT_NAMES).codes
+    
+    path = _snapshot_path(run_date)
+    np.savez_compressed(
+        path,
+        key_deltas=_encode_keys(keys),
+        R=ordered['R_Score'].to_numpy(dtype=np.uint8),
+        F=ordered['F_Score'].to_numpy(dtype=np.uint8),
+        M=ordered['M_Score'].to_numpy(dtype=np.uint8),
+        Segment=segment_codes.astype(np.uint8),
+    )
+    
+    logger.info(f"Segment snapshot for {run_date} saved to: {path} ({path.stat().st_size:,} bytes)")
+    return path
+
+
+def list_snapshots():
+    """
+    List the run dates that have a stored snapshot
+    
+    Returns:
+        list: Sorted run dates
+    """
+    return sorted(
+        date.fromisoformat(path.stem[len(SNAPSHOT_PREFIX):])
+        for path in SEGMENT_HISTORY_DIR.glob(f"{SNAPSHOT_PREFIX}*.npz")
+    )
+
+
+def _load_arrays(run_date, fields):
+    """Load the keys plus the requested fields of one snapshot"""
+    path = _snapshot_path(run_date)
+    if not path.exists():
+        raise FileNotFoundError(f"No segment snapshot for {_as_date(run_date)}")
+    
+    with np.load(path) as snapshot:
+        keys = _decode_keys(snapshot['key_deltas'])
+        return keys, {field: snapshot[field] for field in fields}
+
+
+def load_snapshot(run_date, fields=('R', 'F', 'M', 'Segment')):
+    """
+    Load one snapshot as a DataFrame
+    
+    Args:
+        run_date (date): Run date to load
+        fields (tuple): Any of 'R', 'F', 'M', 'Segment'
+    
+    Returns:
+        pd.DataFrame: CustomerKey plus the requested score/segment columns
+    """
+    keys, arrays = _load_arrays(run_date, fields)
+    return _to_frame(keys, arrays)
+
+
+def _to_frame(keys, arrays):
+    """Build a DataFrame with decoded segment labels"""
+    df = pd.DataFrame({'CustomerKey': keys})
+    for field, values in arrays.items():
+        if field == 'Segment':
+            df['Segment'] = pd.Categorical.from_codes(values, categories=SEGMENT_NAMES)
+        else:
+            df[SCORE_FIELDS[field]] = values
+    return df
+
+
+def transition_matrix(from_date, to_date, field='Segment', normalize=False):
+    """
+    Count customers moving between segments (or scores) across two runs
+    
+    Only customers present in both snapshots are counted.
+    
+    Args:
+        from_date (date): Earlier run date
+        to_date (date): Later run date
+        field (str): 'Segment', 'R', 'F' or 'M'
+        normalize (bool): Return row-wise shares instead of counts
+    
+    Returns:
+        pd.DataFrame: Matrix indexed by the from-state, columns are the to-state
+    """
+    keys_a, arrays_a = _load_arrays(from_date, (field,))
+    keys_b, arrays_b = _load_arrays(to_date, (field,))
+    
+    _, idx_a, idx_b = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+    
+    if field == 'Segment':
+        labels = SEGMENT_NAMES
+        codes_a = arrays_a[field][idx_a].astype(np.int64)
+        codes_b = arrays_b[field][idx_b].astype(np.int64)
+    else:
+        labels = [1, 2, 3, 4, 5]
+        codes_a = arrays_a[field][idx_a].astype(np.int64) - 1
+        codes_b = arrays_b[field][idx_b].astype(np.int64) - 1
+    
+    size = len(labels)
+    counts = np.bincount(codes_a * size + codes_b, minlength=size * size).reshape(size, size)
+    
+    matrix = pd.DataFrame(counts, index=pd.Index(labels, name=f"From_{field}"),
+                          columns=pd.Index(labels, name=f"To_{field}"))
+    
+    if normalize:
+        matrix = matrix.div(matrix.sum(axis=1).replace(0, np.nan), axis=0).fillna(0).round(4)
+    
+    return matrix
+
+
+def transitions(from_date, to_date, from_segment, to_segment):
+    """
+    List the customers that moved from one segment to another
+    
+    Args:
+        from_date (date): Earlier run date
+        to_date (date): Later run date
+        from_segment (str): Segment in the earlier run
+        to_segment (str): Segment in the later run
+    
+    Returns:
+        np.ndarray: CustomerKeys that made the transition
+    """
+    keys_a, arrays_a = _load_arrays(from_date, ('Segment',))
+    keys_b, arrays_b = _load_arrays(to_date, ('Segment',))
+    
+    _, idx_a, idx_b = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+    
+    moved = (
+        (arrays_a['Segment'][idx_a] == SEGMENT_NAMES.index(from_segment))
+        & (arrays_b['Segment'][idx_b] == SEGMENT_NAMES.index(to_segment))
+    )
+    return keys_a[idx_a[moved]]
+
+
+def customer_history(customer_keys, run_dates=None, last_n=None, fields=('R', 'F', 'M', 'Segment')):
+    """
+    Get the score/segment history of selected customers across runs
+    
+    Args:
+        customer_keys (list-like): CustomerKeys to look up
+        run_dates (list, optional): Run dates to read (defaults to all snapshots)
+        last_n (int, optional): Only read the most recent N runs
+        fields (tuple): Any of 'R', 'F', 'M', 'Segment'
+    
+    Returns:
+        pd.DataFrame: One row per (RunDate, CustomerKey) found in a snapshot
+    """
+    run_dates = [_as_date(d) for d in run_dates] if run_dates else list_snapshots()
+    if last_n:
+        run_dates = sorted(run_dates)[-last_n:]
+    
+    wanted = np.unique(np.asarray(customer_keys, dtype=np.int64))
+    frames = []
+    
+    for run_date in run_dates:
+        keys, arrays = _load_arrays(run_date, fields)
+        
+        pos = np.searchsorted(keys, wanted)
+        pos_clipped = np.minimum(pos, max(len(keys) - 1, 0))
+        found = (pos < len(keys)) & (keys[pos_clipped] == wanted) if len(keys) else np.zeros(len(wanted), bool)
+        rows = pos[found]
+        
+        frame = _to_frame(keys[rows], {field: values[rows] for field, values in arrays.items()})
+        frame.insert(0, 'RunDate', run_date)
+        frames.append(frame)
+    
+    if not frames:
+        return pd.DataFrame(columns=['RunDate', 'CustomerKey'])
+    
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,403 @@
+"""
+Consumer360: Sequential Pattern Mining
+Week 2: Python Logic Core
+
+This script finds purchase sequences that span several orders of the same
+customer (e.g. "Laptop, then Laptop Bag within 30 days"), which market basket
+analysis misses because it only looks inside one TransactionID.
+
+Mining is PrefixSpan-style over integer-encoded sequences:
+    - Each customer's orders are events sorted by OrderDate; an event holds its item codes
+    - A pattern's projected database is the set of events where its last item matched
+    - Extending a pattern scans only the events inside each match's gap window
+      (later orders at most max_gap_days after the match), in vectorized NumPy
+    - Support is the number of distinct customers containing the pattern
+
+The search space is partitioned by the first item of each pattern, and those
+partitions are mined in parallel worker processes.
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from config import SEQUENCE_MINING_CONFIG, SEQUENCE_OUTPUT_FILE, CHECKPOINT_CONFIG
+from db_utils import get_sequence_data
+from checkpoints import run_step, checkpoint_key, extract_key, frame_fingerprint
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Sequence index shared with worker processes (set by _init_worker)
+_WORKER_INDEX = None
+
+
+def build_sequence_index(customers, orders, days, items, max_gap_days=None):
+    """
+    Build the integer-encoded sequence database
+    
+    Args:
+        customers (np.ndarray): Customer code of every purchase row
+        orders (np.ndarray): Order (transaction) code of every row; codes
+            must increase with order time, as they sequence same-day orders
+        days (np.ndarray): Order day number of every row
+        items (np.ndarray): Item code of every row
+        max_gap_days (int, optional): Maximum days between consecutive pattern items
+    
+    Returns:
+        dict: Rows sorted by (customer, day, order), event offsets and gap windows
+    """
+    customers = np.asarray(customers, dtype=np.int64)
+    orders = np.asarray(orders, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    
+    order = np.lexsort((items, orders, days, customers))
+    customers, orders, days, items = customers[order], orders[order], days[order], items[order]
+    
+    # An event is one order of one customer; an item counts once per event
+    new_event = np.r_[True, (customers[1:] != customers[:-1]) | (orders[1:] != orders[:-1])]
+    duplicate = ~new_event & np.r_[False, items[1:] == items[:-1]]
+    keep = ~duplicate
+    customers, days, items, new_event = customers[keep], days[keep], items[keep], new_event[keep]
+    
+    row_event = np.cumsum(new_event) - 1
+    event_starts = np.flatnonzero(new_event)
+    event_customer = customers[event_starts]
+    event_day = days[event_starts]
+    n_events = len(event_starts)
+    
+    # Last event of the same customer inside each event's gap window, found with
+    # one searchsorted on a composite (customer, day) key
+    if n_events:
+        day_origin = event_day.min()
+        gap = max_gap_days if max_gap_days is not None else event_day.max() - day_origin
+        span = event_day.max() - day_origin + gap + 1
+        event_keys = event_customer * span + (event_day - day_origin)
+        window_end = np.searchsorted(event_keys, event_keys + gap, side='right') - 1
+    else:
+        window_end = np.zeros(0, dtype=np.int64)
+    
+    # Events containing each item, for the first level of the search
+    n_items = int(items.max()) + 1 if len(items) else 0
+    item_rows = np.argsort(items, kind='stable')
+    
+    return {
+        'items': items,
+        'row_event': row_event,
+        'event_customer': event_customer,
+        'event_row_start': np.append(event_starts, len(items)),
+        'window_end': window_end,
+        'item_events': row_event[item_rows],
+        'item_event_start': np.concatenate([[0], np.cumsum(np.bincount(items, minlength=n_items))]),
+        'n_items': n_items,
+        'n_events': n_events,
+        'n_customers': int(customers.max()) + 1 if len(customers) else 0,
+        'customer_count': len(np.unique(event_customer)),
+    }
+
+
+def encode_sequences(df, max_gap_days=None):
+    """
+    Integer-encode the get_sequence_data frame and build the sequence index
+    
+    Args:
+        df (pd.DataFrame): CustomerID, TransactionID, OrderDate, ProductName rows
+        max_gap_days (int, optional): Maximum days between consecutive pattern items
+    
+    Returns:
+        dict: Sequence index (see build_sequence_index)
+        np.ndarray: Item labels indexed by item code
+    """
+    logger.info("Encoding customer purchase sequences...")
+    
+    customers, _ = pd.factorize(df['CustomerID'])
+    items, labels = pd.factorize(df['ProductName'], sort=True)
+    timestamps = pd.to_datetime(df['OrderDate']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    days = timestamps // NS_PER_DAY
+    
+    # Number orders by their earliest timestamp (ties by TransactionID), so
+    # same-day orders are sequenced by time, not by their order in the extract
+    by_time = pd.DataFrame({'OrderDate': timestamps, 'TransactionID': df['TransactionID'].to_numpy()})
+    by_time = by_time.sort_values(['OrderDate', 'TransactionID'], kind='mergesort')
+    orders = np.empty(len(df), dtype=np.int64)
+    orders[by_time.index.to_numpy()] = pd.factorize(by_time['TransactionID'])[0]
+    
+    index = build_sequence_index(customers, orders, days, items, max_gap_days)
+    logger.info(
+        f"Encoded {index['customer_count']} customers, {index['n_events']} orders, "
+        f"{len(labels)} products"
+    )
+    
+    return index, np.asarray(labels)
+
+
+def _concat_ranges(starts, lengths):
+    """Concatenate the integer ranges [start, start + length) without a Python loop"""
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return offsets + np.arange(total)
+
+
+def _project(index, states, min_count, chunk_rows):
+    """
+    Find the frequent one-item extensions of a pattern
+    
+    Args:
+        index (dict): Sequence index
+        states (np.ndarray): Sorted events where the pattern's last item matched
+        min_count (int): Minimum number of supporting customers
+        chunk_rows (int): Projected rows materialised at once
+    
+    Returns:
+        list: (item code, customer count, sorted matching events) per frequent extension
+    """
+    # Rows of the later events inside each state's gap window
+    starts = index['event_row_start'][states + 1]
+    lengths = index['event_row_start'][index['window_end'][states] + 1] - starts
+    
+    cumulative = np.cumsum(lengths)
+    total = int(cumulative[-1]) if len(cumulative) else 0
+    if total == 0:
+        return []
+    
+    n_customers, n_events = index['n_customers'], index['n_events']
+    split_points = np.searchsorted(cumulative, np.arange(chunk_rows, total, chunk_rows), side='right')
+    
+    customer_pairs, event_pairs = [], []
+    for chunk in np.split(np.arange(len(states)), split_points):
+        rows = _concat_ranges(starts[chunk], lengths[chunk])
+        items = index['items'][rows]
+        events = index['row_event'][rows]
+        customer_pairs.append(np.unique(items * n_customers + index['event_customer'][events]))
+        event_pairs.append(np.unique(items * n_events + events))
+    
+    customer_pairs = np.unique(np.concatenate(customer_pairs))
+    counts = np.bincount(customer_pairs // n_customers, minlength=index['n_items'])
+    if counts.max(initial=0) < min_count:
+        return []
+    
+    # New states: distinct (item, event) matches of the frequent extensions
+    event_pairs = np.unique(np.concatenate(event_pairs))
+    pair_items = event_pairs // n_events
+    frequent = counts[pair_items] >= min_count
+    event_pairs, pair_items = event_pairs[frequent], pair_items[frequent]
+    
+    bounds = np.flatnonzero(np.r_[True, pair_items[1:] != pair_items[:-1], True])
+    return [
+        (int(pair_items[start]), int(counts[pair_items[start]]), event_pairs[start:end] % n_events)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _mine_prefix(index, prefix, states, support, min_count, max_length, chunk_rows, results):
+    """Depth-first growth of one pattern, appending (pattern, support, prefix support) to results"""
+    if len(prefix) >= max_length:
+        return
+    
+    for item, count, item_states in _project(index, states, min_count, chunk_rows):
+        pattern = prefix + (item,)
+        results.append((pattern, count, support))
+        _mine_prefix(index, pattern, item_states, count, min_count, max_length, chunk_rows, results)
+
+
+def _first_item_support(index):
+    """Number of customers who bought each item"""
+    n_customers = index['n_customers']
+    pairs = np.unique(index['items'] * n_customers + index['event_customer'][index['row_event']])
+    return np.bincount(pairs // n_customers, minlength=index['n_items'])
+
+
+def _mine_first_item(index, item, support, min_count, max_length, chunk_rows):
+    """Mine every pattern starting with one item"""
+    states = index['item_events'][index['item_event_start'][item]:index['item_event_start'][item + 1]]
+    results = [((item,), support, None)]
+    _mine_prefix(index, (item,), states, support, min_count, max_length, chunk_rows, results)
+    return results
+
+
+def _init_worker(index):
+    """Give a worker process its copy of the sequence index"""
+    global _WORKER_INDEX
+    _WORKER_INDEX = index
+
+
+def _mine_first_item_worker(args):
+    """Mine one first-item partition (worker process)"""
+    return _mine_first_item(_WORKER_INDEX, *args)
+
+
+def mine_sequential_patterns(index, min_support, max_length=3, max_workers=None, chunk_rows=None):
+    """
+    Mine frequent sequential patterns from a sequence index
+    
+    Args:
+        index (dict): Sequence index from build_sequence_index / encode_sequences
+        min_support (float): Minimum share of customers containing a pattern
+        max_length (int): Maximum items in a pattern
+        max_workers (int, optional): Worker processes (1 = mine in this process)
+        chunk_rows (int, optional): Projected rows materialised at once
+    
+    Returns:
+        list: (pattern item codes, customer count, prefix customer count) tuples
+    """
+    chunk_rows = chunk_rows or SEQUENCE_MINING_CONFIG['chunk_rows']
+    min_count = max(1, int(np.ceil(min_support * index['customer_count'])))
+    
+    item_support = _first_item_support(index)
+    first_items = np.flatnonzero(item_support >= min_count)
+    # Largest partitions first so workers finish at roughly the same time
+    first_items = first_items[np.argsort(-item_support[first_items], kind='stable')]
+    tasks = [(int(item), int(item_support[item]), min_count, max_length, chunk_rows) for item in first_items]
+    
+    max_workers = max_workers or os.cpu_count() or 1
+    logger.info(
+        f"Mining sequences: {len(tasks)} frequent items, min {min_count} customers, "
+        f"{min(max_workers, max(len(tasks), 1))} workers"
+    )
+    
+    results = []
+    if max_workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            results.extend(_mine_first_item(index, *task))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(index,)) as pool:
+            for partition in pool.map(_mine_first_item_worker, tasks):
+                results.extend(partition)
+    
+    logger.info(f"Found {len(results)} frequent sequential patterns")
+    return results
+
+
+def generate_sequence_report(results, labels, customer_count):
+    """
+    Build the sequential pattern report
+    
+    Args:
+        results (list): Output of mine_sequential_patterns
+        labels (np.ndarray): Item labels indexed by item code
+        customer_count (int): Customers in the sequence database
+    
+    Returns:
+        pd.DataFrame: One row per pattern with support, confidence and lift
+    """
+    logger.info("Generating sequential pattern report...")
+    
+    first_item_share = {
+        pattern[0]: count / customer_count for pattern, count, _ in results if len(pattern) == 1
+    }
+    
+    rows = []
+    for pattern, count, prefix_count in results:
+        support = count / customer_count
+        if len(pattern) > 1:
+            confidence = count / prefix_count
+            # Lift against the share of customers who ever bought the last item
+            lift = confidence / first_item_share[pattern[-1]]
+        else:
+            confidence = lift = np.nan
+        
+        rows.append({
+            'Pattern': ' -> '.join(labels[list(pattern)]),
+            'Antecedent': ' -> '.join(labels[list(pattern[:-1])]),
+            'Next_Item': labels[pattern[-1]],
+            'Length': len(pattern),
+            'Customer_Count': count,
+            'Support_%': round(support * 100, 2),
+            'Confidence_%': round(confidence * 100, 2),
+            'Lift': round(lift, 2),
+        })
+    
+    report = pd.DataFrame(rows, columns=[
+        'Pattern', 'Antecedent', 'Next_Item', 'Length',
+        'Customer_Count', 'Support_%', 'Confidence_%', 'Lift'
+    ])
+    report = report.sort_values(['Length', 'Customer_Count'], ascending=[False, False]).reset_index(drop=True)
+    
+    logger.info("Sequential pattern report generated successfully")
+    return report
+
+
+def _mine_sequences(df):
+    """Steps 2-3 of main: encode sequences and mine patterns"""
+    config = SEQUENCE_MINING_CONFIG
+    
+    logger.info("Step 2: Encoding customer sequences...")
+    index, labels = encode_sequences(df, config['max_gap_days'])
+    
+    logger.info("Step 3: Mining sequential patterns...")
+    results = mine_sequential_patterns(
+        index,
+        config['min_support'],
+        config['max_length'],
+        config['max_workers'],
+        config['chunk_rows']
+    )
+    
+    return results, labels, index['customer_count']
+
+
+def main():
+    """
+    Main execution function for sequential pattern mining
+    """
+    try:
+        logger.info("="*60)
+        logger.info("Starting Sequential Pattern Mining")
+        logger.info("="*60)
+        
+        # 1. Extract purchase sequences
+        logger.info("Step 1: Extracting purchase sequences from database...")
+        df = run_step(
+            'seq_extract',
+            extract_key('seq_extract', 'sequence'),
+            get_sequence_data,
+            max_age_hours=CHECKPOINT_CONFIG['extraction_ttl_hours']
+        )
+        logger.info(f"Loaded {len(df)} purchase rows")
+        
+        # 2-3. Encode and mine
+        mining_config = {key: value for key, value in SEQUENCE_MINING_CONFIG.items() if key != 'enabled'}
+        results, labels, customer_count = run_step(
+            'seq_patterns',
+            checkpoint_key('seq_patterns', frame_fingerprint(df), mining_config),
+            _mine_sequences,
+            df
+        )
+        
+        # 4. Generate report
+        logger.info("Step 4: Generating summary report...")
+        report = generate_sequence_report(results, labels, customer_count)
+        
+        # 5. Save results
+        logger.info("Step 5: Saving results...")
+        report.to_csv(SEQUENCE_OUTPUT_FILE, index=False)
+        logger.info(f"Sequential patterns saved to: {SEQUENCE_OUTPUT_FILE}")
+        
+        # 6. Display top multi-item patterns
+        print("\n" + "="*120)
+        print(f"TOP 20 PURCHASE SEQUENCES (within {SEQUENCE_MINING_CONFIG['max_gap_days']} days between orders)")
+        print("="*120)
+        print(report[report['Length'] > 1].head(20).to_string(index=False))
+        print("\n" + "="*120)
+        
+        logger.info("="*60)
+        logger.info("Sequential Pattern Mining Completed Successfully!")
+        logger.info("="*60)
+        
+        return report
+    
+    except Exception as e:
+        logger.error(f"Error in sequential pattern mining: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    report = main()
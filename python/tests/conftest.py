@@ -0,0 +1,15 @@
+"""
+Consumer360: Test Configuration
+
+Makes the pipeline modules (and the synthetic data builders in benchmarks/)
+importable. Run from a scratch directory, since importing config creates
+output/ in the working directory:
+
+    cd /tmp && python -m pytest /path/to/python/tests
+"""
+
+import sys
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(PYTHON_DIR), str(PYTHON_DIR / 'benchmarks')]
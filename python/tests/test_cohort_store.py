@@ -0,0 +1,106 @@
+"""
+Tests for cohort_store.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cohort_store import (
+    _add_to_cell, _merge_cells, _new_registers, _hll_update, cell_cardinality,
+    new_cohort_store, update_cohort_store, retention_matrix, save_cohort_store, load_cohort_store
+)
+
+PRECISION = 14
+# Three standard errors of a precision-14 sketch (1.04 / sqrt(2 ** 14))
+TOLERANCE = 3 * 1.04 / np.sqrt(1 << PRECISION)
+
+
+def _add_in_batches(keys, exact_threshold, batch_size=100):
+    cell = None
+    for start in range(0, len(keys), batch_size):
+        cell = _add_to_cell(cell, keys[start:start + batch_size], PRECISION, exact_threshold)
+    return cell
+
+
+def test_cell_stays_exact_up_to_the_threshold():
+    keys = np.arange(1, 1001, dtype=np.int64)
+    # Every key twice, so the cell has to deduplicate across batches
+    cell = _add_in_batches(np.concatenate([keys, keys[::-1]]), exact_threshold=1000)
+    
+    assert cell[0] == 'exact'
+    np.testing.assert_array_equal(cell[1], keys)
+    assert cell_cardinality(cell) == 1000
+
+
+def test_cell_switches_to_hll_past_the_threshold():
+    keys = np.random.default_rng(4).permutation(np.arange(1, 50_001, dtype=np.int64))
+    
+    cell = _add_in_batches(keys, exact_threshold=1000)
+    
+    # Registers built across the switchover equal a sketch of all keys at once
+    assert cell[0] == 'hll'
+    np.testing.assert_array_equal(cell[1], _hll_update(_new_registers(PRECISION), keys, PRECISION))
+    assert cell_cardinality(cell) == pytest.approx(50_000, rel=TOLERANCE)
+
+
+def test_first_key_past_the_threshold_switches():
+    keys = np.arange(1, 1002, dtype=np.int64)
+    
+    assert _add_to_cell(None, keys[:1000], PRECISION, 1000)[0] == 'exact'
+    assert _add_to_cell(None, keys, PRECISION, 1000)[0] == 'hll'
+    # Small sketches use linear counting, which is close to exact
+    assert cell_cardinality(_add_to_cell(None, keys, PRECISION, 1000)) == pytest.approx(1001, rel=0.01)
+
+
+def test_repeat_customers_do_not_grow_a_sketch():
+    keys = np.arange(1, 20_001, dtype=np.int64)
+    cell = _add_in_batches(keys, exact_threshold=1000)
+    
+    again = _add_in_batches(keys[::-1].copy(), exact_threshold=1000)
+    again = _add_to_cell(again, keys, PRECISION, 1000)
+    
+    np.testing.assert_array_equal(again[1], cell[1])
+
+
+def test_merge_of_exact_and_hll_cells():
+    exact = _add_to_cell(None, np.arange(1, 501, dtype=np.int64), PRECISION, 1000)
+    sketched = _add_to_cell(None, np.arange(300, 30_001, dtype=np.int64), PRECISION, 1000)
+    
+    merged = _merge_cells([exact, sketched], PRECISION)
+    assert merged[0] == 'hll'
+    assert cell_cardinality(merged) == pytest.approx(30_000, rel=TOLERANCE)
+    
+    both_exact = _merge_cells([exact, _add_to_cell(None, np.arange(400, 601, dtype=np.int64), PRECISION, 1000)], PRECISION)
+    assert both_exact[0] == 'exact'
+    assert cell_cardinality(both_exact) == 600
+
+
+def _sales(n_customers=20_000, n_rows=120_000, seed=8):
+    """Completed sales in SalesKey order, which is also date order"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'SalesKey': np.arange(1, n_rows + 1),
+        'CustomerKey': rng.integers(1, n_customers + 1, n_rows),
+        'OrderDate': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 365, n_rows)), unit='D'),
+    })
+
+
+def test_sketched_matrix_tracks_the_exact_matrix(tmp_path):
+    sales = _sales()
+    exact = new_cohort_store(PRECISION)
+    update_cohort_store(exact, sales, exact_threshold=10 ** 9)
+    sketched = new_cohort_store(PRECISION)
+    for start in range(0, len(sales), 20_000):
+        update_cohort_store(sketched, sales.iloc[start:start + 20_000], exact_threshold=500)
+    
+    assert {kind for kind, _ in exact['cells'].values()} == {'exact'}
+    assert {kind for kind, _ in sketched['cells'].values()} == {'exact', 'hll'}
+    
+    expected = retention_matrix(exact)
+    # Saving keeps both kinds of cell
+    result = retention_matrix(load_cohort_store(save_cohort_store(sketched, tmp_path / 'store.npz')))
+    
+    counts = [column for column in expected.columns if column.startswith('Month_')]
+    assert result['CohortMonth'].tolist() == expected['CohortMonth'].tolist()
+    np.testing.assert_allclose(result[counts], expected[counts], rtol=TOLERANCE)
@@ -0,0 +1,130 @@
+"""
+Tests for local_engine.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db_utils
+import local_engine
+from local_engine import aggregate_customer_metrics
+from bench_duckdb_backend import build_star_schema, write_sqlite, write_parquet
+
+
+def _distinct_orders(facts):
+    """COUNT(DISTINCT TransactionID) of completed lines per CustomerKey"""
+    completed = facts[facts['OrderStatus'] == 'Completed']
+    return completed.groupby('CustomerKey')['TransactionID'].nunique()
+
+
+def _write_facts(facts, tmp_path):
+    path = tmp_path / 'fact_sales.parquet'
+    facts.to_parquet(path, index=False)
+    return path
+
+
+def test_transaction_split_across_non_adjacent_batches(tmp_path):
+    # TXN1's lines land in batches 0, 2 and 3 (batch_size=2)
+    facts = pd.DataFrame({
+        'CustomerKey': [1, 1, 2, 2, 1, 3, 1, 2],
+        'TransactionID': ['TXN1', 'TXN2', 'TXN3', 'TXN4', 'TXN1', 'TXN5', 'TXN1', 'TXN3'],
+        'OrderDate': pd.Timestamp('2025-01-01'),
+        'OrderStatus': 'Completed',
+        'TotalAmount': 10.0,
+    })
+    
+    metrics = aggregate_customer_metrics(_write_facts(facts, tmp_path), batch_size=2)
+    
+    assert metrics['total_orders'][1:4].tolist() == [2, 2, 1]
+    assert metrics['completed_lines'][1:4].tolist() == [4, 3, 1]
+
+
+def test_distinct_orders_do_not_depend_on_row_order(tmp_path):
+    rng = np.random.default_rng(7)
+    transactions = rng.integers(0, 1500, 5000)
+    facts = pd.DataFrame({
+        'CustomerKey': (transactions % 400 + 1).astype(np.int64),
+        'TransactionID': np.char.add('TXN', transactions.astype(str)),
+        'OrderDate': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 700, 5000), unit='D'),
+        'OrderStatus': rng.choice(['Completed', 'Cancelled'], 5000, p=[0.9, 0.1]),
+        'TotalAmount': np.round(rng.gamma(2, 40, 5000), 2),
+    })
+    expected = _distinct_orders(facts)
+    
+    for batch_size in (7, 1000, 100000):
+        metrics = aggregate_customer_metrics(_write_facts(facts, tmp_path), batch_size=batch_size)
+        np.testing.assert_array_equal(metrics['total_orders'][expected.index], expected.to_numpy())
+        assert metrics['total_orders'].sum() == expected.sum()
+
+
+@pytest.fixture(scope='module')
+def star_schema(tmp_path_factory):
+    """
+    The same synthetic star schema in SQLite and as Parquet exports
+    
+    Transactions get a region, and a few customers, products and one region
+    are missing from their dimensions, so the inner joins matter.
+    """
+    directory = tmp_path_factory.mktemp('star_schema')
+    tables = build_star_schema(20000)
+    facts = tables['Fact_Sales']
+    transactions = pd.factorize(facts['TransactionID'])[0]
+    facts['RegionKey'] = np.random.default_rng(3).choice([10, 20, 30, 99], transactions.max() + 1)[transactions]
+    tables['Dim_Region'] = pd.DataFrame({'RegionKey': [30, 10, 20], 'RegionName': ['West', 'North', 'South']})
+    tables['Dim_Customer'] = tables['Dim_Customer'][tables['Dim_Customer']['CustomerKey'] % 97 != 0]
+    tables['Dim_Product'] = tables['Dim_Product'][tables['Dim_Product']['ProductKey'] % 101 != 0]
+    
+    write_sqlite(tables, directory / 'consumer360.db')
+    paths = write_parquet(tables, directory)
+    
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(db_utils, 'DB_BACKEND', 'sqlite')
+        patch.setattr(db_utils, 'SQLITE_DB_PATH', str(directory / 'consumer360.db'))
+        patch.setattr(local_engine, 'LOCAL_EXPORT_CONFIG', {
+            'fact_sales': paths['Fact_Sales'],
+            'dim_customer': paths['Dim_Customer'],
+            'dim_product': paths['Dim_Product'],
+            'dim_region': paths['Dim_Region'],
+            'batch_size': 777,  # Many batches, with transactions split across them
+        })
+        yield patch
+
+
+def _extract_both(star_schema, name, *args):
+    """Run a db_utils extraction against SQLite and against the exports"""
+    star_schema.setattr(db_utils, 'DATA_SOURCE', 'database')
+    sql = getattr(db_utils, name)(*args)
+    star_schema.setattr(db_utils, 'DATA_SOURCE', 'files')
+    local = getattr(db_utils, name)(*args)
+    return sql, local
+
+
+def _assert_same_frame(sql, local, keys):
+    """Same rows and columns; SQLite keeps DECIMAL casts unrounded, so amounts may differ by a cent"""
+    sql = sql.sort_values(keys).reset_index(drop=True)
+    local = local.sort_values(keys).reset_index(drop=True)
+    assert list(local.columns) == list(sql.columns)
+    assert len(sql) > 0
+    
+    for column in sql.columns:
+        if 'Date' in column:
+            pd.testing.assert_series_equal(pd.to_datetime(local[column]), pd.to_datetime(sql[column]), check_dtype=False)
+        elif pd.api.types.is_numeric_dtype(sql[column]):
+            pd.testing.assert_series_equal(local[column], sql[column], check_dtype=False, atol=0.01)
+        else:
+            pd.testing.assert_series_equal(local[column].astype(str), sql[column].astype(str))
+
+
+@pytest.mark.parametrize('name, args, keys', [
+    ('get_rfm_data', (), ['CustomerKey']),
+    ('get_rfm_data_by_region', (), ['CustomerKey', 'RegionKey']),
+    ('get_market_basket_data', (), ['TransactionID', 'ProductName']),
+    ('get_product_cooccurrence', (3,), ['Product1', 'Product2']),
+    ('get_cohort_data', (), ['CohortMonth']),
+    ('get_sequence_data', (), ['CustomerID', 'OrderDate', 'TransactionID', 'ProductName']),
+])
+def test_local_engine_matches_sql(star_schema, name, args, keys):
+    sql, local = _extract_both(star_schema, name, *args)
+    
+    _assert_same_frame(sql, local, keys)
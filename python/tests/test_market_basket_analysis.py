@@ -0,0 +1,66 @@
+"""
+Tests for market_basket_analysis.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from mlxtend.frequent_patterns import apriori
+
+from market_basket_analysis import prepare_transactions, reduce_transactions, weighted_apriori
+
+
+def _transactions(n_transactions=400, n_products=12, seed=3):
+    """Skewed random baskets, so there are itemsets of several lengths"""
+    rng = np.random.default_rng(seed)
+    popularity = 0.6 / (np.arange(n_products) + 1)
+    rows = []
+    for t in range(n_transactions):
+        items = np.flatnonzero(rng.random(n_products) < popularity)
+        if len(items) == 0:
+            items = [rng.integers(n_products)]
+        rows.extend((f'TXN{t}', f'P{i:02d}') for i in items)
+    return pd.DataFrame(rows, columns=['TransactionID', 'ProductName'])
+
+
+def _as_dict(frequent_itemsets):
+    return {
+        frozenset(itemset): support
+        for itemset, support in zip(frequent_itemsets['itemsets'], frequent_itemsets['support'])
+    }
+
+
+@pytest.mark.parametrize('min_support', [0.01, 0.05, 0.2])
+def test_matches_mlxtend_on_collapsed_baskets(min_support):
+    df = _transactions()
+    df_encoded, _ = prepare_transactions(df)
+    expected = _as_dict(apriori(df_encoded, min_support=min_support, use_colnames=True))
+    
+    reduced, weights = reduce_transactions(df, min_support)
+    result = _as_dict(weighted_apriori(reduced, weights, min_support))
+    
+    assert reduced.shape[0] < df_encoded.shape[0]
+    assert result.keys() == expected.keys()
+    for itemset, support in expected.items():
+        assert result[itemset] == pytest.approx(support)
+
+
+def test_max_len_matches_mlxtend():
+    df = _transactions()
+    df_encoded, _ = prepare_transactions(df)
+    expected = _as_dict(apriori(df_encoded, min_support=0.01, use_colnames=True, max_len=2))
+    
+    reduced, weights = reduce_transactions(df, 0.01)
+    result = _as_dict(weighted_apriori(reduced, weights, 0.01, max_len=2))
+    
+    assert result.keys() == expected.keys()
+
+
+def test_small_chunks_give_the_same_itemsets():
+    df = _transactions()
+    reduced, weights = reduce_transactions(df, 0.01)
+    
+    expected = _as_dict(weighted_apriori(reduced, weights, 0.01))
+    result = _as_dict(weighted_apriori(reduced, weights, 0.01, chunk_cells=64))
+    
+    assert result == pytest.approx(expected)
@@ -0,0 +1,106 @@
+"""
+Tests for rfm_analysis.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rfm_analysis import (
+    calculate_rfm_scores, fit_rfm_breakpoints, score_rfm_by_group, _customer_totals,
+    _group_quantile_edges
+)
+
+
+def _customers(n=2000, seed=11, max_orders=60):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CustomerKey': np.arange(1, n + 1),
+        'DaysSinceLastPurchase': rng.integers(0, 400, n),
+        'TotalOrders': rng.integers(1, max_orders + 1, n),
+        'TotalRevenue': rng.gamma(2.0, 250.0, n).round(2),
+    })
+
+
+def _qcut_scores(values):
+    """The original scoring: pd.qcut with labels 1-5"""
+    return pd.qcut(values, q=5, labels=[1, 2, 3, 4, 5]).astype(int)
+
+
+def test_scores_match_qcut():
+    df = _customers()
+    
+    scored = calculate_rfm_scores(df.copy())
+    
+    pd.testing.assert_series_equal(scored['F_Score'], _qcut_scores(df['TotalOrders']), check_names=False)
+    pd.testing.assert_series_equal(scored['M_Score'], _qcut_scores(df['TotalRevenue']), check_names=False)
+
+
+def test_fitted_breakpoints_score_new_customers_like_pd_cut():
+    train = _customers(seed=1)
+    new = _customers(n=500, seed=2)
+    breakpoints = fit_rfm_breakpoints(train)
+    
+    scored = calculate_rfm_scores(new.copy(), breakpoints=breakpoints)
+    
+    # Customers outside the fitted range take the outer score instead of NaN
+    expected = pd.cut(
+        new['TotalRevenue'].clip(breakpoints['M'][0], breakpoints['M'][-1]),
+        bins=breakpoints['M'], labels=[1, 2, 3, 4, 5], include_lowest=True
+    ).astype(int)
+    pd.testing.assert_series_equal(scored['M_Score'], expected, check_names=False)
+
+
+def test_degenerate_bins_score_like_qcut_codes():
+    # Three distinct order counts: qcut drops duplicate edges and pd.cut with
+    # five labels would raise
+    df = _customers(max_orders=3)
+    
+    scored = calculate_rfm_scores(df.copy())
+    
+    expected = pd.qcut(df['TotalOrders'], q=5, duplicates='drop').cat.codes + 1
+    assert scored['F_Score'].tolist() == expected.tolist()
+    assert scored['F_Score'].max() < 5
+
+
+def test_group_quantile_edges_match_qcut_per_group():
+    rng = np.random.default_rng(5)
+    counts = np.array([1, 2, 7, 50, 333])
+    codes = np.repeat(np.arange(len(counts)), counts)
+    values = rng.gamma(2.0, 250.0, counts.sum()).round(2)
+    shuffle = rng.permutation(len(values))
+    codes, values = codes[shuffle], values[shuffle]
+    
+    edges = _group_quantile_edges(codes, values, counts)
+    
+    for group in range(len(counts)):
+        _, bins = pd.qcut(values[codes == group], q=5, retbins=True, duplicates='drop')
+        if len(bins) == 6:
+            np.testing.assert_allclose(edges[group], bins, rtol=1e-12)
+
+
+def test_grouped_scores_match_qcut_within_each_group():
+    df = _customers(n=3000, max_orders=500)
+    df['RegionKey'] = np.random.default_rng(9).choice([1, 2, 3, 4], size=len(df), p=[0.5, 0.3, 0.19, 0.01])
+    
+    scored = score_rfm_by_group(df.copy(), group_column='RegionKey', min_group_size=100)
+    
+    small = scored['RegionKey'] == 4
+    assert (scored.loc[small, 'Breakpoint_Source'] == 'global').all()
+    assert (scored.loc[~small, 'Breakpoint_Source'] == 'group').all()
+    for column, score in (('TotalOrders', 'F_Score'), ('TotalRevenue', 'M_Score')):
+        expected = df[~small].groupby('RegionKey')[column].transform(_qcut_scores)
+        pd.testing.assert_series_equal(scored.loc[~small, score], expected, check_names=False)
+    
+    # The small group falls back to breakpoints fitted on all customers
+    fallback = calculate_rfm_scores(df.copy(), breakpoints=fit_rfm_breakpoints(_customer_totals(df)))
+    pd.testing.assert_series_equal(scored.loc[small, 'M_Score'], fallback.loc[small, 'M_Score'])
+
+
+def test_min_group_size_zero_gives_every_group_its_own_breakpoints():
+    df = _customers(n=200, max_orders=500)
+    df['RegionKey'] = np.where(df['CustomerKey'] <= 10, 1, 2)
+    
+    scored = score_rfm_by_group(df.copy(), group_column='RegionKey', min_group_size=0)
+    
+    assert (scored['Breakpoint_Source'] == 'group').all()
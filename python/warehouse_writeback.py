@@ -0,0 +1,283 @@
+"""
+Consumer360: Warehouse Write-Back
+Week 3: Dashboard Construction
+
+This script bulk-loads the RFM segmentation and market basket rules back into
+the warehouse so Power BI can query them alongside the star schema instead of
+reading the CSV exports from disk.
+
+Each load goes into a staging table of its own first and is then swapped into
+the target table inside a single transaction, so readers never see a partial
+run and overlapping runs (scheduler plus a manual run) cannot mix rows.
+"""
+
+import re
+import time
+import uuid
+import logging
+from datetime import date
+import pandas as pd
+from config import WRITEBACK_CONFIG, DB_BACKEND
+from db_utils import get_connection
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# Target table layouts (column name, SQL type). SQLite accepts the SQL Server
+# type names through type affinity, and DuckDB only needs BIT mapped to
+# BOOLEAN, so one definition serves every backend.
+SEGMENT_COLUMNS = [
+    ('RunDate', 'DATE NOT NULL'),
+    ('CustomerKey', 'INT NOT NULL'),
+    ('R_Score', 'TINYINT'),
+    ('F_Score', 'TINYINT'),
+    ('M_Score', 'TINYINT'),
+    ('RFM_Score', 'VARCHAR(3)'),
+    ('RFM_Value', 'DECIMAL(5,2)'),
+    ('Segment', 'NVARCHAR(50)'),
+    ('DaysSinceLastPurchase', 'INT'),
+    ('TotalOrders', 'INT'),
+    ('TotalRevenue', 'DECIMAL(12,2)'),
+    ('AvgOrderValue', 'DECIMAL(10,2)'),
+]
+SEGMENT_KEY = ['CustomerKey', 'RunDate']
+
+RULE_COLUMNS = [
+    ('RunDate', 'DATE NOT NULL'),
+    ('RuleKey', 'INT NOT NULL'),
+    ('Antecedents', 'NVARCHAR(400)'),
+    ('Consequents', 'NVARCHAR(400)'),
+    ('SupportPct', 'DECIMAL(7,2)'),
+    ('ConfidencePct', 'DECIMAL(7,2)'),
+    ('Lift', 'DECIMAL(10,2)'),
+    ('AntecedentCategory', 'NVARCHAR(200)'),
+    ('ConsequentCategory', 'NVARCHAR(200)'),
+    ('IsCrossCategory', 'BIT'),
+]
+RULE_KEY = ['RunDate', 'RuleKey']
+
+# Table names are interpolated into DDL/DML, so only plain identifiers are accepted
+TABLE_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,99}$')
+
+
+def _validate_table(table):
+    """
+    Check that a write-back target is a configured table with a plain identifier name
+    
+    Raises:
+        ValueError: If the table is not one of the WRITEBACK_CONFIG tables or
+            its name is not a plain identifier
+    """
+    allowed = (WRITEBACK_CONFIG['segment_table'], WRITEBACK_CONFIG['rules_table'])
+    if table not in allowed:
+        raise ValueError(f"Write-back table must be one of {allowed}, got {table!r}")
+    if not TABLE_NAME_PATTERN.match(table):
+        raise ValueError(f"Write-back table name {table!r} is not a plain SQL identifier")
+
+
+def _create_table_sql(table, columns, key):
+    """Build an idempotent CREATE TABLE statement for the active backend"""
+    if DB_BACKEND == 'duckdb':
+        # DuckDB's BIT is a bit string
+        columns = [(name, 'BOOLEAN' if sql_type == 'BIT' else sql_type) for name, sql_type in columns]
+    
+    body = ',\n    '.join(f"{name} {sql_type}" for name, sql_type in columns)
+    body += f",\n    PRIMARY KEY ({', '.join(key)})"
+    
+    if DB_BACKEND in ('sqlite', 'duckdb'):
+        return f"CREATE TABLE IF NOT EXISTS {table} (\n    {body}\n)"
+    
+    return (
+        f"IF OBJECT_ID('{table}', 'U') IS NULL\n"
+        f"CREATE TABLE {table} (\n    {body}\n)"
+    )
+
+
+def ensure_writeback_tables(conn, table, columns, key, staging):
+    """
+    Create the target table if it does not exist, plus this run's staging table
+    
+    Args:
+        conn: Open database connection
+        table (str): Target table name
+        columns (list): (column name, SQL type) pairs
+        key (list): Primary key columns
+        staging (str): Staging table name for this run
+    """
+    cursor = conn.cursor()
+    cursor.execute(_create_table_sql(table, columns, key))
+    cursor.execute(_create_table_sql(staging, columns, key))
+    conn.commit()
+    cursor.close()
+
+
+def _drop_staging(conn, staging):
+    """Drop a run's staging table; a failure only leaves an orphan table behind"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        logger.warning(f"Could not drop staging table {staging}: {e}")
+
+
+def _to_rows(df, columns):
+    """Convert a DataFrame to a list of DB-API parameter tuples"""
+    names = [name for name, _ in columns]
+    values = df[names].astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def bulk_upsert(df, table, columns, key, run_date, batch_size=None):
+    """
+    Load a DataFrame into a staging table and swap it into the target table
+    
+    Rows are written to a per-run Stage_<table>_<id> table in batches
+    (fast_executemany on SQL Server) and committed once: staging is private
+    to the run, so nothing needs to be visible before the load completes.
+    The target rows for the run date are then replaced from staging inside a
+    single transaction, and the staging table is dropped.
+    
+    Args:
+        df (pd.DataFrame): Rows to load, containing every column in `columns`
+        table (str): Target table name
+        columns (list): (column name, SQL type) pairs
+        key (list): Primary key columns
+        run_date (date): Run date being replaced in the target table
+        batch_size (int, optional): Rows per batch
+    
+    Returns:
+        dict: Load statistics (rows, seconds, rows_per_sec)
+    
+    Raises:
+        ValueError: If table is not a configured write-back table
+    """
+    _validate_table(table)
+    batch_size = batch_size or WRITEBACK_CONFIG['batch_size']
+    staging = f"Stage_{table}_{uuid.uuid4().hex[:12]}"
+    names = [name for name, _ in columns]
+    column_list = ', '.join(names)
+    placeholders = ', '.join('?' for _ in names)
+    
+    start = time.perf_counter()
+    rows = _to_rows(df, columns)
+    
+    conn = get_connection()
+    try:
+        # 1. Create the target table and this run's empty staging table
+        ensure_writeback_tables(conn, table, columns, key, staging)
+        cursor = conn.cursor()
+        if DB_BACKEND == 'sqlserver':
+            cursor.fast_executemany = True
+        
+        # 2. Batched load into staging (not visible to report readers)
+        insert_sql = f"INSERT INTO {staging} ({column_list}) VALUES ({placeholders})"
+        for offset in range(0, len(rows), batch_size):
+            cursor.executemany(insert_sql, rows[offset:offset + batch_size])
+        conn.commit()
+        
+        # 3. Swap the run's rows into the target table atomically
+        # (DuckDB autocommits each statement unless a transaction is opened)
+        if DB_BACKEND == 'duckdb':
+            cursor.execute("BEGIN TRANSACTION")
+        cursor.execute(f"DELETE FROM {table} WHERE RunDate = ?", (run_date,))
+        cursor.execute(
+            f"INSERT INTO {table} ({column_list}) "
+            f"SELECT {column_list} FROM {staging}"
+        )
+        if DB_BACKEND == 'duckdb':
+            cursor.execute("COMMIT")
+        conn.commit()
+        cursor.close()
+    
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            # DuckDB raises if no transaction is open
+            pass
+        logger.error(f"Error writing back to {table}: {e}")
+        raise
+    
+    finally:
+        _drop_staging(conn, staging)
+        conn.close()
+    
+    elapsed = time.perf_counter() - start
+    rows_per_sec = len(rows) / elapsed if elapsed > 0 else float('inf')
+    logger.info(
+        f"Wrote {len(rows)} rows to {table} in {elapsed:.2f}s "
+        f"({rows_per_sec:,.0f} rows/sec)"
+    )
+    
+    return {'rows': len(rows), 'seconds': elapsed, 'rows_per_sec': rows_per_sec}
+
+
+def write_rfm_segments(rfm_df, run_date=None):
+    """
+    Write RFM scores and segments to Fact_CustomerSegment
+    
+    Args:
+        rfm_df (pd.DataFrame): Output of rfm_analysis.main
+        run_date (date, optional): Run date key (defaults to today)
+    
+    Returns:
+        dict: Load statistics
+    """
+    run_date = run_date or date.today()
+    logger.info(f"Writing RFM segments for run date {run_date}...")
+    
+    df = rfm_df.copy()
+    df['RunDate'] = run_date
+    df['RFM_Value'] = df['RFM_Value'].round(2)
+    
+    return bulk_upsert(
+        df,
+        WRITEBACK_CONFIG['segment_table'],
+        SEGMENT_COLUMNS,
+        SEGMENT_KEY,
+        run_date
+    )
+
+
+def write_market_basket_rules(report, run_date=None):
+    """
+    Write market basket rules to Fact_MarketBasketRule
+    
+    Args:
+        report (pd.DataFrame): Output of generate_market_basket_report
+        run_date (date, optional): Run date key (defaults to today)
+    
+    Returns:
+        dict: Load statistics
+    """
+    run_date = run_date or date.today()
+    logger.info(f"Writing market basket rules for run date {run_date}...")
+    
+    df = pd.DataFrame({
+        'RunDate': run_date,
+        'RuleKey': range(1, len(report) + 1),
+        'Antecedents': report['If_Customer_Buys'].values,
+        'Consequents': report['Then_Also_Buys'].values,
+        'SupportPct': report['Support_%'].values,
+        'ConfidencePct': report['Confidence_%'].values,
+        'Lift': report['Lift'].values,
+        'AntecedentCategory': report['Antecedent_Category'].values,
+        'ConsequentCategory': report['Consequent_Category'].values,
+        'IsCrossCategory': report['Cross_Category'].astype(int).values,
+    })
+    
+    return bulk_upsert(
+        df,
+        WRITEBACK_CONFIG['rules_table'],
+        RULE_COLUMNS,
+        RULE_KEY,
+        run_date
+    )